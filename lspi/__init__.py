@@ -16,7 +16,10 @@ http://www.cs.duke.edu/research/AI/LSPI/
 
 import basis_functions  # noqa
 import domains  # noqa
-from lspi import learn  # noqa
+import factorizations  # noqa
+from lspi import learn, learn_online, Learner  # noqa
 from policy import Policy  # noqa
-from sample import Sample  # noqa
+from sample import (Sample, SampleBatch, SampleChunks,  # noqa
+                    TrajectoryBatch, WeightedSampleBatch)
 import solvers  # noqa
+from storage import ReplayMemory, SampleStore  # noqa
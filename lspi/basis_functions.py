@@ -2,9 +2,17 @@
 """Abstract Base Class for Basis Function and some common implementations."""
 
 import abc
+import itertools
 
 import numpy as np
 
+import scipy.sparse
+import scipy.spatial
+
+
+# odd 64 bit constant of the multiplicative hash of TileCodingBasis
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
 
 class BasisFunction(object):
 
@@ -64,6 +72,196 @@ class BasisFunction(object):
         """
         pass  # pragma: no cover
 
+    def evaluate_batch(self, states, actions):
+        r"""Calculate the :math:`\phi` vectors of many state-action pairs.
+
+        The default implementation calls evaluate once per pair. Subclasses
+        should override this with a vectorized implementation when possible.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, ...) where row i is the state of pair i.
+        actions : numpy.array
+            Integer array of shape (N, ) with the action index of each pair.
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, k) where row i is the :math:`\phi` vector of
+            pair i.
+
+        """
+        actions = np.asarray(actions)
+        phi = np.zeros((actions.shape[0], self.size()))
+        for i, (state, action) in enumerate(zip(states, actions)):
+            phi[i] = self.evaluate(state, action)
+        return phi
+
+    @property
+    def is_sparse(self):
+        r"""Return True if the :math:`\phi` vectors are mostly zeros.
+
+        Sparse bases implement evaluate_sparse and evaluate_sparse_batch
+        efficiently. Policy and the solvers use those methods instead of the
+        dense ones when this is True. The default implementation returns
+        False.
+
+        """
+        return False
+
+    def evaluate_sparse(self, state, action):
+        r"""Return the non-zero entries of the :math:`\phi` vector.
+
+        The default implementation calls evaluate and drops the zeros.
+
+        Parameters
+        ----------
+        state : numpy.array
+            The state to get the features for.
+        action : int
+            The action index to get the features for.
+
+        Returns
+        -------
+        (numpy.array, numpy.array)
+            The indices of the non-zero entries and their values.
+
+        """
+        phi = self.evaluate(state, action)
+        indices = np.flatnonzero(phi)
+        return indices, phi[indices]
+
+    def evaluate_sparse_batch(self, states, actions):
+        r"""Calculate a sparse matrix of :math:`\phi` vectors for many pairs.
+
+        The default implementation converts the result of evaluate_batch.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, ...) where row i is the state of pair i.
+        actions : numpy.array
+            Integer array of shape (N, ) with the action index of each pair.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Sparse (N, k) matrix where row i is the :math:`\phi` vector of
+            pair i.
+
+        """
+        return scipy.sparse.csr_matrix(self.evaluate_batch(states, actions))
+
+    def state_features_size(self):
+        r"""Return the size of the state features :math:`\psi(s)` or None.
+
+        Many bases have the form :math:`\phi(s, a) = e_a \otimes \psi(s)`
+        where :math:`e_a` is the one-hot vector of action a. In other words
+        the :math:`\phi` vector is made of num_actions blocks of size m and
+        when evaluated for action a block a holds :math:`\psi(s)` while every
+        other block is zero. A basis with this layout returns m from this
+        method and implements evaluate_state. Policy and the solvers use it
+        to compute :math:`\psi(s)` once instead of :math:`\phi(s, a)` once
+        per action.
+
+        The default implementation returns None, which means the basis does
+        not have this layout.
+
+        Returns
+        -------
+        int or None
+            Size m of the :math:`\psi(s)` vector, or None if the basis is not
+            state factored.
+
+        """
+        return None
+
+    def evaluate_state(self, state):
+        r"""Calculate the state features :math:`\psi(s)`.
+
+        Only available when state_features_size does not return None.
+
+        Parameters
+        ----------
+        state : numpy.array
+            The state to get the features for.
+
+        Returns
+        -------
+        numpy.array
+            The :math:`\psi` vector of size state_features_size().
+
+        Raises
+        ------
+        NotImplementedError
+            If the basis is not state factored.
+
+        """
+        raise NotImplementedError('%s is not state factored'
+                                  % self.__class__.__name__)
+
+    def evaluate_state_batch(self, states):
+        r"""Calculate the state features :math:`\psi(s)` of many states.
+
+        The default implementation calls evaluate_state once per state.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, ...) where each row is a state.
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, m) where row i is :math:`\psi(states[i])`.
+
+        Raises
+        ------
+        NotImplementedError
+            If the basis is not state factored.
+
+        """
+        psi = np.zeros((len(states), self.state_features_size()))
+        for i, state in enumerate(states):
+            psi[i] = self.evaluate_state(state)
+        return psi
+
+    def evaluate_sparse_state_batch(self, states):
+        r"""Return a sparse matrix of the state features :math:`\psi(s)`.
+
+        Only available when state_features_size does not return None. The
+        :math:`\phi` vector of action a is this row shifted into block a, so
+        sparse and state factored bases are evaluated once per state
+        instead of once per action. The default implementation takes the
+        first block of evaluate_sparse_batch for action 0.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, ...) where each row is a state.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Sparse (N, m) matrix where row i is :math:`\psi(states[i])`.
+
+        Raises
+        ------
+        NotImplementedError
+            If the basis is not state factored.
+
+        """
+        if self.state_features_size() is None:
+            raise NotImplementedError('%s is not state factored'
+                                      % self.__class__.__name__)
+        states = np.asarray(states)
+        phi = self.evaluate_sparse_batch(
+            states, np.zeros((states.shape[0], ), dtype=np.int_))
+        return scipy.sparse.csr_matrix(
+            (phi.data, phi.indices, phi.indptr),
+            shape=(phi.shape[0], self.state_features_size()))
+
     @abc.abstractproperty
     def num_actions(self):
         """Return number of possible actions.
@@ -94,6 +292,65 @@ class BasisFunction(object):
             raise ValueError('num_actions must be >= 1')
         return num_actions
 
+    def _validate_actions(self, actions):
+        """Return actions as an integer array. Raise IndexError if invalid.
+
+        Return
+        ------
+        numpy.array
+            Integer array of action indexes.
+
+        Raises
+        ------
+        IndexError
+            If any action is < 0 or >= num_actions
+
+        """
+        actions = np.asarray(actions, dtype=np.int_).reshape((-1, ))
+        if np.any(actions < 0) or np.any(actions >= self.num_actions):
+            raise IndexError('Action index out of bounds')
+        return actions
+
+    def _action_blocks(self, psi, actions, out=None):
+        r"""Place each row of psi in the block of its action.
+
+        Parameters
+        ----------
+        psi: numpy.array
+            (N, m) matrix of state features.
+        actions: numpy.array
+            (N, ) array of validated action indexes.
+        out: numpy.array or None
+            C-contiguous (N, k) float array to write the result to. Defaults
+            to None which allocates a new array.
+
+        Returns
+        -------
+        numpy.array
+            (N, k) matrix of :math:`\phi` vectors.
+
+        Raises
+        ------
+        ValueError
+            If psi and actions have a different number of rows.
+        ValueError
+            If out does not have shape (N, k) or is not C-contiguous.
+
+        """
+        num_rows = actions.shape[0]
+        if psi.shape[0] != num_rows:
+            raise ValueError('states and actions must have the same length')
+
+        if out is None:
+            out = np.zeros((num_rows, self.size()))
+        else:
+            _check_out(out, (num_rows, self.size()))
+            out.fill(0.)
+
+        phi = out.reshape((num_rows, self.num_actions, psi.shape[1]))
+        phi[np.arange(num_rows), actions] = psi
+        return out
+
 
 class FakeBasis(BasisFunction):
 
@@ -164,6 +421,18 @@ class FakeBasis(BasisFunction):
             raise IndexError('action must be < num_actions')
         return np.array([1.])
 
+    def evaluate_batch(self, states, actions):
+        r"""Return a (N, 1) matrix of ones.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds
+
+        """
+        actions = self._validate_actions(actions)
+        return np.ones((actions.shape[0], 1))
+
     @property
     def num_actions(self):
         """Return number of possible actions."""
@@ -292,13 +561,75 @@ class OneDimensionalPolynomialBasis(BasisFunction):
 
         offset = (self.size()/self.num_actions)*action
 
-        value = state[0]
-
-        phi[offset:offset + self.degree + 1] = \
-            np.array([pow(value, i) for i in range(self.degree+1)])
+        phi[offset:offset + self.degree + 1] = self.evaluate_state(state)
 
         return phi
 
+    def evaluate_batch(self, states, actions):
+        r"""Calculate the :math:`\phi` vectors of many state-action pairs.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, 1).
+        actions : numpy.array
+            Integer array of shape (N, ).
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, k) where row i equals
+            ``evaluate(states[i], actions[i])``.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If states does not have shape (N, 1).
+
+        """
+        actions = self._validate_actions(actions)
+        return self._action_blocks(self.evaluate_state_batch(states), actions)
+
+    def state_features_size(self):
+        """Return degree + 1, the size of one action block."""
+        return self.degree + 1
+
+    def evaluate_state(self, state):
+        r"""Return :math:`\psi(s) = (1, s, s^2, \ldots, s^{degree})`.
+
+        Raises
+        ------
+        ValueError
+            If the state vector has any number of dimensions other than 1 a
+            ValueError is raised.
+
+        """
+        if state.shape != (1, ):
+            raise ValueError('This class only supports one dimensional states')
+
+        return _powers(state, self.degree)[0]
+
+    def evaluate_state_batch(self, states):
+        r"""Return the (N, degree + 1) matrix of :math:`\psi` vectors.
+
+        The powers are built with a cumulative product, which takes degree
+        multiplications per state.
+
+        Raises
+        ------
+        ValueError
+            If states does not have shape (N, 1).
+
+        """
+        states = np.asarray(states)
+
+        if states.ndim != 2 or states.shape[1] != 1:
+            raise ValueError('This class only supports one dimensional states')
+
+        return _powers(states[:, 0], self.degree)
+
     @property
     def num_actions(self):
         """Return number of possible actions."""
@@ -324,114 +655,1258 @@ class OneDimensionalPolynomialBasis(BasisFunction):
         self.__num_actions = value
 
 
-class RadialBasisFunction(BasisFunction):
+class PolynomialBasis(BasisFunction):
 
-    r"""Gaussian Multidimensional Radial Basis Function (RBF).
+    r"""Polynomial features for a state with several variables.
 
-    Given a set of k means :math:`(\mu_1 , \ldots, \mu_k)` produce a feature
-    vector :math:`(1, e^{-\gamma || s - \mu_1 ||^2}, \cdots,
-    e^{-\gamma || s - \mu_k ||^2})` where `s` is the state vector and
-    :math:`\gamma` is a free parameter. This vector will be padded with
-    0's on both sides proportional to the number of possible actions
-    specified.
+    Produces every monomial :math:`s_1^{e_1} s_2^{e_2} \cdots s_d^{e_d}` of
+    the state variables with total degree :math:`e_1 + \cdots + e_d` of at
+    most degree, starting with the constant 1. The exponents are stored
+    once in the (number of monomials, d) integer matrix exponents, ordered
+    by total degree. With one state variable the features are the same as
+    those of OneDimensionalPolynomialBasis.
+
+    A batch is evaluated by building the powers of every state variable
+    with a cumulative product and multiplying the powers selected by each
+    column of exponents, which takes :math:`O(d)` vectorized operations per
+    batch.
 
     Parameters
     ----------
-    means: list(numpy.array)
-        List of numpy arrays representing :math:`(\mu_1, \ldots, \mu_k)`.
-        Each :math:`\mu` is a numpy array with dimensions matching the state
-        vector this basis function will be used with. If the dimensions of each
-        vector are not equal than an exception will be raised. If no means are
-        specified then a ValueError will be raised
-    gamma: float
-        Free parameter which controls the size/spread of the Gaussian "bumps".
-        This parameter is best selected via tuning through cross validation.
-        gamma must be > 0.
+    num_variables: int
+        Number of state variables d.
+    degree: int
+        Maximum total degree of the monomials.
     num_actions: int
-        Number of actions. Must be in range [1, :math:`\infty`] otherwise
-        an exception will be raised.
+        The total number of possible actions.
 
     Raises
     ------
     ValueError
-        If means list is empty
-    ValueError
-        If dimensions of each mean vector do not match.
+        If num_variables is less than 1
     ValueError
-        If gamma is <= 0.
+        If degree is less than 0
     ValueError
-        If num_actions is less than 1.
-
-    Note
-    ----
-
-    The numpy arrays specifying the means are not copied.
+        If num_actions is less than 1
 
     """
 
-    def __init__(self, means, gamma, num_actions):
-        """Initialize RBF instance."""
+    def __init__(self, num_variables, degree, num_actions):
+        """Initialize PolynomialBasis."""
         self.__num_actions = BasisFunction._validate_num_actions(num_actions)
 
-        if len(means) == 0:
-            raise ValueError('You must specify at least one mean')
-
-        if reduce(RadialBasisFunction.__check_mean_size, means) is None:
-            raise ValueError('All mean vectors must have the same dimensions')
+        if num_variables < 1:
+            raise ValueError('num_variables must be >= 1')
+        if degree < 0:
+            raise ValueError('Degree must be >= 0')
+        self.num_variables = num_variables
+        self.degree = degree
 
-        self.means = means
+        self.exponents = np.array(
+            [np.bincount(np.array(variables, dtype=np.int_),
+                         minlength=num_variables)
+             for total in range(degree + 1)
+             for variables in itertools.combinations_with_replacement(
+                 range(num_variables), total)],
+            dtype=np.int_).reshape((-1, num_variables))
+        self.exponents.flags.writeable = False
 
-        if gamma <= 0:
-            raise ValueError('gamma must be > 0')
+    def size(self):
+        """Return the number of monomials times the number of actions."""
+        return self.state_features_size() * self.num_actions
 
-        self.gamma = gamma
+    def evaluate(self, state, action):
+        r"""Calculate :math:`\phi` matrix for given state action pair.
 
-    @staticmethod
-    def __check_mean_size(left, right):
-        """Apply f if the value is not None.
+        Parameters
+        ----------
+        state : numpy.array
+            The state vector of shape (num_variables, ).
+        action : int
+            The action index.
 
-        This method is meant to be used with reduce. It will return either the
-        right most numpy array or None if any of the array's had
-        differing sizes. I wanted to use a Maybe monad here,
-        but Python doesn't support that out of the box.
+        Returns
+        -------
+        numpy.array
+            The :math:`\phi` vector. Used by Policy to compute Q-value.
 
-        Return
+        Raises
         ------
-        None or numpy.array
-            None values will propogate through the reduce automatically.
+        IndexError
+            If :math:`0 \le action < num\_actions` then IndexError is raised.
+        ValueError
+            If the state does not have shape (num_variables, ).
 
         """
-        if left is None or right is None:
-            return None
-        else:
-            if left.shape != right.shape:
-                return None
-        return right
+        if action < 0 or action >= self.num_actions:
+            raise IndexError('Action index out of bounds')
 
-    def size(self):
-        r"""Calculate size of the :math:`\phi` matrix.
+        return self._action_blocks(self.evaluate_state(state)[np.newaxis],
+                                   np.array([action]))[0]
 
-        The size is equal to the number of means + 1 times the number of
-        number actions.
+    def evaluate_batch(self, states, actions):
+        r"""Calculate the :math:`\phi` vectors of many state-action pairs.
 
-        Returns
-        -------
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, num_variables).
+        actions : numpy.array
+            Integer array of shape (N, ).
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, k) where row i equals
+            ``evaluate(states[i], actions[i])``.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If states does not have shape (N, num_variables).
+
+        """
+        actions = self._validate_actions(actions)
+        return self._action_blocks(self.evaluate_state_batch(states), actions)
+
+    def state_features_size(self):
+        """Return the number of monomials, the size of one action block."""
+        return self.exponents.shape[0]
+
+    def evaluate_state(self, state):
+        r"""Return the vector of monomials of the state.
+
+        Raises
+        ------
+        ValueError
+            If the state does not have shape (num_variables, ).
+
+        """
+        state = np.asarray(state)
+        if state.shape != (self.num_variables, ):
+            raise ValueError('State must have shape (%d, ): %s' %
+                             (self.num_variables, state.shape))
+
+        return self.evaluate_state_batch(state[np.newaxis])[0]
+
+    def evaluate_state_batch(self, states):
+        r"""Return the (N, number of monomials) matrix of :math:`\psi`.
+
+        Raises
+        ------
+        ValueError
+            If states does not have shape (N, num_variables).
+
+        """
+        states = np.asarray(states)
+        if states.ndim != 2 or states.shape[1] != self.num_variables:
+            raise ValueError('States must have shape (N, %d): %s' %
+                             (self.num_variables, states.shape))
+
+        # (N, num_variables, degree + 1)
+        powers = _powers(states, self.degree)
+        if self.num_variables == 1:
+            return powers[:, 0]
+
+        psi = powers[:, 0, self.exponents[:, 0]]
+        for variable in range(1, self.num_variables):
+            psi *= powers[:, variable, self.exponents[:, variable]]
+        return psi
+
+    @property
+    def num_actions(self):
+        """Return number of possible actions."""
+        return self.__num_actions
+
+    @num_actions.setter
+    def num_actions(self, value):
+        """Set the number of possible actions.
+
+        Parameters
+        ----------
+        value: int
+            Number of possible actions. Must be >= 1.
+
+        Raises
+        ------
+        ValueError
+            If value < 1.
+
+        """
+        if value < 1:
+            raise ValueError('num_actions must be at least 1.')
+        self.__num_actions = value
+
+
+class FourierBasis(BasisFunction):
+
+    r"""Fourier cosine features for a state with several variables.
+
+    The state is first scaled to :math:`x \in [0, 1]^d` with the bounds low
+    and high. For every coefficient vector c with entries in
+    :math:`\{0, \ldots, order\}` the basis has the feature
+    :math:`\cos(\pi c^T x)`, which includes the constant 1 for c = 0. The
+    coefficient vectors are the rows of the (:math:`(order + 1)^d`, d)
+    matrix coefficients, see Konidaris et al. "Value Function Approximation
+    in Reinforcement Learning using the Fourier Basis".
+
+    The scaling is folded into a precomputed frequency matrix and phase
+    vector, so a batch of states is evaluated with a single matrix product
+    followed by a cosine.
+
+    Parameters
+    ----------
+    low: numpy.array
+        Lower bound of every state variable.
+    high: numpy.array
+        Upper bound of every state variable. Must be greater than low.
+    order: int
+        Largest coefficient of a single state variable.
+    num_actions: int
+        The total number of possible actions.
+
+    Raises
+    ------
+    ValueError
+        If low and high do not have the same shape or low >= high.
+    ValueError
+        If order is less than 0
+    ValueError
+        If num_actions is less than 1
+
+    """
+
+    def __init__(self, low, high, order, num_actions):
+        """Initialize FourierBasis."""
+        self.__num_actions = BasisFunction._validate_num_actions(num_actions)
+
+        self.low = np.array(low, dtype=np.float64).reshape((-1, ))
+        self.high = np.array(high, dtype=np.float64).reshape((-1, ))
+        if self.low.shape != self.high.shape:
+            raise ValueError('low and high must have the same shape')
+        if np.any(self.low >= self.high):
+            raise ValueError('low must be less than high')
+        if order < 0:
+            raise ValueError('order must be >= 0')
+        self.order = order
+
+        self.coefficients = np.array(
+            list(itertools.product(range(order + 1),
+                                   repeat=self.low.shape[0])),
+            dtype=np.int_)
+        self.coefficients.flags.writeable = False
+
+        # cos(pi c^T (s - low) / (high - low)) = cos(frequencies s + phases)
+        self._frequencies = np.pi * self.coefficients / (self.high - self.low)
+        self._phases = -self._frequencies.dot(self.low)
+
+    def size(self):
+        """Return the number of coefficient vectors times num_actions."""
+        return self.state_features_size() * self.num_actions
+
+    def evaluate(self, state, action):
+        r"""Calculate :math:`\phi` matrix for given state action pair.
+
+        Parameters
+        ----------
+        state : numpy.array
+            The state vector with one entry per state variable.
+        action : int
+            The action index.
+
+        Returns
+        -------
+        numpy.array
+            The :math:`\phi` vector. Used by Policy to compute Q-value.
+
+        Raises
+        ------
+        IndexError
+            If :math:`0 \le action < num\_actions` then IndexError is raised.
+        ValueError
+            If the state does not have one entry per state variable.
+
+        """
+        if action < 0 or action >= self.num_actions:
+            raise IndexError('Action index out of bounds')
+
+        return self._action_blocks(self.evaluate_state(state)[np.newaxis],
+                                   np.array([action]))[0]
+
+    def evaluate_batch(self, states, actions):
+        r"""Calculate the :math:`\phi` vectors of many state-action pairs.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, number of state variables).
+        actions : numpy.array
+            Integer array of shape (N, ).
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, k) where row i equals
+            ``evaluate(states[i], actions[i])``.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If the states do not have one column per state variable.
+
+        """
+        actions = self._validate_actions(actions)
+        return self._action_blocks(self.evaluate_state_batch(states), actions)
+
+    def state_features_size(self):
+        """Return the number of coefficient vectors."""
+        return self.coefficients.shape[0]
+
+    def evaluate_state(self, state):
+        r"""Return :math:`\psi(s) = (\cos(\pi c_i^T x))`.
+
+        Raises
+        ------
+        ValueError
+            If the state does not have one entry per state variable.
+
+        """
+        state = np.asarray(state)
+        if state.shape != self.low.shape:
+            raise ValueError('State must have shape %s: %s' %
+                             (self.low.shape, state.shape))
+
+        return self.evaluate_state_batch(state[np.newaxis])[0]
+
+    def evaluate_state_batch(self, states):
+        r"""Return the (N, number of coefficient vectors) :math:`\psi` matrix.
+
+        Raises
+        ------
+        ValueError
+            If the states do not have one column per state variable.
+
+        """
+        states = np.asarray(states, dtype=np.float64)
+        if states.ndim != 2 or states.shape[1:] != self.low.shape:
+            raise ValueError('States must have one column per state '
+                             'variable: %s' % (states.shape, ))
+
+        psi = states.dot(self._frequencies.T)
+        psi += self._phases
+        return np.cos(psi, out=psi)
+
+    @property
+    def num_actions(self):
+        """Return number of possible actions."""
+        return self.__num_actions
+
+    @num_actions.setter
+    def num_actions(self, value):
+        """Set the number of possible actions.
+
+        Parameters
+        ----------
+        value: int
+            Number of possible actions. Must be >= 1.
+
+        Raises
+        ------
+        ValueError
+            If value < 1.
+
+        """
+        if value < 1:
+            raise ValueError('num_actions must be at least 1.')
+        self.__num_actions = value
+
+
+class RadialBasisFunction(BasisFunction):
+
+    r"""Gaussian Multidimensional Radial Basis Function (RBF).
+
+    Given a set of k means :math:`(\mu_1 , \ldots, \mu_k)` produce a feature
+    vector :math:`(1, e^{-\gamma || s - \mu_1 ||^2}, \cdots,
+    e^{-\gamma || s - \mu_k ||^2})` where `s` is the state vector and
+    :math:`\gamma` is a free parameter. This vector will be padded with
+    0's on both sides proportional to the number of possible actions
+    specified.
+
+    Parameters
+    ----------
+    means: list(numpy.array)
+        List of numpy arrays representing :math:`(\mu_1, \ldots, \mu_k)`.
+        Each :math:`\mu` is a numpy array with dimensions matching the state
+        vector this basis function will be used with. If the dimensions of each
+        vector are not equal than an exception will be raised. If no means are
+        specified then a ValueError will be raised
+    gamma: float
+        Free parameter which controls the size/spread of the Gaussian "bumps".
+        This parameter is best selected via tuning through cross validation.
+        gamma must be > 0.
+    num_actions: int
+        Number of actions. Must be in range [1, :math:`\infty`] otherwise
+        an exception will be raised.
+
+    Raises
+    ------
+    ValueError
+        If means list is empty
+    ValueError
+        If dimensions of each mean vector do not match.
+    ValueError
+        If gamma is <= 0.
+    ValueError
+        If num_actions is less than 1.
+
+    Note
+    ----
+
+    The means are copied into the read-only array attribute means of shape
+    (number of means, ) + mean shape.
+
+    """
+
+    def __init__(self, means, gamma, num_actions):
+        """Initialize RBF instance."""
+        self.__num_actions = BasisFunction._validate_num_actions(num_actions)
+
+        if len(means) == 0:
+            raise ValueError('You must specify at least one mean')
+
+        if reduce(RadialBasisFunction.__check_mean_size, means) is None:
+            raise ValueError('All mean vectors must have the same dimensions')
+
+        self.means = np.array(means, dtype=np.float64)
+        self.means.flags.writeable = False
+        self._mean_matrix = self.means.reshape((len(means), -1))
+        # distances are expanded relative to the centroid of the means so
+        # that states far from the origin do not lose precision
+        self._centroid = self._mean_matrix.mean(axis=0)
+        self._centered_means = self._mean_matrix - self._centroid
+        self._mean_sq_norms = np.einsum('ij,ij->i', self._centered_means,
+                                        self._centered_means)
+
+        if gamma <= 0:
+            raise ValueError('gamma must be > 0')
+
+        self.gamma = gamma
+
+    @staticmethod
+    def __check_mean_size(left, right):
+        """Apply f if the value is not None.
+
+        This method is meant to be used with reduce. It will return either the
+        right most numpy array or None if any of the array's had
+        differing sizes. I wanted to use a Maybe monad here,
+        but Python doesn't support that out of the box.
+
+        Return
+        ------
+        None or numpy.array
+            None values will propogate through the reduce automatically.
+
+        """
+        if left is None or right is None:
+            return None
+        else:
+            if left.shape != right.shape:
+                return None
+        return right
+
+    def size(self):
+        r"""Calculate size of the :math:`\phi` matrix.
+
+        The size is equal to the number of means + 1 times the number of
+        number actions.
+
+        Returns
+        -------
+        int
+            The size of the phi matrix that will be returned from evaluate.
+
+        """
+        return (len(self.means) + 1) * self.num_actions
+
+    def evaluate(self, state, action, out=None):
+        r"""Calculate the :math:`\phi` matrix.
+
+        Matrix will have the following form:
+
+        :math:`[\cdots, 1, e^{-\gamma || s - \mu_1 ||^2}, \cdots,
+        e^{-\gamma || s - \mu_k ||^2}, \cdots]`
+
+        where the matrix will be padded with 0's on either side depending
+        on the specified action index and the number of possible actions.
+
+        Parameters
+        ----------
+        state: numpy.array
+            The state vector. Must have the shape of the means.
+        action: int
+            The action index.
+        out: numpy.array or None
+            Float array of shape (size(), ) to write :math:`\phi` to instead
+            of allocating a new vector. Defaults to None.
+
+        Returns
+        -------
+        numpy.array
+            The :math:`\phi` vector. Used by Policy to compute Q-value.
+
+        Raises
+        ------
+        IndexError
+            If :math:`0 \le action < num\_actions` then IndexError is raised.
+        ValueError
+            If the state vector has any number of dimensions other than 1 a
+            ValueError is raised.
+        ValueError
+            If out does not have shape (size(), ).
+
+        """
+        if action < 0 or action >= self.num_actions:
+            raise IndexError('Action index out of bounds')
+
+        if out is None:
+            out = np.zeros((self.size(), ))
+        else:
+            _check_out(out, (self.size(), ))
+            out.fill(0.)
+
+        offset = (len(self.means)+1)*action
+        self.evaluate_state(state, out[offset:offset+len(self.means)+1])
+
+        return out
+
+    def evaluate_batch(self, states, actions, out=None):
+        r"""Calculate the :math:`\phi` vectors of many state-action pairs.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, ...) where each row has the shape of the means.
+        actions : numpy.array
+            Integer array of shape (N, ).
+        out: numpy.array or None
+            C-contiguous float array of shape (N, size()) to write the
+            result to. Defaults to None which allocates a new array.
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, k) where row i equals
+            ``evaluate(states[i], actions[i])``.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If the state dimensions do not match the mean dimensions.
+
+        """
+        actions = self._validate_actions(actions)
+        return self._action_blocks(self.evaluate_state_batch(states), actions,
+                                   out)
+
+    def state_features_size(self):
+        """Return the number of means + 1, the size of one action block."""
+        return len(self.means) + 1
+
+    def evaluate_state(self, state, out=None):
+        r"""Return :math:`\psi(s) = (1, e^{-\gamma || s - \mu_i ||^2})`.
+
+        All squared distances are computed at once as
+        :math:`||s||^2 + ||\mu_i||^2 - 2 \mu_i^T s` with the precomputed
+        squared norms of the means. The state and the means are first
+        shifted by the centroid of the means, which keeps the terms small
+        and avoids cancellation for states far from the origin.
+
+        Parameters
+        ----------
+        state: numpy.array
+            The state vector. Must have the shape of the means.
+        out: numpy.array or None
+            Float array of shape (number of means + 1, ) to write
+            :math:`\psi` to. Defaults to None which allocates a new vector.
+
+        Raises
+        ------
+        ValueError
+            If the state dimensions do not match the mean dimensions.
+        ValueError
+            If out has the wrong shape.
+
+        """
+        if state.shape != self.means.shape[1:]:
+            raise ValueError('Dimensions of state must match '
+                             'dimensions of means')
+
+        if out is None:
+            out = np.empty((len(self.means) + 1, ))
+        else:
+            _check_out(out, (len(self.means) + 1, ), contiguous=False)
+
+        state = state.reshape((-1, )) - self._centroid
+        sq_distances = self._mean_sq_norms - 2*self._centered_means.dot(state)
+        sq_distances += state.dot(state)
+
+        out[0] = 1.
+        self.__activate(sq_distances, out[1:])
+        return out
+
+    def evaluate_state_batch(self, states, out=None):
+        r"""Return the (N, number of means + 1) matrix of :math:`\psi` vectors.
+
+        The (N, number of means) squared distance matrix is computed with a
+        single matrix product, see evaluate_state.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, ...) where each row has the shape of the means.
+        out: numpy.array or None
+            Float array of shape (N, number of means + 1) to write the
+            result to. Defaults to None which allocates a new array.
+
+        Raises
+        ------
+        ValueError
+            If the state dimensions do not match the mean dimensions.
+        ValueError
+            If out has the wrong shape.
+
+        """
+        states = np.asarray(states)
+
+        if states.shape[1:] != self.means.shape[1:]:
+            raise ValueError('Dimensions of state must match '
+                             'dimensions of means')
+
+        num_states = states.shape[0]
+        if out is None:
+            out = np.empty((num_states, len(self.means) + 1))
+        else:
+            _check_out(out, (num_states, len(self.means) + 1),
+                       contiguous=False)
+
+        states = states.reshape((num_states, -1)) - self._centroid
+        sq_distances = states.dot(self._centered_means.T)
+        sq_distances *= -2
+        sq_distances += self._mean_sq_norms
+        sq_distances += np.einsum('ij,ij->i', states, states)[:, np.newaxis]
+
+        out[:, 0] = 1.
+        self.__activate(sq_distances, out[:, 1:])
+        return out
+
+    def __activate(self, sq_distances, out):
+        r"""Write :math:`e^{-\gamma d}` of the squared distances d to out.
+
+        sq_distances is used as scratch space.
+
+        """
+        # rounding in the expanded form can make distances slightly negative
+        np.maximum(sq_distances, 0., out=sq_distances)
+        sq_distances *= -self.gamma
+        np.exp(sq_distances, out=out)
+
+    @property
+    def num_actions(self):
+        """Return number of possible actions."""
+        return self.__num_actions
+
+    @num_actions.setter
+    def num_actions(self, value):
+        """Set the number of possible actions.
+
+        Parameters
+        ----------
+        value: int
+            Number of possible actions. Must be >= 1.
+
+        Raises
+        ------
+        ValueError
+            If value < 1.
+
+        """
+        if value < 1:
+            raise ValueError('num_actions must be at least 1.')
+        self.__num_actions = value
+
+
+class TruncatedRadialBasisFunction(RadialBasisFunction):
+
+    r"""Gaussian RBF that ignores means too far away to matter.
+
+    With many means most activations :math:`e^{-\gamma || s - \mu ||^2}`
+    are numerically zero. This basis treats activations below tolerance as
+    exactly zero, which is the case for every mean farther than the cutoff
+    radius :math:`\sqrt{-\ln(tolerance) / \gamma}` from the state. A KD-tree
+    over the means finds the means within the cutoff radius, so only those
+    activations are computed and evaluation cost scales with the number of
+    nearby means instead of the total number of means.
+
+    The features are sparse. Policy and the solvers use evaluate_sparse and
+    evaluate_sparse_batch, and the dense methods return the same truncated
+    values.
+
+    Parameters
+    ----------
+    means: list(numpy.array)
+        List of numpy arrays representing :math:`(\mu_1, \ldots, \mu_k)`,
+        see RadialBasisFunction.
+    gamma: float
+        Free parameter which controls the size/spread of the Gaussian "bumps".
+        gamma must be > 0.
+    num_actions: int
+        Number of actions. Must be in range [1, :math:`\infty`] otherwise
+        an exception will be raised.
+    tolerance: float
+        Activations below this value are set to zero. Must be in range
+        (0, 1). Defaults to 1e-6.
+
+    Raises
+    ------
+    ValueError
+        If any of the RadialBasisFunction parameters are invalid.
+    ValueError
+        If tolerance is not in range (0, 1).
+
+    """
+
+    def __init__(self, means, gamma, num_actions, tolerance=1e-6):
+        """Initialize TruncatedRadialBasisFunction instance."""
+        super(TruncatedRadialBasisFunction, self).__init__(means, gamma,
+                                                           num_actions)
+        if tolerance <= 0 or tolerance >= 1:
+            raise ValueError('tolerance must be in range (0, 1)')
+
+        self.tolerance = tolerance
+        self.radius = np.sqrt(-np.log(tolerance) / gamma)
+        self._tree = scipy.spatial.cKDTree(self._mean_matrix)
+
+    @property
+    def is_sparse(self):
+        r"""Return True. Only nearby means have non-zero activations."""
+        return True
+
+    def evaluate_sparse(self, state, action):
+        r"""Return the non-zero entries of the :math:`\phi` vector.
+
+        Raises
+        ------
+        IndexError
+            If action index < 0 or action index >= num_actions
+        ValueError
+            If the state dimensions do not match the mean dimensions.
+
+        """
+        if action < 0 or action >= self.num_actions:
+            raise IndexError('Action index out of bounds')
+
+        psi = self.__sparse_state_features(state[np.newaxis])
+        return psi.indices + action*psi.shape[1], psi.data
+
+    def evaluate_sparse_batch(self, states, actions):
+        r"""Return the sparse (N, k) matrix of :math:`\phi` vectors.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If the state dimensions do not match the mean dimensions.
+
+        """
+        actions = self._validate_actions(actions)
+        psi = self.__sparse_state_features(states)
+        if psi.shape[0] != actions.shape[0]:
+            raise ValueError('states and actions must have the same length')
+
+        offsets = np.repeat(actions*psi.shape[1], np.diff(psi.indptr))
+        return scipy.sparse.csr_matrix(
+            (psi.data, psi.indices + offsets, psi.indptr),
+            shape=(psi.shape[0], self.size()))
+
+    def evaluate_state(self, state, out=None):
+        r"""Return the truncated :math:`\psi` vector.
+
+        See RadialBasisFunction.evaluate_state for the parameters.
+
+        """
+        psi = self.__sparse_state_features(state[np.newaxis]).toarray()[0]
+        if out is None:
+            return psi
+        _check_out(out, psi.shape, contiguous=False)
+        out[:] = psi
+        return out
+
+    def evaluate_state_batch(self, states, out=None):
+        r"""Return the (N, number of means + 1) truncated :math:`\psi` matrix.
+
+        See RadialBasisFunction.evaluate_state_batch for the parameters.
+
+        """
+        psi = self.__sparse_state_features(states).toarray()
+        if out is None:
+            return psi
+        _check_out(out, psi.shape, contiguous=False)
+        out[:] = psi
+        return out
+
+    def evaluate_sparse_state_batch(self, states):
+        r"""Return the sparse (N, number of means + 1) :math:`\psi` matrix.
+
+        Raises
+        ------
+        ValueError
+            If the state dimensions do not match the mean dimensions.
+
+        """
+        return self.__sparse_state_features(states)
+
+    def __sparse_state_features(self, states):
+        r"""Return the sparse (N, number of means + 1) :math:`\psi` matrix."""
+        states = np.asarray(states, dtype=np.float64)
+        if states.shape[1:] != self.means.shape[1:]:
+            raise ValueError('Dimensions of state must match '
+                             'dimensions of means')
+
+        num_states = states.shape[0]
+        states = states.reshape((num_states, -1))
+        if num_states == 0:
+            return scipy.sparse.csr_matrix((0, len(self.means) + 1))
+
+        neighbors = self._tree.query_ball_point(states, self.radius)
+        rows = np.repeat(np.arange(num_states),
+                         [len(indices) for indices in neighbors])
+        columns = np.concatenate([np.asarray(indices, dtype=np.int_)
+                                  for indices in neighbors])
+
+        diff = states[rows] - self._mean_matrix[columns]
+        values = np.exp(-self.gamma*np.einsum('ij,ij->i', diff, diff))
+        keep = values >= self.tolerance
+
+        # column 0 is the constant feature, means start at column 1
+        return scipy.sparse.csr_matrix(
+            (np.concatenate([np.ones(num_states), values[keep]]),
+             (np.concatenate([np.arange(num_states), rows[keep]]),
+              np.concatenate([np.zeros(num_states, dtype=np.int_),
+                              columns[keep] + 1]))),
+            shape=(num_states, len(self.means) + 1))
+
+
+class RandomFourierBasis(BasisFunction):
+
+    r"""Random Fourier features approximating the Gaussian RBF kernel.
+
+    Draws D random frequencies :math:`\omega_i \sim N(0, 2 \gamma I)` and
+    phases :math:`b_i \sim U(0, 2 \pi)` once and produces the feature vector
+    :math:`(1, \sqrt{2/D} \cos(\omega_1^T s + b_1), \cdots,
+    \sqrt{2/D} \cos(\omega_D^T s + b_D))`. The inner product of the
+    features of two states is 1 plus an unbiased estimate of the kernel
+    :math:`e^{-\gamma || s - s' ||^2}` used by RadialBasisFunction, with an
+    error that shrinks as :math:`O(1/\sqrt{D})`.
+
+    Unlike RadialBasisFunction the number of features does not depend on
+    how many centers would be needed to cover the state space, so the size
+    of the LSTDQ system can be chosen directly. A batch of states is
+    evaluated with a single matrix product.
+
+    Parameters
+    ----------
+    state_shape: tuple(int) or int
+        Shape of the state vectors this basis function will be used with.
+    num_features: int
+        Number of random features D, not counting the constant feature.
+    gamma: float
+        Free parameter of the approximated kernel, see RadialBasisFunction.
+        gamma must be > 0.
+    num_actions: int
+        Number of actions. Must be in range [1, :math:`\infty`] otherwise
+        an exception will be raised.
+    random_state: int, numpy.random.RandomState or None
+        Seed or source of randomness for the frequencies and phases.
+        Defaults to None which uses numpy.random.
+
+    Raises
+    ------
+    ValueError
+        If num_features is less than 1.
+    ValueError
+        If gamma is <= 0.
+    ValueError
+        If num_actions is less than 1.
+
+    Note
+    ----
+
+    The frequencies and phases are stored in the read-only array attributes
+    frequencies of shape (num_features, state size) and phases of shape
+    (num_features, ).
+
+    """
+
+    def __init__(self, state_shape, num_features, gamma, num_actions,
+                 random_state=None):
+        """Initialize RandomFourierBasis instance."""
+        self.__num_actions = BasisFunction._validate_num_actions(num_actions)
+
+        if num_features < 1:
+            raise ValueError('num_features must be >= 1')
+        if gamma <= 0:
+            raise ValueError('gamma must be > 0')
+
+        if random_state is None:
+            random_state = np.random
+        elif not isinstance(random_state, np.random.RandomState):
+            random_state = np.random.RandomState(random_state)
+
+        self.state_shape = tuple(int(dim)
+                                 for dim in np.atleast_1d(state_shape))
+        self.num_features = int(num_features)
+        self.gamma = gamma
+
+        state_size = int(np.prod(self.state_shape))
+        self.frequencies = random_state.normal(
+            scale=np.sqrt(2*gamma), size=(self.num_features, state_size))
+        self.frequencies.flags.writeable = False
+        self.phases = random_state.uniform(0, 2*np.pi, self.num_features)
+        self.phases.flags.writeable = False
+        self._scale = np.sqrt(2. / self.num_features)
+
+    def size(self):
+        r"""Calculate size of the :math:`\phi` matrix.
+
+        The size is equal to num_features + 1 times the number of actions.
+
+        Returns
+        -------
+        int
+            The size of the phi matrix that will be returned from evaluate.
+
+        """
+        return (self.num_features + 1) * self.num_actions
+
+    def evaluate(self, state, action, out=None):
+        r"""Calculate the :math:`\phi` matrix.
+
+        The :math:`\psi` vector of the state is placed in the block of the
+        action and the rest of the vector is 0.
+
+        Parameters
+        ----------
+        state: numpy.array
+            The state vector. Must have shape state_shape.
+        action: int
+            The action index.
+        out: numpy.array or None
+            Float array of shape (size(), ) to write :math:`\phi` to instead
+            of allocating a new vector. Defaults to None.
+
+        Returns
+        -------
+        numpy.array
+            The :math:`\phi` vector. Used by Policy to compute Q-value.
+
+        Raises
+        ------
+        IndexError
+            If :math:`0 \le action < num\_actions` then IndexError is raised.
+        ValueError
+            If the state does not have shape state_shape.
+        ValueError
+            If out does not have shape (size(), ).
+
+        """
+        if action < 0 or action >= self.num_actions:
+            raise IndexError('Action index out of bounds')
+
+        if out is None:
+            out = np.zeros((self.size(), ))
+        else:
+            _check_out(out, (self.size(), ))
+            out.fill(0.)
+
+        offset = (self.num_features+1)*action
+        self.evaluate_state(state, out[offset:offset+self.num_features+1])
+
+        return out
+
+    def evaluate_batch(self, states, actions, out=None):
+        r"""Calculate the :math:`\phi` vectors of many state-action pairs.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, ) + state_shape.
+        actions : numpy.array
+            Integer array of shape (N, ).
+        out: numpy.array or None
+            C-contiguous float array of shape (N, size()) to write the
+            result to. Defaults to None which allocates a new array.
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, k) where row i equals
+            ``evaluate(states[i], actions[i])``.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If the states do not have shape (N, ) + state_shape.
+
+        """
+        actions = self._validate_actions(actions)
+        return self._action_blocks(self.evaluate_state_batch(states), actions,
+                                   out)
+
+    def state_features_size(self):
+        """Return num_features + 1, the size of one action block."""
+        return self.num_features + 1
+
+    def evaluate_state(self, state, out=None):
+        r"""Return :math:`\psi(s) = (1, \sqrt{2/D} \cos(\omega_i^T s + b_i))`.
+
+        Parameters
+        ----------
+        state: numpy.array
+            The state vector. Must have shape state_shape.
+        out: numpy.array or None
+            Float array of shape (num_features + 1, ) to write :math:`\psi`
+            to. Defaults to None which allocates a new vector.
+
+        Raises
+        ------
+        ValueError
+            If the state does not have shape state_shape.
+        ValueError
+            If out has the wrong shape.
+
+        """
+        state = np.asarray(state)
+        if state.shape != self.state_shape:
+            raise ValueError('State must have shape %s: %s' %
+                             (self.state_shape, state.shape))
+
+        if out is None:
+            out = np.empty((self.num_features + 1, ))
+        else:
+            _check_out(out, (self.num_features + 1, ), contiguous=False)
+
+        out[0] = 1.
+        self.__activate(
+            self.frequencies.dot(state.reshape((-1, )).astype(np.float64)),
+            out[1:])
+        return out
+
+    def evaluate_state_batch(self, states, out=None):
+        r"""Return the (N, num_features + 1) matrix of :math:`\psi` vectors.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, ) + state_shape.
+        out: numpy.array or None
+            Float array of shape (N, num_features + 1) to write the result
+            to. Defaults to None which allocates a new array.
+
+        Raises
+        ------
+        ValueError
+            If the states do not have shape (N, ) + state_shape.
+        ValueError
+            If out has the wrong shape.
+
+        """
+        states = np.asarray(states)
+        if states.shape[1:] != self.state_shape:
+            raise ValueError('States must have shape (N, ) + %s: %s' %
+                             (self.state_shape, states.shape))
+
+        num_states = states.shape[0]
+        if out is None:
+            out = np.empty((num_states, self.num_features + 1))
+        else:
+            _check_out(out, (num_states, self.num_features + 1),
+                       contiguous=False)
+
+        states = states.reshape((num_states, -1)).astype(np.float64)
+
+        out[:, 0] = 1.
+        self.__activate(states.dot(self.frequencies.T), out[:, 1:])
+        return out
+
+    def __activate(self, projections, out):
+        r"""Write :math:`\sqrt{2/D} \cos(p + b)` of the projections p to out.
+
+        projections is used as scratch space.
+
+        """
+        projections += self.phases
+        np.cos(projections, out=out)
+        out *= self._scale
+
+    @property
+    def num_actions(self):
+        """Return number of possible actions."""
+        return self.__num_actions
+
+    @num_actions.setter
+    def num_actions(self, value):
+        """Set the number of possible actions.
+
+        Parameters
+        ----------
+        value: int
+            Number of possible actions. Must be >= 1.
+
+        Raises
+        ------
+        ValueError
+            If value < 1.
+
+        """
+        if value < 1:
+            raise ValueError('num_actions must be at least 1.')
+        self.__num_actions = value
+
+
+class TileCodingBasis(BasisFunction):
+
+    r"""Tile coding over a box shaped continuous state space.
+
+    Each of the num_tilings tilings splits the box [low, high] into a grid
+    of num_tiles tiles per state variable, shifted by a fraction of a tile
+    width given by offsets. A state activates exactly one tile of every
+    tiling, so :math:`\psi(s)` has num_tilings ones and is zero everywhere
+    else. States outside the box activate the nearest edge tiles.
+
+    Evaluation only computes the index of the active tile of every tiling,
+    so the cost is :math:`O(num\_tilings)` per state no matter how many
+    tiles there are. The basis is sparse and Policy and the solvers use the
+    active indices directly.
+
+    A fine grid over many state variables has more tiles than can be
+    stored. If table_size is given every tile is hashed into a table of
+    that many features instead, so the size of :math:`\psi` is fixed.
+    Tiles that collide share a feature and when two active tiles of the
+    same state collide the feature has value 2.
+
+    Parameters
+    ----------
+    low: numpy.array
+        Lower bound of every state variable.
+    high: numpy.array
+        Upper bound of every state variable. Must be greater than low.
+    num_tiles: int or list(int)
+        Number of tiles per state variable in one tiling, either the same
+        for every variable or one value per variable. Every tiling has one
+        extra tile per variable to cover the box after it is shifted.
+    num_tilings: int
+        Number of tilings.
+    num_actions: int
+        Number of actions. Must be in range [1, :math:`\infty`] otherwise
+        an exception will be raised.
+    offsets: numpy.array or None
+        (num_tilings, number of state variables) array of the shift of each
+        tiling in tile widths, in range [0, 1). Defaults to None which
+        shifts tiling t by :math:`t (1, 3, 5, \ldots) / num\_tilings` modulo
+        1, the asymmetric displacement recommended by Sutton and Barto.
+    table_size: int or None
+        Number of features to hash the tiles into. Defaults to None which
+        gives every tile its own feature.
+
+    Raises
+    ------
+    ValueError
+        If low and high do not have the same shape or low >= high.
+    ValueError
+        If num_tiles or num_tilings is less than 1.
+    ValueError
+        If num_actions is less than 1.
+    ValueError
+        If offsets has the wrong shape or is out of range.
+    ValueError
+        If table_size is less than 1.
+
+    """
+
+    def __init__(self, low, high, num_tiles, num_tilings, num_actions,
+                 offsets=None, table_size=None):
+        """Initialize TileCodingBasis instance."""
+        self.__num_actions = BasisFunction._validate_num_actions(num_actions)
+
+        self.low = np.array(low, dtype=np.float64).reshape((-1, ))
+        self.high = np.array(high, dtype=np.float64).reshape((-1, ))
+        if self.low.shape != self.high.shape:
+            raise ValueError('low and high must have the same shape')
+        if np.any(self.low >= self.high):
+            raise ValueError('low must be less than high')
+        num_variables = self.low.shape[0]
+
+        self.num_tiles = np.array(np.broadcast_to(num_tiles, self.low.shape),
+                                  dtype=np.int_)
+        if np.any(self.num_tiles < 1):
+            raise ValueError('num_tiles must be >= 1')
+        if num_tilings < 1:
+            raise ValueError('num_tilings must be >= 1')
+        self.num_tilings = int(num_tilings)
+
+        if offsets is None:
+            offsets = np.outer(np.arange(self.num_tilings),
+                               2*np.arange(num_variables) + 1)
+            offsets = (offsets / float(self.num_tilings)) % 1.
+        self.offsets = np.array(offsets, dtype=np.float64)
+        if self.offsets.shape != (self.num_tilings, num_variables):
+            raise ValueError('offsets must have shape (%d, %d)' %
+                             (self.num_tilings, num_variables))
+        if np.any(self.offsets < 0) or np.any(self.offsets >= 1):
+            raise ValueError('offsets must be in range [0, 1)')
+
+        if table_size is not None and table_size < 1:
+            raise ValueError('table_size must be >= 1')
+        self.table_size = table_size
+
+        self._tile_widths = (self.high - self.low) / self.num_tiles
+        grid_shape = self.num_tiles + 1
+        self._strides = np.concatenate(
+            [[1], np.cumprod(grid_shape[:-1])]).astype(np.uint64)
+        self._tiles_per_tiling = int(np.prod(grid_shape.astype(np.object_)))
+
+    def size(self):
+        r"""Return the size of the :math:`\phi` vector.
+
+        The size of one action block is table_size if the tiles are hashed
+        and the total number of tiles of all tilings otherwise.
+
+        Returns
+        -------
         int
             The size of the phi matrix that will be returned from evaluate.
 
         """
-        return (len(self.means) + 1) * self.num_actions
+        return self.state_features_size() * self.num_actions
 
     def evaluate(self, state, action):
-        r"""Calculate the :math:`\phi` matrix.
-
-        Matrix will have the following form:
-
-        :math:`[\cdots, 1, e^{-\gamma || s - \mu_1 ||^2}, \cdots,
-        e^{-\gamma || s - \mu_k ||^2}, \cdots]`
+        r"""Return the :math:`\phi` vector of a state-action pair.
 
-        where the matrix will be padded with 0's on either side depending
-        on the specified action index and the number of possible actions.
+        Parameters
+        ----------
+        state: numpy.array
+            The state vector with one entry per state variable.
+        action: int
+            The action index.
 
         Returns
         -------
@@ -443,33 +1918,171 @@ class RadialBasisFunction(BasisFunction):
         IndexError
             If :math:`0 \le action < num\_actions` then IndexError is raised.
         ValueError
-            If the state vector has any number of dimensions other than 1 a
-            ValueError is raised.
+            If the state does not have one entry per state variable.
+
+        """
+        indices, values = self.evaluate_sparse(state, action)
+
+        phi = np.zeros((self.size(), ))
+        phi[indices] = values
+        return phi
+
+    def evaluate_batch(self, states, actions):
+        r"""Calculate the :math:`\phi` vectors of many state-action pairs.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (N, number of state variables).
+        actions : numpy.array
+            Integer array of shape (N, ).
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, k) where row i equals
+            ``evaluate(states[i], actions[i])``.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If the states do not have one column per state variable.
+
+        """
+        return self.evaluate_sparse_batch(states, actions).toarray()
+
+    @property
+    def is_sparse(self):
+        r"""Return True. Every :math:`\phi` vector has num_tilings ones."""
+        return True
+
+    def evaluate_sparse(self, state, action):
+        r"""Return the active indices of the :math:`\phi` vector.
+
+        Returns
+        -------
+        (numpy.array, numpy.array)
+            The sorted indices of the active tiles and their values.
+
+        Raises
+        ------
+        IndexError
+            If action index < 0 or action index >= num_actions
+        ValueError
+            If the state does not have one entry per state variable.
 
         """
         if action < 0 or action >= self.num_actions:
             raise IndexError('Action index out of bounds')
 
-        if state.shape != self.means[0].shape:
-            raise ValueError('Dimensions of state must match '
-                             'dimensions of means')
+        tiles = self._active_tiles(np.asarray(state)[np.newaxis])[0]
+        indices, counts = np.unique(tiles, return_counts=True)
+        return (indices + action*self.state_features_size(),
+                counts.astype(np.float64))
 
-        phi = np.zeros((self.size(), ))
-        offset = (len(self.means[0])+1)*action
+    def evaluate_sparse_batch(self, states, actions):
+        r"""Return the sparse (N, k) matrix of :math:`\phi` vectors.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If the states do not have one column per state variable.
 
-        rbf = [RadialBasisFunction.__calc_basis_component(state,
-                                                          mean,
-                                                          self.gamma)
-               for mean in self.means]
-        phi[offset] = 1.
-        phi[offset+1:offset+1+len(rbf)] = rbf
+        """
+        actions = self._validate_actions(actions)
+        tiles = self._active_tiles(states)
+        if tiles.shape[0] != actions.shape[0]:
+            raise ValueError('states and actions must have the same length')
 
-        return phi
+        indices = tiles + (actions*self.state_features_size())[:, np.newaxis]
+        return self.__sparse_matrix(indices, self.size())
 
-    @staticmethod
-    def __calc_basis_component(state, mean, gamma):
-        mean_diff = state - mean
-        return np.exp(-gamma*np.sum(mean_diff*mean_diff))
+    def state_features_size(self):
+        """Return the number of features of one action block."""
+        if self.table_size is not None:
+            return self.table_size
+        return self.num_tilings * self._tiles_per_tiling
+
+    def evaluate_state(self, state):
+        r"""Return the :math:`\psi` vector with a one for every active tile.
+
+        Raises
+        ------
+        ValueError
+            If the state does not have one entry per state variable.
+
+        """
+        return self.evaluate_state_batch(np.asarray(state)[np.newaxis])[0]
+
+    def evaluate_state_batch(self, states):
+        r"""Return the (N, state_features_size()) matrix of :math:`\psi`.
+
+        Raises
+        ------
+        ValueError
+            If the states do not have one column per state variable.
+
+        """
+        return self.evaluate_sparse_state_batch(states).toarray()
+
+    def evaluate_sparse_state_batch(self, states):
+        r"""Return the sparse (N, state_features_size()) :math:`\psi` matrix.
+
+        Raises
+        ------
+        ValueError
+            If the states do not have one column per state variable.
+
+        """
+        return self.__sparse_matrix(self._active_tiles(states),
+                                    self.state_features_size())
+
+    def _active_tiles(self, states):
+        """Return the (N, num_tilings) feature indices of the active tiles.
+
+        Raises
+        ------
+        ValueError
+            If the states do not have one column per state variable.
+
+        """
+        states = np.asarray(states, dtype=np.float64)
+        if states.ndim != 2 or states.shape[1] != self.low.shape[0]:
+            raise ValueError('States must have one column per state '
+                             'variable: %s' % (states.shape, ))
+
+        scaled = (states - self.low) / self._tile_widths
+        coordinates = np.floor(scaled[:, np.newaxis] + self.offsets)
+        np.clip(coordinates, 0, self.num_tiles, out=coordinates)
+
+        # unsigned arithmetic so that hashed grids too large to index
+        # wrap around instead of overflowing
+        tiles = coordinates.astype(np.uint64).dot(self._strides)
+        if self.table_size is None:
+            tiles += (np.arange(self.num_tilings, dtype=np.uint64)
+                      * np.uint64(self._tiles_per_tiling))
+            return tiles.astype(np.int_)
+
+        tiles += (np.arange(self.num_tilings, dtype=np.uint64)
+                  * np.uint64(_HASH_MULTIPLIER))
+        tiles *= np.uint64(_HASH_MULTIPLIER)
+        tiles ^= tiles >> np.uint64(32)
+        return (tiles % np.uint64(self.table_size)).astype(np.int_)
+
+    def __sparse_matrix(self, indices, num_columns):
+        """Return a CSR matrix with a one at every index of every row."""
+        num_rows = indices.shape[0]
+        matrix = scipy.sparse.csr_matrix(
+            (np.ones(indices.size), indices.reshape((-1, )),
+             np.arange(num_rows + 1)*self.num_tilings),
+            shape=(num_rows, num_columns))
+        # colliding hashed tiles add up
+        matrix.sum_duplicates()
+        return matrix
 
     @property
     def num_actions(self):
@@ -597,6 +2210,129 @@ class ExactBasis(BasisFunction):
             If any of the state variables are < 0 or >= the corresponding
             value in the num_states list used during construction.
         """
+        self._validate_state(state)
+
+        phi = np.zeros(self.size())
+        phi[self.get_state_action_index(state, action)] = 1
+
+        return phi
+
+    def evaluate_batch(self, states, actions):
+        r"""Return a matrix whose rows each have a single non-zero value.
+
+        Parameters
+        ----------
+        states: numpy.array
+            Integer array of shape (N, number of state variables).
+        actions: numpy.array
+            Integer array of shape (N, ).
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, k) where row i equals
+            ``evaluate(states[i], actions[i])``.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If the states do not have one column per state variable.
+        ValueError
+            If any of the state variables are < 0 or >= the corresponding
+            value in the num_states list used during construction.
+
+        """
+        indices = self._state_action_indices(states, actions)
+
+        phi = np.zeros((indices.shape[0], self.size()))
+        phi[np.arange(indices.shape[0]), indices] = 1
+
+        return phi
+
+    @property
+    def is_sparse(self):
+        r"""Return True. Every :math:`\phi` vector has one non-zero entry."""
+        return True
+
+    def evaluate_sparse(self, state, action):
+        r"""Return the single non-zero index of :math:`\phi` and its value 1.
+
+        Raises
+        ------
+        IndexError
+            If action index < 0 or action index > num_actions
+        ValueError
+            If the state is invalid. See evaluate.
+
+        """
+        self._validate_state(state)
+        return (np.array([self.get_state_action_index(state, action)]),
+                np.ones((1, )))
+
+    def evaluate_sparse_batch(self, states, actions):
+        """Return a sparse matrix with a single one in each row.
+
+        Raises
+        ------
+        IndexError
+            If any action index is out of bounds.
+        ValueError
+            If any state is invalid. See evaluate_batch.
+
+        """
+        indices = self._state_action_indices(states, actions)
+        return scipy.sparse.csr_matrix(
+            (np.ones(indices.shape[0]), indices,
+             np.arange(indices.shape[0] + 1)),
+            shape=(indices.shape[0], self.size()))
+
+    def state_features_size(self):
+        """Return the number of discrete states, the size of one block."""
+        return int(self.size() / self.__num_actions)
+
+    def evaluate_state(self, state):
+        r"""Return a :math:`\psi` vector with a one at the state's index.
+
+        Raises
+        ------
+        ValueError
+            If the size of the state does not match the the size of the
+            num_states list used during construction.
+        ValueError
+            If any of the state variables are < 0 or >= the corresponding
+            value in the num_states list used during construction.
+
+        """
+        self._validate_state(state)
+
+        psi = np.zeros(self.state_features_size())
+        psi[self.get_state_action_index(state, 0)] = 1
+
+        return psi
+
+    def evaluate_state_batch(self, states):
+        r"""Return the (N, number of discrete states) one-hot matrix.
+
+        Raises
+        ------
+        ValueError
+            If the states do not have one column per state variable.
+        ValueError
+            If any of the state variables are < 0 or >= the corresponding
+            value in the num_states list used during construction.
+
+        """
+        indices = self._state_indices(states)
+
+        psi = np.zeros((indices.shape[0], self.state_features_size()))
+        psi[np.arange(indices.shape[0]), indices] = 1
+
+        return psi
+
+    def _validate_state(self, state):
+        """Raise ValueError if state is not a valid discrete state."""
         if len(state) != len(self._num_states):
             raise ValueError('Number of state variables must match '
                              + 'size of num_states.')
@@ -607,10 +2343,31 @@ class ExactBasis(BasisFunction):
                 raise ValueError('state values must be <= corresponding '
                                  + 'num_states value.')
 
-        phi = np.zeros(self.size())
-        phi[self.get_state_action_index(state, action)] = 1
+    def _state_indices(self, states):
+        """Return the index of each state within one action block."""
+        states = np.asarray(states)
 
-        return phi
+        if states.ndim != 2 or states.shape[1] != len(self._num_states):
+            raise ValueError('Number of state variables must match '
+                             + 'size of num_states.')
+        if np.any(states < 0):
+            raise ValueError('state cannot contain negative values.')
+        if np.any(states >= np.asarray(self._num_states)):
+            raise ValueError('state values must be <= corresponding '
+                             + 'num_states value.')
+
+        return states.astype(np.int_).dot(self._offsets)
+
+    def _state_action_indices(self, states, actions):
+        """Return the non-zero index of each row of a batch."""
+        actions = self._validate_actions(actions)
+        indices = self._state_indices(states)
+
+        if indices.shape[0] != actions.shape[0]:
+            raise ValueError('states and actions must have the same length')
+
+        states_per_action = int(self.size() / self.__num_actions)
+        return actions*states_per_action + indices
 
     @property
     def num_actions(self):
@@ -634,3 +2391,25 @@ class ExactBasis(BasisFunction):
         if value < 1:
             raise ValueError('num_actions must be at least 1.')
         self.__num_actions = value
+
+
+def _powers(values, degree):
+    r"""Return the powers :math:`v^0, v^1, \ldots, v^{degree}` of values.
+
+    The powers are computed with a cumulative product, so the result has
+    shape values.shape + (degree + 1, ).
+
+    """
+    values = np.asarray(values, dtype=np.float64)
+    powers = np.empty(values.shape + (degree + 1, ))
+    powers[..., 0] = 1.
+    powers[..., 1:] = values[..., np.newaxis]
+    return np.cumprod(powers, axis=-1, out=powers)
+
+
+def _check_out(out, shape, contiguous=True):
+    """Raise ValueError if out can not hold a result of the given shape."""
+    if out.shape != shape:
+        raise ValueError('out must have shape %s: %s' % (shape, out.shape))
+    if contiguous and not out.flags.c_contiguous:
+        raise ValueError('out must be C-contiguous')
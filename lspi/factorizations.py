@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Dense linear system backends used by the LSTDQ solvers."""
+
+import abc
+import logging
+import warnings
+
+import numpy as np
+
+import scipy.linalg
+import scipy.linalg.lapack
+
+
+class Factorization(object):
+
+    r"""ABC for backends that solve the LSTDQ system :math:`Aw = b`.
+
+    Each call to solve factorizes A exactly once. The factorization is used
+    both to solve the system and to estimate the reciprocal condition number
+    of A, which is stored in the rcond attribute. If rcond is below the
+    rank threshold the matrix is treated as rank deficient, a warning is
+    logged and a least squares solution is returned instead.
+
+    Parameters
+    ----------
+    rcond_threshold: float or None
+        Reciprocal condition number below which A is considered rank
+        deficient. Defaults to None which uses k times the machine epsilon.
+
+    Attributes
+    ----------
+    rcond: float or None
+        Reciprocal condition number estimate of the last solved matrix.
+    rank_deficient: bool or None
+        True if the last solved matrix was treated as rank deficient.
+
+    """
+
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, rcond_threshold=None):
+        """Initialize Factorization."""
+        self.rcond_threshold = rcond_threshold
+        self.rcond = None
+        self.rank_deficient = None
+
+    def solve(self, a_mat, b_vec):
+        """Solve the linear system and record the diagnostics.
+
+        Parameters
+        ----------
+        a_mat: numpy.array
+            The (k, k) A matrix.
+        b_vec: numpy.array
+            The b vector with k rows.
+
+        Returns
+        -------
+        numpy.array
+            The (k, ) solution vector.
+
+        """
+        k = a_mat.shape[0]
+        b_vec = np.asarray(b_vec).reshape((-1, ))
+
+        threshold = self.rcond_threshold
+        if threshold is None:
+            threshold = k*np.finfo(np.float64).eps
+
+        w = self._solve(a_mat, b_vec, threshold)
+        if self.rank_deficient:
+            logging.warning('A matrix is not full rank. rcond %g < %g',
+                            self.rcond, threshold)
+        return w.reshape((-1, ))
+
+    @abc.abstractmethod
+    def _solve(self, a_mat, b_vec, threshold):
+        """Factorize a_mat, set rcond and rank_deficient and solve."""
+        pass  # pragma: no cover
+
+
+class LUFactorization(Factorization):
+
+    """LU factorization with partial pivoting.
+
+    The condition number is estimated from the LU factors with LAPACK's
+    gecon in :math:`O(k^2)`. Rank deficient matrices are solved with
+    scipy.linalg.lstsq. This is the default backend of LSTDQSolver.
+
+    """
+
+    def _solve(self, a_mat, b_vec, threshold):
+        """Solve with the LU factors of a_mat."""
+        with warnings.catch_warnings():
+            # exactly singular matrices are detected through rcond below
+            warnings.simplefilter('ignore')
+            lu, piv = scipy.linalg.lu_factor(a_mat)
+
+        gecon, = scipy.linalg.lapack.get_lapack_funcs(('gecon', ), (lu, ))
+        self.rcond = gecon(lu, np.linalg.norm(a_mat, 1), norm='1')[0]
+        self.rank_deficient = not self.rcond > threshold
+
+        if self.rank_deficient:
+            return scipy.linalg.lstsq(a_mat, b_vec)[0]
+        return scipy.linalg.lu_solve((lu, piv), b_vec)
+
+
+class QRFactorization(Factorization):
+
+    r"""Column pivoted (rank revealing) QR factorization.
+
+    With :math:`AP = QR` the diagonal of R is non-increasing in magnitude, so
+    :math:`|R_{kk}| / |R_{11}|` is used as the reciprocal condition estimate
+    and the number of diagonal entries above the threshold as the rank. A
+    rank deficient system is solved for the basic least squares solution
+    that only uses the first rank pivoted columns.
+
+    """
+
+    def _solve(self, a_mat, b_vec, threshold):
+        """Solve with the pivoted QR factors of a_mat."""
+        q_mat, r_mat, permutation = scipy.linalg.qr(a_mat, pivoting=True)
+        diagonal = np.abs(np.diag(r_mat))
+
+        if diagonal[0] == 0:
+            self.rcond = 0.
+            self.rank_deficient = True
+            return np.zeros(a_mat.shape[1])
+
+        self.rcond = diagonal[-1] / diagonal[0]
+        rank = np.count_nonzero(diagonal > threshold*diagonal[0])
+        self.rank_deficient = rank < a_mat.shape[0]
+
+        w = np.zeros(a_mat.shape[1])
+        w[permutation[:rank]] = scipy.linalg.solve_triangular(
+            r_mat[:rank, :rank], q_mat[:, :rank].T.dot(b_vec))
+        return w
+
+
+class CholeskyFactorization(Factorization):
+
+    r"""Cholesky factorization of the normal equations.
+
+    Solves :math:`A^T A w = A^T b`. :math:`A^T A` is symmetric positive
+    definite whenever A is full rank, so the cheapest factorization can be
+    used even though A itself is not symmetric. The condition number of the
+    normal equations is the square of that of A, so rcond is the square
+    root of LAPACK's pocon estimate. The rank threshold is applied to the
+    pocon estimate itself, because that is the conditioning of the system
+    that is actually solved. If the Cholesky factorization fails or the
+    normal equations are poorly conditioned, scipy.linalg.lstsq is used on
+    A.
+
+    """
+
+    def _solve(self, a_mat, b_vec, threshold):
+        """Solve the normal equations with the Cholesky factor."""
+        normal_mat = a_mat.T.dot(a_mat)
+        try:
+            factor = scipy.linalg.cho_factor(normal_mat)
+        except np.linalg.LinAlgError:
+            normal_rcond = 0.
+        else:
+            pocon, = scipy.linalg.lapack.get_lapack_funcs(('pocon', ),
+                                                          (factor[0], ))
+            normal_rcond = max(pocon(factor[0],
+                                     np.linalg.norm(normal_mat, 1),
+                                     uplo='L' if factor[1] else 'U')[0], 0.)
+
+        self.rcond = np.sqrt(normal_rcond)
+        self.rank_deficient = not normal_rcond > threshold
+        if self.rank_deficient:
+            return scipy.linalg.lstsq(a_mat, b_vec)[0]
+        return scipy.linalg.cho_solve(factor, a_mat.T.dot(b_vec))
+
+
+class SVDFactorization(Factorization):
+
+    r"""Singular value decomposition.
+
+    The most expensive but most robust backend. rcond is the exact ratio of
+    the smallest to the largest singular value. Singular values below the
+    threshold are treated as zero, which gives the minimum norm least
+    squares solution for rank deficient matrices from the same
+    decomposition.
+
+    """
+
+    def _solve(self, a_mat, b_vec, threshold):
+        """Solve with the pseudo-inverse from the SVD of a_mat."""
+        u_mat, singular_values, vt_mat = scipy.linalg.svd(a_mat)
+
+        if singular_values[0] == 0:
+            self.rcond = 0.
+            self.rank_deficient = True
+            return np.zeros(a_mat.shape[1])
+
+        self.rcond = singular_values[-1] / singular_values[0]
+        rank = np.count_nonzero(singular_values
+                                > threshold*singular_values[0])
+        self.rank_deficient = rank < a_mat.shape[0]
+
+        return vt_mat[:rank].T.dot(u_mat[:, :rank].T.dot(b_vec)
+                                   / singular_values[:rank])
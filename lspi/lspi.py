@@ -5,6 +5,9 @@ from copy import copy
 
 import numpy as np
 
+from sample import SampleBatch
+from solvers import IncrementalLSTDQSolver
+
 
 def learn(data, initial_policy, solver, epsilon=10**-5, max_iterations=10):
     r"""Find the optimal policy for the specified data.
@@ -12,10 +15,10 @@ def learn(data, initial_policy, solver, epsilon=10**-5, max_iterations=10):
     Parameters
     ----------
     data:
-        Generally a list of samples, however, the type of data does not matter
-        so long as the specified solver can handle it in its solve routine. For
-        example when doing model based learning one might pass in a model
-        instead of sample data
+        Generally a list of samples or a SampleBatch, however, the type of
+        data does not matter so long as the specified solver can handle it in
+        its solve routine. For example when doing model based learning one
+        might pass in a model instead of sample data
     initial_policy: Policy
         Starting policy. A copy of this policy will be made at the start of the
         method. This means that the provided initial policy will be preserved.
@@ -67,3 +70,141 @@ def learn(data, initial_policy, solver, epsilon=10**-5, max_iterations=10):
         curr_policy.weights = new_weights
 
     return curr_policy
+
+
+def learn_online(domain, initial_policy, solver, num_samples):
+    r"""Learn a policy while collecting samples from a domain.
+
+    At every step the current policy selects an action for the domain's
+    current state, the resulting sample is passed to the solver's update
+    method and the policy weights are replaced by the returned weights.
+    This way the policy improves between decisions instead of after a full
+    batch of samples. Absorbing samples reset the domain.
+
+    Parameters
+    ----------
+    domain: Domain
+        The domain to collect samples from.
+    initial_policy: Policy
+        Starting policy. A copy of this policy will be made at the start of the
+        method. This means that the provided initial policy will be preserved.
+        Its explore value controls exploration while collecting samples.
+    solver: RecursiveLSTDQSolver
+        A solver with an update(sample, policy) method that returns the new
+        weights, such as :py:class:`lspi.solvers.RecursiveLSTDQSolver`.
+    num_samples: int
+        The number of samples to collect.
+
+    Return
+    ------
+    Policy
+        The policy after the last update.
+
+    Raises
+    ------
+    ValueError
+        If num_samples <= 0
+
+    """
+    if num_samples <= 0:
+        raise ValueError('num_samples must be > 0: %d' % num_samples)
+
+    curr_policy = copy(initial_policy)
+
+    for i in range(num_samples):
+        action = curr_policy.select_action(domain.current_state())
+        sample = domain.apply_action(action)
+        curr_policy.weights = solver.update(sample, curr_policy)
+
+        if sample.absorb:
+            domain.reset()
+
+    return curr_policy
+
+
+class Learner(object):
+
+    r"""Policy iteration over a dataset that grows over time.
+
+    Keeps the samples, the solver and the last learned policy between calls
+    to learn. New samples are appended with add_samples and the next call to
+    learn resumes policy iteration from the previous policy, which usually
+    needs far fewer iterations than starting over.
+
+    With the default :py:class:`lspi.solvers.IncrementalLSTDQSolver` the
+    cached features and the LSTDQ system of the samples already seen are
+    kept as well. Only the appended samples have their features computed
+    and are added to the system, so the cost of retraining grows with the
+    amount of new data instead of the total history.
+
+    Parameters
+    ----------
+    initial_policy: Policy
+        Starting policy. A copy of this policy will be made so that the
+        provided initial policy is preserved.
+    solver: Solver or None
+        Solver used by every call to learn. Defaults to None which uses a
+        new IncrementalLSTDQSolver.
+    epsilon: float
+        Convergence threshold passed to :py:func:`lspi.learn`.
+    max_iterations: int
+        Maximum number of iterations per call to learn, passed to
+        :py:func:`lspi.learn`.
+
+    Attributes
+    ----------
+    policy: Policy
+        The policy found by the last call to learn.
+    data: SampleBatch or None
+        All of the samples added so far.
+
+    """
+
+    def __init__(self, initial_policy, solver=None, epsilon=10**-5,
+                 max_iterations=10):
+        """Initialize Learner."""
+        if solver is None:
+            solver = IncrementalLSTDQSolver()
+        self.policy = copy(initial_policy)
+        self.solver = solver
+        self.epsilon = epsilon
+        self.max_iterations = max_iterations
+        self.data = None
+
+    def add_samples(self, samples):
+        """Append samples to the dataset.
+
+        Parameters
+        ----------
+        samples: list(Sample) or SampleBatch
+            The new samples. Their states must have the same shape as the
+            samples already added.
+
+        """
+        if not isinstance(samples, SampleBatch):
+            samples = SampleBatch.from_samples(samples)
+        if self.data is None:
+            self.data = samples
+        else:
+            self.data = SampleBatch.concatenate([self.data, samples])
+
+    def learn(self):
+        """Run policy iteration on all of the samples added so far.
+
+        Returns
+        -------
+        Policy
+            The new policy, which is also stored in the policy attribute.
+
+        Raises
+        ------
+        ValueError
+            If no samples have been added.
+
+        """
+        if self.data is None or len(self.data) == 0:
+            raise ValueError('No samples have been added')
+
+        self.policy = learn(self.data, self.policy, self.solver,
+                            self.epsilon, self.max_iterations)
+        return self.policy
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """LSPI Policy class used for learning and executing policy."""
 
-import random
+import numbers
 
 import numpy as np
 
@@ -36,6 +36,10 @@ class Policy(object):
         The strategy to use if a tie occurs when selecting the best action.
         See the :py:class:`lspi.policy.Policy.TieBreakingStrategy`
         class description for what the different options are.
+    random_state: int, numpy.random.RandomState or None
+        Seed or source of randomness for the initial weights, exploration
+        and random tie breaking of both the single state and the batch
+        methods. Defaults to None which uses numpy.random.
 
     Raises
     ------
@@ -68,10 +72,17 @@ class Policy(object):
 
     def __init__(self, basis, discount=1.0,
                  explore=0.0, weights=None,
-                 tie_breaking_strategy=TieBreakingStrategy.RandomWins):
+                 tie_breaking_strategy=TieBreakingStrategy.RandomWins,
+                 random_state=None):
         """Initialize a Policy."""
         self.basis = basis
 
+        if random_state is None:
+            random_state = np.random
+        elif isinstance(random_state, numbers.Integral):
+            random_state = np.random.RandomState(random_state)
+        self.random_state = random_state
+
         if discount < 0.0 or discount > 1.0:
             raise ValueError('discount must be in range [0, 1]')
 
@@ -83,7 +94,8 @@ class Policy(object):
         self.explore = explore
 
         if weights is None:
-            self.weights = np.random.uniform(-1.0, 1.0, size=(basis.size(),))
+            self.weights = self.random_state.uniform(-1.0, 1.0,
+                                                     size=(basis.size(),))
         else:
             if weights.shape != (basis.size(), ):
                 raise ValueError('weights shape must equal (basis.size(), 1)')
@@ -92,12 +104,17 @@ class Policy(object):
         self.tie_breaking_strategy = tie_breaking_strategy
 
     def __copy__(self):
-        """Return a copy of this class with a deep copy of the weights."""
+        """Return a copy of this class with a deep copy of the weights.
+
+        The copy shares the source of randomness with this policy.
+
+        """
         return Policy(self.basis,
                       self.discount,
                       self.explore,
                       self.weights.copy(),
-                      self.tie_breaking_strategy)
+                      self.tie_breaking_strategy,
+                      self.random_state)
 
     def calc_q_value(self, state, action):
         """Calculate the Q function for the given state action pair.
@@ -127,6 +144,10 @@ class Policy(object):
         if action < 0 or action >= self.basis.num_actions:
             raise IndexError('action must be in range [0, num_actions)')
 
+        if self.basis.is_sparse:
+            indices, values = self.basis.evaluate_sparse(state, action)
+            return self.weights[indices].dot(values)
+
         return self.weights.dot(self.basis.evaluate(state, action))
 
     def best_action(self, state):
@@ -135,6 +156,13 @@ class Policy(object):
         This calculates argmax_a Q(state, a). In otherwords it returns
         the action that maximizes the Q value for this state.
 
+        If the basis is state factored (see
+        :py:meth:`lspi.basis_functions.BasisFunction.state_features_size`)
+        the state features are evaluated once and all of the Q values are
+        computed with a single matrix-vector product. Sparse bases compute
+        the Q values from the non-zero features only, evaluated once if the
+        basis is also state factored and once per action otherwise.
+
         Parameters
         ----------
         state: numpy.array
@@ -154,31 +182,29 @@ class Policy(object):
             If state's dimensions do not match basis functions expectations.
 
         """
-        q_values = [self.calc_q_value(state, action)
-                    for action in range(self.basis.num_actions)]
-
-        best_q = float('-inf')
-        best_actions = []
-        for action, q_value in enumerate(q_values):
-            if q_value > best_q:
-                best_actions = [action]
-                best_q = q_value
-            elif q_value == best_q:
-                best_actions.append(action)
-
-        if self.tie_breaking_strategy == Policy.TieBreakingStrategy.FirstWins:
-            return best_actions[0]
-        elif self.tie_breaking_strategy == Policy.TieBreakingStrategy.LastWins:
-            return best_actions[-1]
+        if self.basis.state_features_size() is None:
+            q_values = [self.calc_q_value(state, action)
+                        for action in range(self.basis.num_actions)]
+        elif self.basis.is_sparse:
+            # the features of action 0 are the state features
+            indices, values = self.basis.evaluate_sparse(state, 0)
+            q_values = self._action_weights()[:, indices].dot(values)
         else:
-            return random.choice(best_actions)
+            q_values = self._action_weights().dot(
+                self.basis.evaluate_state(state))
+
+        # ties are broken like a batch of one state so that both draw the
+        # same random numbers
+        return int(self.argmax_actions(
+            np.asarray(q_values, dtype=np.float64)[np.newaxis])[0])
 
     def select_action(self, state):
         """With random probability select best action or random action.
 
         If the random number is below the explore value then pick a random
         value otherwise pick the best action according to the basis and
-        policy weights.
+        policy weights. The random numbers are drawn the same way as by
+        select_actions for a batch of one state.
 
         Parameters
         ----------
@@ -196,11 +222,153 @@ class Policy(object):
             If state's dimensions do not match basis functions expectations.
 
         """
-        if random.random() < self.explore:
-            return random.choice(range(self.basis.num_actions))
+        explore = self.random_state.random_sample() < self.explore
+        action = self.random_state.randint(self.basis.num_actions)
+        if explore:
+            return int(action)
         else:
             return self.best_action(state)
 
+    def q_values(self, states):
+        """Calculate the Q values of every action for a batch of states.
+
+        Parameters
+        ----------
+        states: numpy.array
+            Array of shape (N, ...) where each row is a state vector.
+
+        Returns
+        -------
+        numpy.array
+            Matrix of shape (N, num_actions) where entry (i, a) is
+            Q(states[i], a).
+
+        Raises
+        ------
+        ValueError
+            If the state dimensions do not match basis function expectations.
+
+        """
+        states = np.asarray(states)
+        num_states = states.shape[0]
+
+        if self.basis.state_features_size() is not None:
+            if self.basis.is_sparse:
+                psi = self.basis.evaluate_sparse_state_batch(states)
+            else:
+                psi = self.basis.evaluate_state_batch(states)
+            return np.asarray(psi.dot(self._action_weights().T))
+
+        if self.basis.is_sparse:
+            evaluate_batch = self.basis.evaluate_sparse_batch
+        else:
+            evaluate_batch = self.basis.evaluate_batch
+
+        q_values = np.empty((num_states, self.basis.num_actions))
+        for action in range(self.basis.num_actions):
+            phi = evaluate_batch(states, np.repeat(action, num_states))
+            q_values[:, action] = phi.dot(self.weights)
+
+        return q_values
+
+    def argmax_actions(self, q_values):
+        """Select the best action of each row of a Q value matrix.
+
+        Ties are broken according to the policy's tie_breaking_strategy, the
+        same way best_action breaks them.
+
+        Parameters
+        ----------
+        q_values: numpy.array
+            Matrix of shape (N, num_actions), for example as returned by
+            q_values.
+
+        Returns
+        -------
+        numpy.array
+            Integer array of shape (N, ) with the best action of each row.
+
+        """
+        q_values = np.asarray(q_values)
+        if self.tie_breaking_strategy == Policy.TieBreakingStrategy.FirstWins:
+            return np.argmax(q_values, axis=1)
+        elif self.tie_breaking_strategy == \
+                Policy.TieBreakingStrategy.LastWins:
+            return (q_values.shape[1] - 1
+                    - np.argmax(q_values[:, ::-1], axis=1))
+        else:
+            ties = q_values == q_values.max(axis=1)[:, np.newaxis]
+            scores = np.where(ties,
+                              self.random_state.random_sample(q_values.shape),
+                              -1.)
+            return np.argmax(scores, axis=1)
+
+    def best_actions(self, states):
+        """Select the best action for each state of a batch.
+
+        Vectorized version of best_action.
+
+        Parameters
+        ----------
+        states: numpy.array
+            Array of shape (N, ...) where each row is a state vector.
+
+        Returns
+        -------
+        numpy.array
+            Integer array of shape (N, ) with the best action of each state.
+
+        Raises
+        ------
+        ValueError
+            If the state dimensions do not match basis function expectations.
+
+        """
+        return self.argmax_actions(self.q_values(states))
+
+    def select_actions(self, states):
+        """Select an action for each state of a batch with exploration.
+
+        Vectorized version of select_action. Each state independently gets a
+        uniformly random action with probability explore, otherwise its best
+        action.
+
+        Parameters
+        ----------
+        states: numpy.array
+            Array of shape (N, ...) where each row is a state vector.
+
+        Returns
+        -------
+        numpy.array
+            Integer array of shape (N, ) with the selected actions.
+
+        Raises
+        ------
+        ValueError
+            If the state dimensions do not match basis function expectations.
+
+        """
+        states = np.asarray(states)
+        num_states = states.shape[0]
+
+        explore = self.random_state.random_sample(num_states) < self.explore
+        actions = self.random_state.randint(self.basis.num_actions,
+                                            size=num_states)
+        if not np.all(explore):
+            actions[~explore] = self.best_actions(states[~explore])
+
+        return actions
+
+    def _action_weights(self):
+        r"""Return the weights as a (num_actions, m) matrix.
+
+        Only valid for state factored bases. Row a holds the weights of the
+        block of the :math:`\phi` vector used by action a.
+
+        """
+        return self.weights.reshape((self.basis.num_actions, -1))
+
     @property
     def num_actions(self):
         r"""Return number of possible actions.
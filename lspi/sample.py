@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-"""Contains class representing an LSPI sample."""
+"""Contains classes representing LSPI samples."""
+
+import numpy as np
 
 
 class Sample(object):
@@ -55,3 +57,647 @@ class Sample(object):
                                                self.reward,
                                                self.next_state,
                                                self.absorb)
+
+
+class SampleBatch(object):
+
+    """Columnar (struct-of-arrays) container of LSPI samples.
+
+    Stores the ``(s, a, r, s', absorb)`` fields of many samples as
+    contiguous numpy arrays instead of a list of :class:`Sample` objects.
+    This avoids the per-object memory overhead of Sample and lets solvers
+    work on whole columns at once.
+
+    Parameters
+    ----------
+    states : numpy.array
+        Array of shape (N, ...) where row i is the state of sample i.
+    actions : numpy.array
+        Integer array of shape (N, ) containing the action indices.
+    rewards : numpy.array
+        Float array of shape (N, ) containing the rewards.
+    next_states : numpy.array
+        Array with the same shape as states where row i is the next state
+        of sample i.
+    absorb : numpy.array, optional
+        Boolean array of shape (N, ). (The default is None, which marks
+        every sample as non-absorbing)
+
+    Raises
+    ------
+    ValueError
+        If the columns do not all contain the same number of samples.
+    ValueError
+        If the shapes of states and next_states do not match.
+
+    Note
+    ----
+
+    The arrays are only copied if they are not already contiguous arrays of
+    the expected type. Modifying the arrays after constructing the batch will
+    modify the batch.
+
+    """
+
+    def __init__(self, states, actions, rewards, next_states, absorb=None):
+        """Initialize SampleBatch instance."""
+        self.states = np.ascontiguousarray(states)
+        self.actions = np.ascontiguousarray(actions, dtype=np.int_)
+        self.rewards = np.ascontiguousarray(rewards, dtype=np.float64)
+        self.next_states = np.ascontiguousarray(next_states)
+
+        if absorb is None:
+            absorb = np.zeros(self.actions.shape, dtype=np.bool_)
+        self.absorb = np.ascontiguousarray(absorb, dtype=np.bool_)
+
+        if self.actions.ndim != 1:
+            raise ValueError('actions must be a 1D array')
+
+        num_samples = self.actions.shape[0]
+        for column in (self.states, self.rewards,
+                       self.next_states, self.absorb):
+            if column.ndim == 0 or column.shape[0] != num_samples:
+                raise ValueError('All columns must contain the same '
+                                 + 'number of samples')
+
+        if self.states.shape != self.next_states.shape:
+            raise ValueError('states and next_states must have the same shape')
+
+    @classmethod
+    def from_samples(cls, samples):
+        """Build a SampleBatch from a sequence of Sample instances.
+
+        Parameters
+        ----------
+        samples: list(Sample)
+            The samples to convert. The states of every sample must have the
+            same shape.
+
+        Returns
+        -------
+        SampleBatch
+            Batch containing a copy of the sample data.
+
+        """
+        samples = list(samples)
+        return cls(np.array([sample.state for sample in samples]),
+                   np.array([sample.action for sample in samples],
+                            dtype=np.int_),
+                   np.array([sample.reward for sample in samples],
+                            dtype=np.float64),
+                   np.array([sample.next_state for sample in samples]),
+                   np.array([sample.absorb for sample in samples],
+                            dtype=np.bool_))
+
+    @classmethod
+    def concatenate(cls, batches):
+        """Join several batches into one, preserving the order of samples.
+
+        Parameters
+        ----------
+        batches: list(SampleBatch)
+            The batches to join. Their states must have the same shape.
+
+        Returns
+        -------
+        SampleBatch
+            Batch containing a copy of the samples of every batch.
+
+        """
+        batches = list(batches)
+        if any(isinstance(batch, WeightedSampleBatch) for batch in batches):
+            return WeightedSampleBatch.concatenate(batches)
+        return cls(np.concatenate([batch.states for batch in batches]),
+                   np.concatenate([batch.actions for batch in batches]),
+                   np.concatenate([batch.rewards for batch in batches]),
+                   np.concatenate([batch.next_states for batch in batches]),
+                   np.concatenate([batch.absorb for batch in batches]))
+
+    def compact(self):
+        """Collapse identical samples into unique weighted samples.
+
+        Two samples are identical if the bytes of all of their fields are
+        equal. Datasets from discrete domains usually contain each transition
+        many times, and solving with the compacted batch gives the same
+        weights as solving with the original batch.
+
+        Returns
+        -------
+        WeightedSampleBatch
+            One sample per distinct transition, in order of first occurrence,
+            whose count is the number of times it occurred (or the sum of the
+            counts if this batch is already weighted).
+
+        """
+        num_samples = len(self)
+        counts = _sample_counts(self)
+        if num_samples == 0:
+            return WeightedSampleBatch(self.states, self.actions, self.rewards,
+                                       self.next_states, self.absorb, counts)
+
+        first, inverse = np.unique(
+            _row_keys(self.states, self.actions, self.rewards,
+                      self.next_states, self.absorb),
+            return_index=True, return_inverse=True)[1:]
+
+        order = np.argsort(first)
+        # maps the sorted unique keys to their order of first occurrence
+        position = np.empty(order.shape, dtype=np.int_)
+        position[order] = np.arange(order.shape[0])
+        unique_counts = np.bincount(position[inverse], weights=counts,
+                                    minlength=order.shape[0])
+
+        rows = first[order]
+        return WeightedSampleBatch(self.states[rows], self.actions[rows],
+                                   self.rewards[rows], self.next_states[rows],
+                                   self.absorb[rows], unique_counts)
+
+    def unique_next_states(self):
+        """Return the distinct next states and the index of every sample.
+
+        Next states are compared by their bytes, which is exact for both
+        discrete and continuous states.
+
+        Returns
+        -------
+        tuple(numpy.array, numpy.array)
+            The (U, ...) array of distinct next states and the integer array
+            of shape (N, ) with the row of each sample's next state in it.
+
+        """
+        if len(self) == 0:
+            return self.next_states, np.zeros((0, ), dtype=np.int_)
+
+        first, inverse = np.unique(_row_keys(self.next_states),
+                                   return_index=True,
+                                   return_inverse=True)[1:]
+        return self.next_states[first], inverse
+
+    def to_samples(self):
+        """Convert the batch to a list of Sample instances.
+
+        Returns
+        -------
+        list(Sample)
+            One Sample per row of the batch. The states are views into the
+            batch arrays.
+
+        """
+        return list(self)
+
+    def __len__(self):
+        """Return number of samples in the batch."""
+        return self.actions.shape[0]
+
+    def __iter__(self):
+        """Iterate over the batch as Sample instances."""
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        """Return a Sample for an integer index otherwise a SampleBatch.
+
+        Slices, integer arrays and boolean masks select a subset of the
+        samples and return it as a new SampleBatch.
+
+        """
+        if isinstance(index, (int, np.integer)):
+            return Sample(self.states[index],
+                          int(self.actions[index]),
+                          float(self.rewards[index]),
+                          self.next_states[index],
+                          bool(self.absorb[index]))
+
+        return SampleBatch(self.states[index],
+                           self.actions[index],
+                           self.rewards[index],
+                           self.next_states[index],
+                           self.absorb[index])
+
+    def __repr__(self):
+        """Create string representation of batch."""
+        return 'SampleBatch(%d samples, state shape %s)' % \
+            (len(self), self.states.shape[1:])
+
+
+class WeightedSampleBatch(SampleBatch):
+
+    """Sample batch where every sample stands for count identical samples.
+
+    Created by :py:meth:`SampleBatch.compact`. The LSTDQ solvers weight the
+    contribution of each sample to the A matrix and b vector by its count,
+    so solving with a WeightedSampleBatch is equivalent to solving with
+    every sample repeated count times. Counts do not have to be integers.
+
+    Parameters
+    ----------
+    states : numpy.array
+        Array of shape (N, ...) where row i is the state of sample i.
+    actions : numpy.array
+        Integer array of shape (N, ) containing the action indices.
+    rewards : numpy.array
+        Float array of shape (N, ) containing the rewards.
+    next_states : numpy.array
+        Array with the same shape as states where row i is the next state
+        of sample i.
+    absorb : numpy.array, optional
+        Boolean array of shape (N, ). (The default is None, which marks
+        every sample as non-absorbing)
+    counts : numpy.array, optional
+        Float array of shape (N, ) with the weight of each sample. (The
+        default is None, which gives every sample a count of 1)
+
+    Raises
+    ------
+    ValueError
+        If the columns do not all contain the same number of samples.
+    ValueError
+        If the shapes of states and next_states do not match.
+
+    """
+
+    def __init__(self, states, actions, rewards, next_states, absorb=None,
+                 counts=None):
+        """Initialize WeightedSampleBatch instance."""
+        super(WeightedSampleBatch, self).__init__(states, actions, rewards,
+                                                  next_states, absorb)
+        if counts is None:
+            counts = np.ones(self.actions.shape)
+        self.counts = np.ascontiguousarray(counts, dtype=np.float64)
+
+        if self.counts.shape != self.actions.shape:
+            raise ValueError('All columns must contain the same '
+                             + 'number of samples')
+
+    @classmethod
+    def concatenate(cls, batches):
+        """Join several batches into one weighted batch.
+
+        Samples from batches without counts get a count of 1.
+
+        Parameters
+        ----------
+        batches: list(SampleBatch)
+            The batches to join. Their states must have the same shape.
+
+        Returns
+        -------
+        WeightedSampleBatch
+            Batch containing a copy of the samples of every batch.
+
+        """
+        batches = list(batches)
+        return cls(np.concatenate([batch.states for batch in batches]),
+                   np.concatenate([batch.actions for batch in batches]),
+                   np.concatenate([batch.rewards for batch in batches]),
+                   np.concatenate([batch.next_states for batch in batches]),
+                   np.concatenate([batch.absorb for batch in batches]),
+                   np.concatenate([_sample_counts(batch)
+                                   for batch in batches]))
+
+    def __getitem__(self, index):
+        """Return a Sample for an integer index otherwise a batch.
+
+        Slices, integer arrays and boolean masks return a new
+        WeightedSampleBatch that keeps the counts of the selected samples.
+        A single Sample does not carry its count.
+
+        """
+        if isinstance(index, (int, np.integer)):
+            return super(WeightedSampleBatch, self).__getitem__(index)
+
+        return WeightedSampleBatch(self.states[index],
+                                   self.actions[index],
+                                   self.rewards[index],
+                                   self.next_states[index],
+                                   self.absorb[index],
+                                   self.counts[index])
+
+    def __repr__(self):
+        """Create string representation of batch."""
+        return 'WeightedSampleBatch(%d samples, %g total count, ' \
+            'state shape %s)' % (len(self), self.counts.sum(),
+                                 self.states.shape[1:])
+
+
+class TrajectoryBatch(SampleBatch):
+
+    """Sample batch that stores every distinct state of a trajectory once.
+
+    In sequentially collected data the next state of a sample is the state
+    of the following sample. Instead of storing both, the batch keeps a
+    table of states and two index columns. Row i of states is
+    ``state_table[state_index[i]]`` and row i of next_states is
+    ``state_table[next_state_index[i]]``. The states and next_states
+    attributes are gathered from the table when accessed, so the batch can
+    be used anywhere a SampleBatch can. Solvers that cache state features
+    evaluate the basis once per referenced table row instead of twice per
+    sample.
+
+    Slicing a TrajectoryBatch returns a TrajectoryBatch that shares the
+    state table.
+
+    Parameters
+    ----------
+    state_table : numpy.array
+        Array of shape (M, ...) with the distinct states.
+    state_index : numpy.array
+        Integer array of shape (N, ) with the table row of each state.
+    next_state_index : numpy.array
+        Integer array of shape (N, ) with the table row of each next state.
+    actions : numpy.array
+        Integer array of shape (N, ) containing the action indices.
+    rewards : numpy.array
+        Float array of shape (N, ) containing the rewards.
+    absorb : numpy.array, optional
+        Boolean array of shape (N, ). (The default is None, which marks
+        every sample as non-absorbing)
+
+    Raises
+    ------
+    ValueError
+        If the columns do not all contain the same number of samples.
+    IndexError
+        If an index is outside of the state table.
+
+    """
+
+    def __init__(self, state_table, state_index, next_state_index, actions,
+                 rewards, absorb=None):
+        """Initialize TrajectoryBatch instance."""
+        self.state_table = np.ascontiguousarray(state_table)
+        self.state_index = np.ascontiguousarray(state_index, dtype=np.int_)
+        self.next_state_index = np.ascontiguousarray(next_state_index,
+                                                     dtype=np.int_)
+        self.actions = np.ascontiguousarray(actions, dtype=np.int_)
+        self.rewards = np.ascontiguousarray(rewards, dtype=np.float64)
+
+        if absorb is None:
+            absorb = np.zeros(self.actions.shape, dtype=np.bool_)
+        self.absorb = np.ascontiguousarray(absorb, dtype=np.bool_)
+
+        if self.actions.ndim != 1:
+            raise ValueError('actions must be a 1D array')
+
+        num_samples = self.actions.shape[0]
+        for column in (self.state_index, self.next_state_index,
+                       self.rewards, self.absorb):
+            if column.ndim != 1 or column.shape[0] != num_samples:
+                raise ValueError('All columns must contain the same '
+                                 + 'number of samples')
+
+        for index in (self.state_index, self.next_state_index):
+            if index.shape[0] > 0 and (index.min() < 0 or
+                                       index.max() >= len(self.state_table)):
+                raise IndexError('State index outside of the state table')
+
+    @classmethod
+    def from_samples(cls, samples):
+        """Build a TrajectoryBatch from a sequence of Sample instances.
+
+        A sample whose state equals the next state of the previous sample
+        reuses that table row, so one trajectory, or several trajectories
+        stored back to back, need one table row per step plus one per
+        trajectory.
+
+        Parameters
+        ----------
+        samples: list(Sample)
+            The samples to convert. The states of every sample must have the
+            same shape.
+
+        Returns
+        -------
+        TrajectoryBatch
+            Batch containing a copy of the sample data.
+
+        """
+        samples = list(samples)
+        table = []
+        state_index = []
+        next_state_index = []
+        previous_state = None
+        for sample in samples:
+            if previous_state is None \
+                    or not np.array_equal(sample.state, previous_state):
+                table.append(sample.state)
+            state_index.append(len(table) - 1)
+            table.append(sample.next_state)
+            next_state_index.append(len(table) - 1)
+            previous_state = sample.next_state
+
+        return cls(np.array(table),
+                   state_index,
+                   next_state_index,
+                   np.array([sample.action for sample in samples],
+                            dtype=np.int_),
+                   np.array([sample.reward for sample in samples],
+                            dtype=np.float64),
+                   np.array([sample.absorb for sample in samples],
+                            dtype=np.bool_))
+
+    @classmethod
+    def from_trajectory(cls, states, actions, rewards, absorb=False):
+        """Build a TrajectoryBatch from a single trajectory.
+
+        Parameters
+        ----------
+        states : numpy.array
+            Array of shape (T + 1, ...) with the visited states in order.
+        actions : numpy.array
+            Integer array of shape (T, ) with the applied actions.
+        rewards : numpy.array
+            Float array of shape (T, ) with the received rewards.
+        absorb : bool
+            True if the last state is absorbing. Defaults to False.
+
+        Returns
+        -------
+        TrajectoryBatch
+            Batch with T samples where sample t goes from states[t] to
+            states[t + 1].
+
+        """
+        num_samples = len(states) - 1
+        absorb_column = np.zeros((max(num_samples, 0), ), dtype=np.bool_)
+        if num_samples > 0:
+            absorb_column[-1] = absorb
+        return cls(states, np.arange(num_samples),
+                   np.arange(1, num_samples + 1), actions, rewards,
+                   absorb_column)
+
+    @property
+    def states(self):
+        """Return the (N, ...) array of states gathered from the table."""
+        return self.state_table[self.state_index]
+
+    @property
+    def next_states(self):
+        """Return the (N, ...) array of next states gathered from the table."""
+        return self.state_table[self.next_state_index]
+
+    def unique_next_states(self):
+        """Return the distinct next states and the index of every sample.
+
+        Samples whose next states share a state table row share a distinct
+        next state, so no state comparisons are needed.
+
+        Returns
+        -------
+        tuple(numpy.array, numpy.array)
+            The (U, ...) array of distinct next states and the integer array
+            of shape (N, ) with the row of each sample's next state in it.
+
+        """
+        rows, inverse = np.unique(self.next_state_index, return_inverse=True)
+        return self.state_table[rows], inverse
+
+    def __getitem__(self, index):
+        """Return a Sample for an integer index otherwise a TrajectoryBatch.
+
+        Slices, integer arrays and boolean masks select a subset of the
+        samples and return it as a new TrajectoryBatch sharing the state
+        table.
+
+        """
+        if isinstance(index, (int, np.integer)):
+            return Sample(self.state_table[self.state_index[index]],
+                          int(self.actions[index]),
+                          float(self.rewards[index]),
+                          self.state_table[self.next_state_index[index]],
+                          bool(self.absorb[index]))
+
+        return TrajectoryBatch(self.state_table,
+                               self.state_index[index],
+                               self.next_state_index[index],
+                               self.actions[index],
+                               self.rewards[index],
+                               self.absorb[index])
+
+    def __repr__(self):
+        """Create string representation of batch."""
+        return 'TrajectoryBatch(%d samples, %d states, state shape %s)' % \
+            (len(self), len(self.state_table), self.state_table.shape[1:])
+
+
+def _row_keys(*columns):
+    """Return one comparable void scalar per row with the bytes of the row.
+
+    Parameters
+    ----------
+    columns: numpy.array
+        Arrays with the same number of rows. The bytes of row i of every
+        column are joined into key i.
+
+    """
+    num_rows = columns[0].shape[0]
+    fields = [np.ascontiguousarray(column.reshape((num_rows, -1)))
+              .view(np.uint8)
+              for column in columns]
+    rows = np.ascontiguousarray(np.hstack(fields))
+    return rows.view(np.dtype((np.void, rows.shape[1]))).ravel()
+
+
+def _sample_counts(batch):
+    """Return the count of every sample of batch, 1 if it is unweighted."""
+    counts = getattr(batch, 'counts', None)
+    if counts is None:
+        return np.ones((len(batch), ))
+    return counts
+
+
+class SampleChunks(object):
+
+    """Re-iterable source of samples split into chunks.
+
+    Every iteration calls the factory again and yields its chunks as
+    SampleBatch instances, so the samples are never all in memory at the
+    same time. This is the data format of
+    :py:class:`lspi.solvers.StreamingLSTDQSolver`, which reads the whole
+    source once per LSPI iteration.
+
+    Parameters
+    ----------
+    factory: callable
+        Called without arguments at the start of every iteration. Must
+        return an iterable of chunks where each chunk is either a
+        SampleBatch or a list of Sample instances.
+
+    """
+
+    def __init__(self, factory):
+        """Initialize SampleChunks."""
+        self.factory = factory
+
+    @classmethod
+    def from_samples(cls, factory, chunk_size):
+        """Group a stream of individual samples into chunks.
+
+        Parameters
+        ----------
+        factory: callable
+            Called without arguments at the start of every iteration. Must
+            return an iterable of Sample instances, for example a generator
+            reading a sample log.
+        chunk_size: int
+            Number of samples per chunk. The last chunk may be smaller.
+
+        Returns
+        -------
+        SampleChunks
+            Source yielding chunks of at most chunk_size samples.
+
+        Raises
+        ------
+        ValueError
+            If chunk_size < 1
+
+        """
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be >= 1')
+
+        def chunks():
+            chunk = []
+            for sample in factory():
+                chunk.append(sample)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        return cls(chunks)
+
+    @classmethod
+    def from_batch(cls, batch, chunk_size):
+        """Split an existing batch into chunks without copying it.
+
+        Parameters
+        ----------
+        batch: SampleBatch
+            The batch to split. Every chunk is a slice of it.
+        chunk_size: int
+            Number of samples per chunk. The last chunk may be smaller.
+
+        Returns
+        -------
+        SampleChunks
+            Source yielding chunks of at most chunk_size samples.
+
+        Raises
+        ------
+        ValueError
+            If chunk_size < 1
+
+        """
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be >= 1')
+        return cls(lambda: (batch[start:start + chunk_size]
+                            for start in range(0, len(batch), chunk_size)))
+
+    def __iter__(self):
+        """Iterate over the chunks as SampleBatch instances."""
+        for chunk in self.factory():
+            if not isinstance(chunk, SampleBatch):
+                chunk = SampleBatch.from_samples(chunk)
+            yield chunk
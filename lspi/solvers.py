@@ -2,11 +2,20 @@
 """Contains main LSPI method and various LSTDQ solvers."""
 
 import abc
+import copy
 import logging
+import numbers
+import multiprocessing
+import warnings
 
 import numpy as np
 
-import scipy.linalg
+import scipy.sparse
+import scipy.sparse.linalg
+
+from factorizations import LUFactorization
+from policy import Policy
+from sample import SampleBatch, TrajectoryBatch
 
 
 class Solver(object):
@@ -46,59 +55,1756 @@ class Solver(object):
 
 class LSTDQSolver(Solver):
 
-    """LSTDQ Implementation with standard matrix solvers.
+    r"""LSTDQ Implementation with standard matrix solvers.
 
-    Uses the algorithm from Figure 5 of the LSPI paper. If the A matrix
-    turns out to be full rank then scipy's standard linalg solver is used. If
-    the matrix turns out to be less than full rank then least squares method
-    will be used.
+    Uses the algorithm from Figure 5 of the LSPI paper. The linear system is
+    solved by a pluggable factorization backend from
+    :py:mod:`lspi.factorizations`, by default an LU factorization. The
+    backend factorizes A once, estimates its condition number from the
+    factors and if the matrix turns out to be less than full rank a least
+    squares method will be used. The estimate of the last solve is available
+    as factorization.rcond.
 
     By default the A matrix will have its diagonal preconditioned with a small
     positive value. This will help to ensure that even with few samples the
     A matrix will be full rank. If you do not want the A matrix to be
     preconditioned then you can set this value to 0.
 
+    The :math:`\phi(s, a)` features of the samples do not depend on the policy
+    weights, so by default they are computed once and reused by every call
+    to solve with the same data and basis. The cache is invalidated when a
+    different data or basis object is passed in, or when the number of
+    samples or the basis size changes. Modifying the samples or the basis
+    parameters in place is not detected, call clear_cache after doing so.
+
+    When precompute_next_features is enabled the solver additionally builds
+    a (N, num_actions, k) tensor of :math:`\phi(s', a')` for every next state
+    and every action once. Each iteration then finds the greedy actions with
+    a single matrix product against the policy weights and gathers the
+    matching rows, instead of evaluating the basis num_actions + 1 times per
+    sample. This trades N * num_actions * k floats of memory for speed.
+    Otherwise the greedy action and its features are computed once per
+    distinct next state and shared by all samples with that next state.
+
     Parameters
     ----------
     precondition_value: float
         Value to set A matrix diagonals to. Should be a small positive number.
         If you do not want preconditioning enabled then set it 0.
+    cache_features: bool
+        If True cache the :math:`\phi(s, a)` features of the data between
+        calls to solve. Defaults to True.
+    precompute_next_features: bool
+        If True precompute and cache :math:`\phi(s', a')` for all actions.
+        Defaults to False.
+    factorization: Factorization or None
+        Backend used to solve the linear system. Defaults to None which
+        uses a new LUFactorization.
     """
 
-    def __init__(self, precondition_value=.1):
+    def __init__(self, precondition_value=.1, cache_features=True,
+                 precompute_next_features=False, factorization=None):
         """Initialize LSTDQSolver."""
         self.precondition_value = precondition_value
+        self.cache_features = cache_features
+        self.precompute_next_features = precompute_next_features
+        if factorization is None:
+            factorization = LUFactorization()
+        self.factorization = factorization
+        self._cache = _FeatureCache()
+
+    def clear_cache(self):
+        """Discard all cached features."""
+        self._cache.clear()
 
     def solve(self, data, policy):
         """Run LSTDQ iteration.
 
         See Figure 5 of the LSPI paper for more information.
+
+        Parameters
+        ----------
+        data: list(Sample) or SampleBatch
+            Samples to learn from. A SampleBatch is read column by column
+            without creating any Sample objects. The samples of a
+            WeightedSampleBatch are weighted by their counts.
+        policy: Policy
+            The current policy to find an improvement to.
+
+        Returns
+        -------
+        numpy.array
+            The new weights.
         """
+        a_mat, b_vec = self._build_system(data, policy)
+        return self._solve_system(a_mat, b_vec)
+
+    def _build_system(self, data, policy):
+        """Return the A matrix and b vector of the LSTDQ linear system."""
         k = policy.basis.size()
         a_mat = np.zeros((k, k))
         np.fill_diagonal(a_mat, self.precondition_value)
 
         b_vec = np.zeros((k, 1))
 
-        for sample in data:
-            phi_sa = (policy.basis.evaluate(sample.state, sample.action)
-                      .reshape((-1, 1)))
+        if self.cache_features:
+            phi = self._cache.state_action_features(data, policy.basis)
+
+        if self.precompute_next_features:
+            phi_next = _greedy_next_features(
+                self._cache.next_state_action_features(data, policy.basis),
+                policy)
+        elif self.cache_features:
+            phi_next = _greedy_features(
+                data, policy,
+                self._cache.unique_next_states(data, policy.basis))
+        else:
+            phi_next = _greedy_features(data, policy)
+
+        counts = _sample_weights(data)
+
+        for i, (state, action, reward, next_state, absorb) \
+                in enumerate(_transitions(data)):
+            if self.cache_features:
+                phi_sa = phi[i].reshape((-1, 1))
+            else:
+                phi_sa = (policy.basis.evaluate(state, action)
+                          .reshape((-1, 1)))
+
+            phi_sprime = phi_next[i].reshape((-1, 1))
+
+            phi_weighted = phi_sa if counts is None else counts[i]*phi_sa
+            a_mat += phi_weighted.dot((phi_sa - policy.discount*phi_sprime).T)
+            b_vec += phi_weighted*reward
+
+        return a_mat, b_vec
+
+    def _solve_system(self, a_mat, b_vec):
+        """Solve the LSTDQ linear system for the new weights."""
+        return self.factorization.solve(a_mat, b_vec)
+
+
+class VectorizedLSTDQSolver(LSTDQSolver):
+
+    r"""LSTDQ solver that accumulates the linear system with matrix products.
+
+    Instead of one k-by-k outer product per sample the A matrix and b vector
+    are formed as
+
+    .. math::
+
+        A = \Phi^T (\Phi - \gamma \Phi'), \qquad b = \Phi^T r
+
+    where row i of :math:`\Phi` is :math:`\phi(s_i, a_i)` and row i of
+    :math:`\Phi'` is :math:`\phi(s'_i, \pi(s'_i))` (zero for absorbing
+    samples). The samples are processed in chunks of at most chunk_size rows
+    so the temporary matrices of the products use a bounded amount of
+    memory.
+
+    The features of all N samples are cached between calls to solve by
+    default, which takes :math:`O(N k)` memory, or :math:`O(N m)` for state
+    factored bases. Set cache_features to False to keep memory bounded by
+    chunk_size at the cost of evaluating the basis in every iteration, or
+    use StreamingLSTDQSolver for data that does not fit in memory.
+
+    If the basis is state factored (see
+    :py:meth:`lspi.basis_functions.BasisFunction.state_features_size`) the
+    solver works with the (N, m) state features :math:`\psi` instead. This
+    caches and multiplies matrices num_actions times smaller and makes
+    precompute_next_features unnecessary, so that option is ignored.
+
+    The result is the same as LSTDQSolver up to floating point rounding.
+
+    Parameters
+    ----------
+    precondition_value: float
+        Value to set A matrix diagonals to. Should be a small positive number.
+        If you do not want preconditioning enabled then set it 0.
+    cache_features: bool
+        If True cache the features of all of the data between calls to
+        solve, which takes memory proportional to the number of samples.
+        Defaults to True.
+    precompute_next_features: bool
+        If True precompute and cache :math:`\phi(s', a')` for all actions.
+        Defaults to False.
+    chunk_size: int
+        Maximum number of samples multiplied at once by a single matrix
+        product. When cache_features is False this also bounds the number
+        of samples whose features are held in memory. Defaults to 4096.
+    factorization: Factorization or None
+        Backend used to solve the linear system. Defaults to None which
+        uses a new LUFactorization.
+
+    Raises
+    ------
+    ValueError
+        If chunk_size < 1
+
+    """
+
+    def __init__(self, precondition_value=.1, cache_features=True,
+                 precompute_next_features=False, chunk_size=4096,
+                 factorization=None):
+        """Initialize VectorizedLSTDQSolver."""
+        super(VectorizedLSTDQSolver, self).__init__(precondition_value,
+                                                    cache_features,
+                                                    precompute_next_features,
+                                                    factorization)
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be >= 1')
+        self.chunk_size = chunk_size
+
+    def _build_system(self, data, policy):
+        """Return the A matrix and b vector using chunked GEMMs."""
+        if policy.basis.state_features_size() is not None:
+            return self._build_factored_system(data, policy)
+
+        basis = policy.basis
+        k = basis.size()
+        a_mat = np.zeros((k, k))
+        np.fill_diagonal(a_mat, self.precondition_value)
+
+        b_vec = np.zeros((k, 1))
+
+        if self.cache_features:
+            phi = self._cache.state_action_features(data, basis)
+
+        if self.precompute_next_features:
+            phi_next = self._cache.next_state_action_features(data, basis)
+
+        for start in range(0, len(data), self.chunk_size):
+            stop = min(start + self.chunk_size, len(data))
+            batch = _sample_chunk(data, start, stop)
+
+            if self.cache_features:
+                phi_sa = phi[start:stop]
+            else:
+                phi_sa = _state_action_features(batch, basis)
+
+            if self.precompute_next_features:
+                phi_sprime = _greedy_next_features(phi_next[start:stop],
+                                                   policy)
+            else:
+                phi_sprime = _greedy_features(batch, policy)
+
+            phi_weighted = _weighted_rows(phi_sa, _sample_weights(batch))
+            a_mat += phi_weighted.T.dot(phi_sa - policy.discount*phi_sprime)
+            b_vec += phi_weighted.T.dot(batch.rewards).reshape((-1, 1))
+
+        return a_mat, b_vec
+
+    def _build_factored_system(self, data, policy):
+        r"""Return the A matrix and b vector of a state factored basis.
+
+        With :math:`\phi(s, a) = e_a \otimes \psi(s)` the (a, b) block of A
+        only receives contributions from samples with action a whose greedy
+        next action is b. Grouping the samples this way accumulates A with
+        products of (n, m) matrices instead of (n, k) matrices.
+
+        """
+        basis = policy.basis
+        num_actions = basis.num_actions
+        m = basis.state_features_size()
+        k = basis.size()
+
+        a_mat = np.zeros((k, k))
+        np.fill_diagonal(a_mat, self.precondition_value)
+        a_blocks = a_mat.reshape((num_actions, m, num_actions, m))
+
+        b_vec = np.zeros((k, 1))
+        b_blocks = b_vec.reshape((num_actions, m))
+
+        action_weights = policy.weights.reshape((num_actions, m))
+
+        if self.cache_features:
+            psi_all = self._cache.state_features(data, basis)
+            psi_next_all = self._cache.next_state_features(data, basis)
 
-            if not sample.absorb:
-                best_action = policy.best_action(sample.next_state)
-                phi_sprime = (policy.basis
-                              .evaluate(sample.next_state, best_action)
-                              .reshape((-1, 1)))
+        for start in range(0, len(data), self.chunk_size):
+            stop = min(start + self.chunk_size, len(data))
+            batch = _sample_chunk(data, start, stop)
+
+            if self.cache_features:
+                psi = psi_all[start:stop]
+                psi_next = psi_next_all[start:stop]
             else:
-                phi_sprime = np.zeros((k, 1))
+                psi = _state_features(batch, basis)
+                psi_next = _next_state_features(batch, basis)
+
+            next_actions = policy.argmax_actions(
+                psi_next.dot(action_weights.T))
+            _add_factored_samples(a_blocks, b_blocks, batch, psi, psi_next,
+                                  next_actions, policy.discount)
+
+        return a_mat, b_vec
+
+
+class StreamingLSTDQSolver(LSTDQSolver):
+
+    r"""Out-of-core LSTDQ solver that reads the data one chunk at a time.
+
+    The data passed to solve is a re-iterable source of chunks such as
+    :py:class:`lspi.SampleChunks`. Every call to solve iterates over the
+    source once and adds the contribution of each chunk
+
+    .. math::
+
+        A_c = \Phi_c^T (\Phi_c - \gamma \Phi'_c), \qquad
+        b_c = \Phi_c^T r_c
+
+    to A and b with the same matrix products as VectorizedLSTDQSolver. Only
+    one chunk and its features are held in memory at a time, so the dataset
+    can be far larger than RAM. Since nothing is kept between calls the
+    features are recomputed on every LSPI iteration.
+
+    Parameters
+    ----------
+    precondition_value: float
+        Value to set A matrix diagonals to. Should be a small positive number.
+        If you do not want preconditioning enabled then set it 0.
+    chunk_size: int
+        Maximum number of samples whose features are materialized at once.
+        Chunks from the source that are larger are split further. Defaults
+        to 4096.
+    factorization: Factorization or None
+        Backend used to solve the linear system. Defaults to None which
+        uses a new LUFactorization.
+
+    Raises
+    ------
+    ValueError
+        If chunk_size < 1
+
+    """
+
+    def __init__(self, precondition_value=.1, chunk_size=4096,
+                 factorization=None):
+        """Initialize StreamingLSTDQSolver."""
+        super(StreamingLSTDQSolver, self).__init__(precondition_value,
+                                                   False, False,
+                                                   factorization)
+        self._chunk_solver = VectorizedLSTDQSolver(precondition_value=0,
+                                                   cache_features=False,
+                                                   chunk_size=chunk_size)
+
+    def _build_system(self, data, policy):
+        """Return the A matrix and b vector summed over all chunks."""
+        k = policy.basis.size()
+        a_mat = np.zeros((k, k))
+        np.fill_diagonal(a_mat, self.precondition_value)
+
+        b_vec = np.zeros((k, 1))
+
+        for chunk in data:
+            if len(chunk) == 0:
+                continue
+            a_chunk, b_chunk = self._chunk_solver._build_system(chunk,
+                                                                policy)
+            a_mat += a_chunk
+            b_vec += b_chunk
+
+        return a_mat, b_vec
+
+
+class SparseLSTDQSolver(LSTDQSolver):
+
+    r"""LSTDQ solver that keeps the features and A matrix in sparse form.
+
+    Meant for bases whose :math:`\phi` vectors have only a few non-zero
+    entries, such as ExactBasis on large discrete state spaces. The features
+    are obtained with the basis' evaluate_sparse_batch method and the system
+
+    .. math::
+
+        A = \Phi^T (\Phi - \gamma \Phi'), \qquad b = \Phi^T r
+
+    is formed with sparse matrix products, so neither the features nor A are
+    ever materialized as dense matrices. The system is then solved either
+    with a sparse direct solver, falling back to least squares if A is
+    singular, or with the iterative LSQR method.
+
+    When cache_features is True the sparse :math:`\phi(s, a)` matrix and one
+    sparse :math:`\phi(s', a')` matrix per action are computed once per data
+    and basis pair.
+
+    Parameters
+    ----------
+    precondition_value: float
+        Value to set A matrix diagonals to. Should be a small positive number.
+        If you do not want preconditioning enabled then set it 0.
+    cache_features: bool
+        If True cache the sparse features of the data between calls to
+        solve. Defaults to True.
+    method: str
+        Either 'direct' to use scipy.sparse.linalg.spsolve or 'lsqr' to use
+        scipy.sparse.linalg.lsqr. Defaults to 'direct'.
+
+    Raises
+    ------
+    ValueError
+        If method is not one of the supported values.
+
+    """
+
+    methods = ('direct', 'lsqr')
+
+    def __init__(self, precondition_value=.1, cache_features=True,
+                 method='direct'):
+        """Initialize SparseLSTDQSolver."""
+        super(SparseLSTDQSolver, self).__init__(precondition_value,
+                                                cache_features)
+        if method not in SparseLSTDQSolver.methods:
+            raise ValueError('method must be one of %s' %
+                             (SparseLSTDQSolver.methods, ))
+        self.method = method
+
+    def _build_system(self, data, policy):
+        """Return the sparse A matrix and b vector."""
+        basis = policy.basis
+        k = basis.size()
+
+        if self.cache_features:
+            phi = self._cache.sparse_state_action_features(data, basis)
+            phi_next = self._cache.sparse_next_state_action_features(data,
+                                                                     basis)
+        else:
+            phi = _sparse_state_action_features(data, basis)
+            phi_next = _sparse_next_state_action_features(data, basis)
+
+        batch = _sample_chunk(data, 0, len(data))
+        phi_sprime = _sparse_greedy_next_features(phi_next, batch.absorb,
+                                                  policy)
+
+        phi_weighted = _weighted_rows(phi, _sample_weights(batch))
+        a_mat = (phi_weighted.T.dot(phi - policy.discount*phi_sprime)
+                 + self.precondition_value*scipy.sparse.identity(k))
+        b_vec = phi_weighted.T.dot(batch.rewards)
+
+        return scipy.sparse.csc_matrix(a_mat), b_vec
+
+    def _solve_system(self, a_mat, b_vec):
+        """Solve the sparse LSTDQ linear system for the new weights."""
+        if self.method == 'lsqr':
+            return scipy.sparse.linalg.lsqr(a_mat, b_vec)[0]
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore',
+                                  scipy.sparse.linalg.MatrixRankWarning)
+            w = scipy.sparse.linalg.spsolve(a_mat, b_vec)
+
+        if not np.all(np.isfinite(w)):
+            logging.warning('A matrix is singular. Using least squares.')
+            w = scipy.sparse.linalg.lsqr(a_mat, b_vec)[0]
+        return w.reshape((-1, ))
+
+
+class KrylovLSTDQSolver(LSTDQSolver):
+
+    r"""Matrix-free LSTDQ solver using Krylov subspace methods.
+
+    The k-by-k A matrix is never formed. Instead A is applied as a linear
+    operator through the feature matrices
+
+    .. math::
+
+        Aw = \Phi^T (\Phi w - \gamma \Phi' w) + \delta w
+
+    which costs :math:`O(Nk)` per product and only stores the (N, k)
+    features. The system is solved with one of scipy.sparse.linalg's
+    iterative methods. The iteration starts from the weights of the policy
+    passed to solve. Successive LSPI iterates are close, so inside
+    lspi.learn later calls usually converge after only a few operator
+    products.
 
-            a_mat += phi_sa.dot((phi_sa - policy.discount*phi_sprime).T)
-            b_vec += phi_sa*sample.reward
+    Bases with is_sparse set are evaluated with evaluate_sparse_batch and
+    their features are kept in sparse form.
 
-        a_rank = np.linalg.matrix_rank(a_mat)
-        if a_rank == k:
-            w = scipy.linalg.solve(a_mat, b_vec)
+    After every call to solve the number of operator products is available
+    in the matvecs attribute and the convergence flag returned by the
+    scipy method in the info attribute. A warning is logged if the method
+    did not converge.
+
+    Parameters
+    ----------
+    precondition_value: float
+        Value to add to the A matrix diagonal. Should be a small positive
+        number. If you do not want preconditioning enabled then set it 0.
+    cache_features: bool
+        If True cache the features of the data between calls to solve.
+        Defaults to True.
+    method: str
+        One of 'gmres', 'bicgstab' or 'lsqr'. Defaults to 'gmres'.
+    tol: float
+        Relative residual tolerance of the iterative method. Defaults to
+        1e-8.
+    maxiter: int or None
+        Maximum number of iterations. Defaults to None which uses the scipy
+        default of the method.
+
+    Raises
+    ------
+    ValueError
+        If method is not one of the supported values.
+
+    """
+
+    methods = ('gmres', 'bicgstab', 'lsqr')
+
+    def __init__(self, precondition_value=.1, cache_features=True,
+                 method='gmres', tol=1e-8, maxiter=None):
+        """Initialize KrylovLSTDQSolver."""
+        super(KrylovLSTDQSolver, self).__init__(precondition_value,
+                                                cache_features)
+        if method not in KrylovLSTDQSolver.methods:
+            raise ValueError('method must be one of %s' %
+                             (KrylovLSTDQSolver.methods, ))
+        self.method = method
+        self.tol = tol
+        self.maxiter = maxiter
+        self.matvecs = 0
+        self.info = None
+
+    def solve(self, data, policy):
+        """Run LSTDQ iteration with a matrix-free iterative method.
+
+        Parameters
+        ----------
+        data: list(Sample) or SampleBatch
+            Samples to learn from.
+        policy: Policy
+            The current policy to find an improvement to. Its weights are
+            the initial guess of the iterative method.
+
+        Returns
+        -------
+        numpy.array
+            The new weights.
+        """
+        phi, phi_sprime, rewards = self._features(data, policy)
+        phi_weighted = _weighted_rows(phi, _sample_weights(data))
+        k = policy.basis.size()
+        discount = policy.discount
+        delta = self.precondition_value
+        self.matvecs = 0
+
+        def matvec(w):
+            self.matvecs += 1
+            w = np.ravel(w)
+            return (phi_weighted.T.dot(phi.dot(w)
+                                       - discount*phi_sprime.dot(w))
+                    + delta*w)
+
+        def rmatvec(y):
+            self.matvecs += 1
+            y = np.ravel(y)
+            phi_y = phi_weighted.dot(y)
+            return (phi.T.dot(phi_y) - discount*phi_sprime.T.dot(phi_y)
+                    + delta*y)
+
+        a_op = scipy.sparse.linalg.LinearOperator((k, k), matvec=matvec,
+                                                  rmatvec=rmatvec,
+                                                  dtype=np.float64)
+        b_vec = np.ravel(phi_weighted.T.dot(rewards))
+        x0 = np.asarray(policy.weights, dtype=np.float64).reshape((-1, ))
+
+        if self.method == 'lsqr':
+            result = scipy.sparse.linalg.lsqr(a_op, b_vec, atol=self.tol,
+                                              btol=self.tol,
+                                              iter_lim=self.maxiter, x0=x0)
+            w = result[0]
+            # 1, 2, 4 and 5 are the converged stopping conditions
+            self.info = result[1]
+            converged = result[1] in (0, 1, 2, 4, 5)
         else:
-            logging.warning('A matrix is not full rank. %d < %d', a_rank, k)
-            w = scipy.linalg.lstsq(a_mat, b_vec)[0]
+            iterative_method = getattr(scipy.sparse.linalg, self.method)
+            w, self.info = iterative_method(a_op, b_vec, x0=x0, tol=self.tol,
+                                            maxiter=self.maxiter, atol=0.)
+            converged = self.info == 0
+
+        if not converged:
+            logging.warning('%s did not converge (info %d) after %d matvecs',
+                            self.method, self.info, self.matvecs)
         return w.reshape((-1, ))
+
+    def _features(self, data, policy):
+        r"""Return :math:`\Phi`, :math:`\Phi'` and the rewards of data."""
+        basis = policy.basis
+        batch = _sample_chunk(data, 0, len(data))
+
+        if basis.is_sparse:
+            if self.cache_features:
+                phi = self._cache.sparse_state_action_features(data, basis)
+                phi_next = self._cache.sparse_next_state_action_features(
+                    data, basis)
+            else:
+                phi = _sparse_state_action_features(data, basis)
+                phi_next = _sparse_next_state_action_features(data, basis)
+            phi_sprime = _sparse_greedy_next_features(phi_next, batch.absorb,
+                                                      policy)
+        else:
+            if self.cache_features:
+                phi = self._cache.state_action_features(data, basis)
+                phi_sprime = _greedy_features(
+                    batch, policy, self._cache.unique_next_states(data, basis))
+            else:
+                phi = _state_action_features(data, basis)
+                phi_sprime = _greedy_features(batch, policy)
+
+        return phi, phi_sprime, batch.rewards
+
+
+class RecursiveLSTDQSolver(LSTDQSolver):
+
+    r"""LSTDQ solver that maintains :math:`A^{-1}` with rank one updates.
+
+    Every sample adds the rank one term :math:`u v^T` to A, with
+    :math:`u = \phi(s, a)` and :math:`v = \phi(s, a) - \gamma \phi(s',
+    \pi(s'))`. Instead of rebuilding and factorizing A the solver keeps
+    :math:`A^{-1}` up to date with the Sherman-Morrison formula
+
+    .. math::
+
+        (A + u v^T)^{-1} = A^{-1} - \frac{A^{-1} u v^T A^{-1}}
+                                         {1 + v^T A^{-1} u}
+
+    which costs :math:`O(k^2)` per sample. The matrix starts as
+    :math:`A = \delta I` where :math:`\delta` is the precondition value, so
+    the result matches LSTDQSolver with the same precondition value.
+
+    The solver can be used with lspi.learn like any other Solver, in which
+    case each call to solve starts from scratch. It can also learn online:
+    update ingests one sample at a time and returns the new weights, see
+    :py:func:`lspi.learn_online`. In online mode the next state action of a
+    sample is chosen by the policy passed to update when the sample arrives
+    and is not revised later.
+
+    A sample whose update would make A singular, i.e. with
+    :math:`|1 + v^T A^{-1} u|` below the tolerance, is left out of
+    :math:`A^{-1}` (its reward is still added to b) and a warning is
+    logged. The number of such samples in the last call to solve, or since
+    the last reset for update, is available in the num_skipped attribute.
+
+    Parameters
+    ----------
+    precondition_value: float
+        Initial value of the A matrix diagonal. Must be > 0 so that A starts
+        out invertible.
+    cache_features: bool
+        If True cache the :math:`\phi(s, a)` features of the data between
+        calls to solve. Defaults to True.
+    tolerance: float
+        Relative tolerance of the Sherman-Morrison denominator. Defaults to
+        1e-10.
+
+    Raises
+    ------
+    ValueError
+        If precondition_value <= 0
+
+    """
+
+    def __init__(self, precondition_value=.1, cache_features=True,
+                 tolerance=1e-10):
+        """Initialize RecursiveLSTDQSolver."""
+        if precondition_value <= 0:
+            raise ValueError('precondition_value must be > 0')
+        super(RecursiveLSTDQSolver, self).__init__(precondition_value,
+                                                   cache_features)
+        self.tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        """Forget all of the samples ingested by update."""
+        self.a_inv = None
+        self.b_vec = None
+        self.num_skipped = 0
+
+    def solve(self, data, policy):
+        """Run LSTDQ iteration with recursive least squares.
+
+        Parameters
+        ----------
+        data: list(Sample) or SampleBatch
+            Samples to learn from.
+        policy: Policy
+            The current policy to find an improvement to.
+
+        Returns
+        -------
+        numpy.array
+            The new weights.
+
+        """
+        k = policy.basis.size()
+        a_inv = np.eye(k) / self.precondition_value
+        b_vec = np.zeros((k, ))
+
+        if self.cache_features:
+            phi = self._cache.state_action_features(data, policy.basis)
+            phi_sprime = _greedy_features(
+                data, policy,
+                self._cache.unique_next_states(data, policy.basis))
+        else:
+            phi = _state_action_features(data, policy.basis)
+            phi_sprime = _greedy_features(data, policy)
+        rewards = _sample_chunk(data, 0, len(data)).rewards
+        phi_weighted = _weighted_rows(phi, _sample_weights(data))
+
+        self.num_skipped = 0
+        for phi_sa, phi_w, phi_next, reward in zip(phi, phi_weighted,
+                                                   phi_sprime, rewards):
+            if not _sherman_morrison_update(a_inv,
+                                            phi_w,
+                                            phi_sa - policy.discount*phi_next,
+                                            self.tolerance):
+                self.num_skipped += 1
+            b_vec += phi_w*reward
+
+        if self.num_skipped > 0:
+            logging.warning('Skipped %d singular Sherman-Morrison updates.',
+                            self.num_skipped)
+        return a_inv.dot(b_vec)
+
+    def update(self, sample, policy):
+        """Ingest a single sample and return the updated weights.
+
+        Parameters
+        ----------
+        sample: Sample
+            The newly observed sample.
+        policy: Policy
+            Policy used to select the greedy action in the next state.
+
+        Returns
+        -------
+        numpy.array
+            The weights that solve the LSTDQ system of all of the samples
+            ingested since the last reset.
+
+        """
+        basis = policy.basis
+        k = basis.size()
+        if self.a_inv is None or self.a_inv.shape != (k, k):
+            self.a_inv = np.eye(k) / self.precondition_value
+            self.b_vec = np.zeros((k, ))
+
+        phi_sa = basis.evaluate(sample.state, sample.action)
+        if sample.absorb:
+            phi_next = np.zeros((k, ))
+        else:
+            phi_next = basis.evaluate(sample.next_state,
+                                      policy.best_action(sample.next_state))
+
+        if not _sherman_morrison_update(self.a_inv,
+                                        phi_sa,
+                                        phi_sa - policy.discount*phi_next,
+                                        self.tolerance):
+            self.num_skipped += 1
+            logging.warning('Skipped a singular Sherman-Morrison update.')
+        self.b_vec += phi_sa*sample.reward
+
+        return self.weights
+
+    @property
+    def weights(self):
+        """Return the weights for the samples ingested by update.
+
+        Returns
+        -------
+        numpy.array or None
+            The current weights or None if no sample has been ingested.
+
+        """
+        if self.a_inv is None:
+            return None
+        return self.a_inv.dot(self.b_vec)
+
+
+class IncrementalLSTDQSolver(LSTDQSolver):
+
+    r"""LSTDQ solver that only revisits samples whose greedy action changed.
+
+    :math:`\phi(s, a)` and b do not depend on the policy and between LSPI
+    iterations most samples keep the same greedy next action
+    :math:`\pi(s')`. The solver therefore keeps A, b and the greedy next
+    action of every sample from the previous call to solve. When called
+    again with the same data, basis and discount it only corrects A for the
+    c samples whose greedy action flipped
+
+    .. math::
+
+        A \leftarrow A - \gamma \Phi_c^T (\Phi'_{c,new} - \Phi'_{c,old})
+
+    which costs :math:`O(ck)` instead of :math:`O(Nk^2)` and is free once
+    the policy stops changing. If the data extends the previous data with
+    appended samples (see :py:class:`lspi.Learner`) the new samples are
+    added to A and b in the same low rank correction, so only the new
+    samples' features are computed. Any other call rebuilds the system from
+    scratch. The number of samples processed by the last call is available
+    in the num_updated attribute.
+
+    Finding the greedy actions uses the precomputed (N, num_actions, k)
+    tensor of :math:`\phi(s', a')` features, see
+    LSTDQSolver.precompute_next_features, so features are always cached.
+    For state factored bases (see
+    :py:meth:`lspi.basis_functions.BasisFunction.state_features_size`) only
+    the (N, m) state features :math:`\psi(s)` and :math:`\psi(s')` are
+    cached instead and the :math:`\phi` rows of the corrected samples are
+    built from them, like in VectorizedLSTDQSolver.
+
+    If woodbury is True :math:`A^{-1}` is kept as well and corrected with
+    the Woodbury identity, which is :math:`O(k^2 c)` when c < k and turns
+    each solve into a matrix vector product. Otherwise the corrected A is
+    solved with the factorization backend.
+
+    Parameters
+    ----------
+    precondition_value: float
+        Value to set A matrix diagonals to. Should be a small positive number.
+        If you do not want preconditioning enabled then set it 0.
+    woodbury: bool
+        If True maintain the inverse of A with Woodbury updates. Defaults to
+        False.
+    factorization: Factorization or None
+        Backend used to solve the linear system when woodbury is False.
+        Defaults to None which uses a new LUFactorization.
+
+    """
+
+    def __init__(self, precondition_value=.1, woodbury=False,
+                 factorization=None):
+        """Initialize IncrementalLSTDQSolver."""
+        super(IncrementalLSTDQSolver, self).__init__(precondition_value,
+                                                     True, True,
+                                                     factorization)
+        self.woodbury = woodbury
+        self.reset()
+
+    def reset(self):
+        """Forget the stored system so the next solve starts from scratch."""
+        self.a_mat = None
+        self.a_inv = None
+        self.b_vec = None
+        self.num_updated = 0
+        self._next_actions = None
+        self._actions = None
+        self._features = None
+        self._discount = None
+
+    def clear_cache(self):
+        """Discard all cached features and the stored system."""
+        super(IncrementalLSTDQSolver, self).clear_cache()
+        self.reset()
+
+    def solve(self, data, policy):
+        """Run LSTDQ iteration reusing the previous system where possible.
+
+        Parameters
+        ----------
+        data: list(Sample) or SampleBatch
+            Samples to learn from.
+        policy: Policy
+            The current policy to find an improvement to.
+
+        Returns
+        -------
+        numpy.array
+            The new weights.
+
+        """
+        basis = policy.basis
+        if basis.state_features_size() is None:
+            features = self._cache.state_action_features(data, basis)
+            next_features = self._cache.next_state_action_features(data,
+                                                                   basis)
+            next_actions = policy.argmax_actions(
+                next_features.dot(policy.weights))
+        else:
+            features = self._cache.state_features(data, basis)
+            next_features = self._cache.next_state_features(data, basis)
+            next_actions = policy.argmax_actions(next_features.dot(
+                policy.weights.reshape((basis.num_actions, -1)).T))
+
+        # the cache returns a new feature matrix whenever the data or basis
+        # changed, so the stored system is only valid for the same object
+        # or for data that extends it
+        if self._features is not None and policy.discount == self._discount \
+                and (features is self._features or self._cache.extended_from
+                     == self._features.shape[0]):
+            self._update(data, policy, features, next_features, next_actions)
+        else:
+            self._rebuild(data, policy, features, next_features,
+                          next_actions)
+
+        if self.woodbury:
+            return self.a_inv.dot(self.b_vec)
+        return self._solve_system(self.a_mat, self.b_vec)
+
+    def _rebuild(self, data, policy, features, next_features, next_actions):
+        """Build A, b and optionally the inverse of A from scratch."""
+        basis = policy.basis
+        k = basis.size()
+        batch = _sample_chunk(data, 0, len(data))
+
+        self.a_mat = self.precondition_value*np.eye(k)
+        self.b_vec = np.zeros((k, ))
+        if basis.state_features_size() is None:
+            phi_sprime = next_features[np.arange(features.shape[0]),
+                                       next_actions]
+            phi_weighted = _weighted_rows(features, _sample_weights(batch))
+            self.a_mat += phi_weighted.T.dot(features
+                                             - policy.discount*phi_sprime)
+            self.b_vec += phi_weighted.T.dot(batch.rewards)
+        else:
+            m = basis.state_features_size()
+            _add_factored_samples(
+                self.a_mat.reshape((basis.num_actions, m,
+                                    basis.num_actions, m)),
+                self.b_vec.reshape((basis.num_actions, m)),
+                batch, features, next_features, next_actions,
+                policy.discount)
+        if self.woodbury:
+            self.a_inv = np.linalg.inv(self.a_mat)
+
+        self.num_updated = features.shape[0]
+        self._next_actions = next_actions
+        self._actions = batch.actions
+        self._features = features
+        self._discount = policy.discount
+
+    def _update(self, data, policy, features, next_features, next_actions):
+        """Correct A for flipped greedy actions and add appended samples."""
+        previous_actions = self._next_actions
+        num_previous = previous_actions.shape[0]
+        changed = np.flatnonzero(next_actions[:num_previous]
+                                 != previous_actions)
+        appended = np.arange(num_previous, features.shape[0])
+        rows = np.concatenate([changed, appended])
+        appended_batch = _sample_chunk(data, num_previous, features.shape[0])
+
+        self.num_updated = rows.shape[0]
+        self._next_actions = next_actions
+        self._actions = np.concatenate([self._actions,
+                                        appended_batch.actions])
+        self._features = features
+        if self.num_updated == 0:
+            return
+
+        basis = policy.basis
+        if basis.state_features_size() is None:
+            phi = features[rows]
+            phi_sprime = next_features[rows, next_actions[rows]]
+            phi_changed = next_features[changed, previous_actions[changed]]
+        else:
+            phi = _action_rows(features[rows], self._actions[rows],
+                               basis.num_actions)
+            phi_sprime = _action_rows(next_features[rows],
+                                      next_actions[rows], basis.num_actions)
+            phi_changed = _action_rows(next_features[changed],
+                                       previous_actions[changed],
+                                       basis.num_actions)
+        phi_old = np.zeros(phi_sprime.shape)
+        phi_old[:changed.shape[0]] = phi_changed
+
+        counts = _sample_weights(data)
+        u_mat = _weighted_rows(phi,
+                               None if counts is None else counts[rows]).T
+        # flipped samples swap the old next state features for the new
+        # ones, appended samples contribute phi - discount*phi' in full
+        vt_mat = -policy.discount*(phi_sprime - phi_old)
+        vt_mat[changed.shape[0]:] += phi[changed.shape[0]:]
+
+        self.a_mat += u_mat.dot(vt_mat)
+        if appended.shape[0] > 0:
+            self.b_vec += u_mat[:, changed.shape[0]:].dot(
+                appended_batch.rewards)
+
+        if not self.woodbury:
+            return
+        if self.num_updated < self.a_mat.shape[0]:
+            a_inv_u = self.a_inv.dot(u_mat)
+            vt_a_inv = vt_mat.dot(self.a_inv)
+            capacitance = np.eye(self.num_updated) + vt_mat.dot(a_inv_u)
+            self.a_inv -= a_inv_u.dot(np.linalg.solve(capacitance, vt_a_inv))
+        else:
+            self.a_inv = np.linalg.inv(self.a_mat)
+
+
+class ParallelLSTDQSolver(LSTDQSolver):
+
+    r"""LSTDQ solver that accumulates A and b across worker processes.
+
+    The A matrix and b vector are sums of per sample terms, so the data is
+    split into one shard per worker process. On every call to solve each
+    worker computes the partial A and b of its shard for the current policy
+    weights with a VectorizedLSTDQSolver and the partial results are summed
+    before the system is solved in the calling process.
+
+    The shards and the basis are sent to the workers only when solve is
+    called with a new data or basis object (or when the number of samples
+    or the basis size changes), so during lspi.learn only the policy weights
+    travel to the workers each iteration. The workers also keep their
+    feature caches between iterations.
+
+    The worker processes are started on the first call to solve and keep
+    running until close is called. The solver can be used as a context
+    manager to close them automatically.
+
+    Parameters
+    ----------
+    precondition_value: float
+        Value to set A matrix diagonals to. Should be a small positive number.
+        If you do not want preconditioning enabled then set it 0.
+    num_processes: int or None
+        Number of worker processes. Defaults to None which uses one process
+        per CPU.
+    chunk_size: int
+        Chunk size of the VectorizedLSTDQSolver used by each worker.
+        Defaults to 4096.
+    factorization: Factorization or None
+        Backend used to solve the linear system. Defaults to None which
+        uses a new LUFactorization.
+
+    Raises
+    ------
+    ValueError
+        If num_processes < 1
+
+    """
+
+    def __init__(self, precondition_value=.1, num_processes=None,
+                 chunk_size=4096, factorization=None):
+        """Initialize ParallelLSTDQSolver."""
+        super(ParallelLSTDQSolver, self).__init__(
+            precondition_value, factorization=factorization)
+
+        if num_processes is None:
+            num_processes = multiprocessing.cpu_count()
+        if num_processes < 1:
+            raise ValueError('num_processes must be >= 1')
+
+        self.num_processes = num_processes
+        self.chunk_size = chunk_size
+        self._workers = []
+        self.clear_cache()
+
+    def __enter__(self):
+        """Return self for use as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the worker processes."""
+        self.close()
+
+    def close(self):
+        """Stop the worker processes.
+
+        The solver can still be used afterwards, new workers are started on
+        the next call to solve.
+
+        """
+        for process, connection in self._workers:
+            connection.send(('close', ))
+            connection.close()
+            process.join()
+        self._workers = []
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Discard the shards and cached features held by the workers."""
+        self._shard_data = None
+        self._shard_basis = None
+        self._shard_key = None
+
+    def _build_system(self, data, policy):
+        """Return the A matrix and b vector summed over all workers."""
+        self._distribute(data, policy.basis)
+
+        for _, connection in self._workers:
+            connection.send(('accumulate',
+                             policy.weights,
+                             policy.discount,
+                             policy.tie_breaking_strategy))
+
+        k = policy.basis.size()
+        a_mat = np.zeros((k, k))
+        np.fill_diagonal(a_mat, self.precondition_value)
+        b_vec = np.zeros((k, 1))
+
+        errors = []
+        for _, connection in self._workers:
+            status, result = connection.recv()
+            if status == 'error':
+                errors.append(result)
+            else:
+                a_mat += result[0]
+                b_vec += result[1]
+
+        if errors:
+            raise errors[0]
+
+        return a_mat, b_vec
+
+    def _distribute(self, data, basis):
+        """Send one shard of data and the basis to every worker if needed."""
+        key = (len(data), basis.size())
+        if data is self._shard_data and basis is self._shard_basis \
+                and key == self._shard_key:
+            return
+
+        if not self._workers:
+            self._start_workers()
+
+        batch = _sample_chunk(data, 0, len(data))
+        bounds = np.linspace(0, len(batch), len(self._workers) + 1)
+        bounds = bounds.astype(np.int_)
+        for i, (_, connection) in enumerate(self._workers):
+            connection.send(('load', batch[bounds[i]:bounds[i+1]], basis))
+
+        self._shard_data = data
+        self._shard_basis = basis
+        self._shard_key = key
+
+    def _start_workers(self):
+        """Start num_processes worker processes."""
+        for i in range(self.num_processes):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_parallel_lstdq_worker,
+                args=(child_connection, self.chunk_size))
+            process.daemon = True
+            process.start()
+            child_connection.close()
+            self._workers.append((process, parent_connection))
+
+
+class _FeatureCache(object):
+
+    """Features computed for a single data and basis pair.
+
+    The cache remembers the data and basis objects it was filled for, a
+    snapshot of the Sample objects of a list or the columns of a
+    SampleBatch, and a fingerprint of the basis parameters. Any request for
+    a different pair, for a list whose samples were replaced, for a batch
+    whose columns were reassigned or for a basis whose parameters changed
+    empties the cache first. Modifying a Sample or a column in place is not
+    detected.
+
+    If the new data extends the cached data, i.e. it is longer and starts
+    with the same samples, the cached features are kept and only the
+    features of the appended samples are computed. Whether the data is an
+    extension is decided from the sample values for SampleBatch data and
+    from the identity of the Sample objects for lists, compared against the
+    snapshot. A batch that shares memory with the cached batch is never an
+    extension. After such a change extended_from is the number of reused
+    samples, otherwise it is None.
+
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self.clear()
+
+    def clear(self):
+        """Discard all cached features."""
+        self._data = None
+        self._basis = None
+        self._snapshot = None
+        self._fingerprint = None
+        self._num_samples = None
+        self._phi_sa = None
+        self._phi_next = None
+        self._psi = None
+        self._psi_next = None
+        self._sparse_phi_sa = None
+        self._sparse_phi_next = None
+        self._unique_next_states = None
+        self.extended_from = None
+
+    def _check_key(self, data, basis):
+        """Clear or extend the cache if it was not filled for this data."""
+        same_basis = basis is self._basis \
+            and _basis_fingerprint(basis) == self._fingerprint
+        if same_basis and data is self._data \
+                and len(data) == self._num_samples \
+                and self._matches_snapshot(data):
+            return
+
+        if same_basis and self._is_extension(data):
+            self._extend(data, basis)
+        else:
+            self.clear()
+
+        self._data = data
+        self._basis = basis
+        self._snapshot = _data_snapshot(data)
+        self._fingerprint = _basis_fingerprint(basis)
+        self._num_samples = len(data)
+
+    def _matches_snapshot(self, data):
+        """Return True if data still holds the samples of the snapshot."""
+        if isinstance(data, SampleBatch):
+            return isinstance(self._snapshot, SampleBatch) and \
+                all(value is vars(self._snapshot).get(name)
+                    for name, value in vars(data).items())
+        return not isinstance(self._snapshot, SampleBatch) and \
+            all(new is old for new, old in zip(data, self._snapshot))
+
+    def _is_extension(self, data):
+        """Return True if data starts with the cached samples."""
+        if self._data is None or len(data) <= self._num_samples:
+            return False
+
+        num_samples = self._num_samples
+        cached = self._snapshot
+        if isinstance(data, SampleBatch) and isinstance(cached, SampleBatch):
+            # views of the same buffer (such as a ReplayMemory that wrapped
+            # around) always compare equal even if rows were overwritten
+            if np.may_share_memory(data.actions, cached.actions):
+                return False
+            counts = _sample_weights(data)
+            cached_counts = _sample_weights(cached)
+            if (counts is None) != (cached_counts is None) or \
+                    (counts is not None and
+                     not np.array_equal(counts[:num_samples], cached_counts)):
+                return False
+            return all(np.array_equal(getattr(data, column)[:num_samples],
+                                      getattr(cached, column))
+                       for column in ('actions', 'rewards', 'absorb',
+                                      'states', 'next_states'))
+        if isinstance(data, SampleBatch) or isinstance(cached, SampleBatch):
+            return False
+        return all(new is old for new, old in zip(data[:num_samples],
+                                                  cached))
+
+    def _extend(self, data, basis):
+        """Append the features of the new samples to the cached features."""
+        self.extended_from = self._num_samples
+        appended = _sample_chunk(data, self._num_samples, len(data))
+
+        if self._phi_sa is not None:
+            self._phi_sa = np.concatenate(
+                [self._phi_sa, _state_action_features(appended, basis)])
+        if self._phi_next is not None:
+            self._phi_next = np.concatenate(
+                [self._phi_next,
+                 _next_state_action_features(appended, basis)])
+        if self._psi is not None:
+            self._psi = np.concatenate(
+                [self._psi, _state_features(appended, basis)])
+        if self._psi_next is not None:
+            self._psi_next = np.concatenate(
+                [self._psi_next, _next_state_features(appended, basis)])
+        if self._sparse_phi_sa is not None:
+            self._sparse_phi_sa = scipy.sparse.vstack(
+                [self._sparse_phi_sa,
+                 _sparse_state_action_features(appended, basis)],
+                format='csr')
+        # the distinct next states of the old and new samples overlap, so
+        # they are recomputed for the whole data on the next request
+        self._unique_next_states = None
+        if self._sparse_phi_next is not None:
+            self._sparse_phi_next = [
+                scipy.sparse.vstack([phi_a, phi_new], format='csr')
+                for phi_a, phi_new in zip(
+                    self._sparse_phi_next,
+                    _sparse_next_state_action_features(appended, basis))]
+
+    def state_action_features(self, data, basis):
+        r"""Return the (N, k) matrix of :math:`\phi(s, a)` rows for data."""
+        self._check_key(data, basis)
+        if self._phi_sa is None:
+            self._phi_sa = _state_action_features(data, basis)
+        return self._phi_sa
+
+    def next_state_action_features(self, data, basis):
+        r"""Return the (N, num_actions, k) tensor of :math:`\phi(s', a')`.
+
+        The rows of absorbing samples are left as zeros since their next
+        state does not contribute to the LSTDQ update.
+
+        """
+        self._check_key(data, basis)
+        if self._phi_next is None:
+            self._phi_next = _next_state_action_features(data, basis)
+        return self._phi_next
+
+    def state_features(self, data, basis):
+        r"""Return the (N, m) matrix of :math:`\psi(s)` rows for data."""
+        self._check_key(data, basis)
+        if self._psi is None:
+            if isinstance(data, TrajectoryBatch):
+                self._psi, self._psi_next = \
+                    _trajectory_state_features(data, basis)
+            else:
+                self._psi = _state_features(data, basis)
+        return self._psi
+
+    def next_state_features(self, data, basis):
+        r"""Return the (N, m) matrix of :math:`\psi(s')` rows for data.
+
+        The rows of absorbing samples are left as zeros.
+
+        """
+        self._check_key(data, basis)
+        if self._psi_next is None:
+            if isinstance(data, TrajectoryBatch):
+                self._psi, self._psi_next = \
+                    _trajectory_state_features(data, basis)
+            else:
+                self._psi_next = _next_state_features(data, basis)
+        return self._psi_next
+
+    def unique_next_states(self, data, basis):
+        """Return the distinct next states of the non-absorbing samples.
+
+        See _unique_next_states for the returned tuple. The basis is only
+        part of the cache key.
+
+        """
+        self._check_key(data, basis)
+        if self._unique_next_states is None:
+            self._unique_next_states = \
+                _unique_next_states(_sample_chunk(data, 0, len(data)))
+        return self._unique_next_states
+
+    def sparse_state_action_features(self, data, basis):
+        r"""Return the sparse (N, k) matrix of :math:`\phi(s, a)` rows."""
+        self._check_key(data, basis)
+        if self._sparse_phi_sa is None:
+            self._sparse_phi_sa = _sparse_state_action_features(data, basis)
+        return self._sparse_phi_sa
+
+    def sparse_next_state_action_features(self, data, basis):
+        r"""Return a sparse (N, k) :math:`\phi(s', a')` matrix per action."""
+        self._check_key(data, basis)
+        if self._sparse_phi_next is None:
+            self._sparse_phi_next = \
+                _sparse_next_state_action_features(data, basis)
+        return self._sparse_phi_next
+
+
+def _data_snapshot(data):
+    """Return a copy of the container of data that shares the samples.
+
+    A list is copied so samples replaced or appended later are noticed. A
+    SampleBatch is copied shallowly so that it keeps referencing the current
+    columns.
+
+    """
+    if isinstance(data, SampleBatch):
+        return copy.copy(data)
+    return list(data)
+
+
+def _basis_fingerprint(basis):
+    """Return a value that changes when a basis parameter is reassigned.
+
+    Numbers and strings are compared by value and numpy arrays by their
+    contents. Any other attribute is compared by identity.
+
+    """
+    fingerprint = []
+    for name, value in sorted(vars(basis).items()):
+        if isinstance(value, (numbers.Number, basestring, type(None))):
+            fingerprint.append((name, value))
+        elif isinstance(value, np.ndarray):
+            fingerprint.append((name, value.dtype.str, value.shape,
+                                hash(value.tobytes())))
+        else:
+            fingerprint.append((name, id(value)))
+    return fingerprint
+
+
+def _state_action_features(data, basis):
+    r"""Return the (N, k) matrix of :math:`\phi(s, a)` rows for data."""
+    if len(data) == 0:
+        return np.zeros((0, basis.size()))
+    batch = _sample_chunk(data, 0, len(data))
+    return basis.evaluate_batch(batch.states, batch.actions)
+
+
+def _next_state_action_features(data, basis):
+    r"""Return the (N, num_actions, k) tensor of :math:`\phi(s', a')`.
+
+    The basis is evaluated once per distinct next state. Rows of absorbing
+    samples are zero.
+
+    """
+    phi = np.zeros((len(data), basis.num_actions, basis.size()))
+    rows, next_states, inverse = \
+        _unique_next_states(_sample_chunk(data, 0, len(data)))
+    if rows.shape[0] > 0:
+        for action in range(basis.num_actions):
+            phi[rows, action] = basis.evaluate_batch(
+                next_states, np.repeat(action, next_states.shape[0]))[inverse]
+    return phi
+
+
+def _sparse_state_action_features(data, basis):
+    r"""Return the sparse (N, k) matrix of :math:`\phi(s, a)` rows."""
+    if len(data) == 0:
+        return scipy.sparse.csr_matrix((0, basis.size()))
+    batch = _sample_chunk(data, 0, len(data))
+    return basis.evaluate_sparse_batch(batch.states, batch.actions)
+
+
+def _sparse_next_state_action_features(data, basis):
+    r"""Return a list with a sparse :math:`\phi(s', a')` matrix per action.
+
+    Rows of absorbing samples are empty.
+
+    """
+    rows, next_states, inverse = \
+        _unique_next_states(_sample_chunk(data, 0, len(data)))
+    # copies the distinct next state rows to the non-absorbing samples
+    scatter = scipy.sparse.csr_matrix(
+        (np.ones(rows.shape[0]), (rows, inverse)),
+        shape=(len(data), next_states.shape[0]))
+
+    if basis.state_features_size() is not None:
+        # evaluate psi(s') once and shift it into the block of every action
+        if rows.shape[0] > 0:
+            psi_next = scipy.sparse.csr_matrix(
+                scatter.dot(basis.evaluate_sparse_state_batch(next_states)))
+        else:
+            psi_next = scipy.sparse.csr_matrix(
+                (len(data), basis.state_features_size()))
+        return [_shift_block(psi_next, action, basis.size())
+                for action in range(basis.num_actions)]
+
+    phi_next = []
+    for action in range(basis.num_actions):
+        if rows.shape[0] > 0:
+            phi_a = basis.evaluate_sparse_batch(
+                next_states, np.repeat(action, next_states.shape[0]))
+        else:
+            phi_a = scipy.sparse.csr_matrix((0, basis.size()))
+        phi_next.append(scipy.sparse.csr_matrix(scatter.dot(phi_a)))
+    return phi_next
+
+
+def _shift_block(psi, action, size):
+    r"""Return the sparse :math:`\phi` rows of action given :math:`\psi`."""
+    return scipy.sparse.csr_matrix(
+        (psi.data, psi.indices + action*psi.shape[1], psi.indptr),
+        shape=(psi.shape[0], size))
+
+
+def _state_features(data, basis):
+    r"""Return the (N, m) matrix of :math:`\psi(s)` rows for data."""
+    if len(data) == 0:
+        return np.zeros((0, basis.state_features_size()))
+    batch = _sample_chunk(data, 0, len(data))
+    return basis.evaluate_state_batch(batch.states)
+
+
+def _next_state_features(data, basis):
+    r"""Return the (N, m) matrix of :math:`\psi(s')` rows for data.
+
+    The basis is evaluated once per distinct next state. Rows of absorbing
+    samples are zero.
+
+    """
+    psi = np.zeros((len(data), basis.state_features_size()))
+    rows, next_states, inverse = \
+        _unique_next_states(_sample_chunk(data, 0, len(data)))
+    if rows.shape[0] > 0:
+        psi[rows] = basis.evaluate_state_batch(next_states)[inverse]
+    return psi
+
+
+def _trajectory_state_features(data, basis):
+    r"""Return :math:`\psi(s)` and :math:`\psi(s')` of a TrajectoryBatch.
+
+    The basis is evaluated once for every state table row referenced by the
+    batch and the rows are gathered into the (N, m) state and next state
+    feature matrices. Rows of absorbing samples are zero in the latter.
+
+    """
+    num_samples = len(data)
+    rows, inverse = np.unique(
+        np.concatenate([data.state_index,
+                        data.next_state_index[~data.absorb]]),
+        return_inverse=True)
+
+    if rows.shape[0] > 0:
+        psi_table = basis.evaluate_state_batch(data.state_table[rows])
+    else:
+        psi_table = np.zeros((0, basis.state_features_size()))
+
+    psi = psi_table[inverse[:num_samples]]
+    psi_next = np.zeros(psi.shape)
+    psi_next[~data.absorb] = psi_table[inverse[num_samples:]]
+    return psi, psi_next
+
+
+def _add_factored_samples(a_blocks, b_blocks, batch, psi, psi_next,
+                          next_actions, discount):
+    r"""Add the samples of a state factored basis to the blocks of A and b.
+
+    See VectorizedLSTDQSolver._build_factored_system.
+
+    Parameters
+    ----------
+    a_blocks: numpy.array
+        The A matrix viewed as (num_actions, m, num_actions, m) blocks.
+    b_blocks: numpy.array
+        The b vector viewed as (num_actions, m) blocks.
+    batch: SampleBatch
+        The samples.
+    psi: numpy.array
+        The (N, m) :math:`\psi(s)` rows of the samples.
+    psi_next: numpy.array
+        The (N, m) :math:`\psi(s')` rows of the samples.
+    next_actions: numpy.array
+        The greedy action of every next state.
+    discount: float
+        The discount factor of the policy.
+
+    """
+    num_actions = a_blocks.shape[0]
+    psi_weighted = _weighted_rows(psi, _sample_weights(batch))
+
+    for action in range(num_actions):
+        rows = batch.actions == action
+        if not np.any(rows):
+            continue
+
+        psi_a = psi_weighted[rows]
+        a_blocks[action, :, action, :] += psi_a.T.dot(psi[rows])
+        b_blocks[action] += psi_a.T.dot(batch.rewards[rows])
+
+        for next_action in range(num_actions):
+            pairs = rows & ~batch.absorb & (next_actions == next_action)
+            if np.any(pairs):
+                a_blocks[action, :, next_action, :] -= \
+                    discount*psi_weighted[pairs].T.dot(psi_next[pairs])
+
+
+def _action_rows(psi, actions, num_actions):
+    r"""Return the dense :math:`\phi` rows of actions given :math:`\psi`."""
+    phi = np.zeros((psi.shape[0], num_actions, psi.shape[1]))
+    phi[np.arange(psi.shape[0]), actions] = psi
+    return phi.reshape((psi.shape[0], num_actions*psi.shape[1]))
+
+
+def _greedy_features(data, policy, unique_next_states=None):
+    r"""Return the (N, k) matrix of :math:`\phi(s', \pi(s'))` rows.
+
+    The greedy action and its features are computed once per distinct next
+    state and copied to every sample with that next state, so with random
+    tie breaking those samples also share the chosen action. Rows of
+    absorbing samples are zero. Next states that are not numeric arrays,
+    such as dicts or tuples in an object array, cannot be compared, so
+    their greedy actions are found one sample at a time with best_action.
+
+    Parameters
+    ----------
+    data: list(Sample) or SampleBatch
+        The samples.
+    policy: Policy
+        Policy whose greedy actions are used.
+    unique_next_states: tuple or None
+        Precomputed result of _unique_next_states for data. Defaults to None
+        which computes it.
+
+    """
+    phi = np.zeros((len(data), policy.basis.size()))
+    if unique_next_states is None:
+        unique_next_states = \
+            _unique_next_states(_sample_chunk(data, 0, len(data)))
+    rows, next_states, inverse = unique_next_states
+    if rows.shape[0] == 0:
+        return phi
+
+    if not _is_numeric(next_states):
+        for row, next_state in zip(rows, next_states[inverse]):
+            phi[row] = policy.basis.evaluate(next_state,
+                                             policy.best_action(next_state))
+        return phi
+
+    phi[rows] = policy.basis.evaluate_batch(
+        next_states, policy.best_actions(next_states))[inverse]
+    return phi
+
+
+def _unique_next_states(batch):
+    """Return the distinct next states of the non-absorbing samples.
+
+    Next states that are not numeric arrays are not compared and every
+    non-absorbing sample keeps its own next state.
+
+    Returns
+    -------
+    tuple(numpy.array, numpy.array, numpy.array)
+        The indices of the non-absorbing samples, their (U, ...) distinct
+        next states and for each of those samples the row of its next state.
+
+    """
+    rows = np.flatnonzero(~batch.absorb)
+    if not isinstance(batch, TrajectoryBatch) and \
+            not _is_numeric(batch.next_states):
+        return rows, batch.next_states[rows], np.arange(rows.shape[0])
+    if rows.shape[0] == len(batch):
+        return (rows, ) + batch.unique_next_states()
+    return (rows, ) + batch[rows].unique_next_states()
+
+
+def _is_numeric(states):
+    """Return True if states is an array of booleans or numbers."""
+    return states.dtype.kind in 'biufc'
+
+
+def _greedy_next_features(phi_next, policy):
+    r"""Return :math:`\phi(s', \pi(s'))` rows for the greedy policy.
+
+    Parameters
+    ----------
+    phi_next: numpy.array
+        (N, num_actions, k) tensor of next state features for all actions.
+    policy: Policy
+        Policy whose weights and tie breaking strategy select the actions.
+
+    Returns
+    -------
+    numpy.array
+        (N, k) matrix with the features of the greedy action of each sample.
+
+    """
+    actions = policy.argmax_actions(phi_next.dot(policy.weights))
+    return phi_next[np.arange(phi_next.shape[0]), actions]
+
+
+def _sparse_greedy_next_features(phi_next, absorb, policy):
+    r"""Return the sparse :math:`\phi(s', \pi(s'))` matrix.
+
+    Parameters
+    ----------
+    phi_next: list(scipy.sparse.csr_matrix)
+        One sparse (N, k) next state feature matrix per action.
+    absorb: numpy.array
+        Boolean absorb flag of each sample. These rows are left empty.
+    policy: Policy
+        Policy whose weights and tie breaking strategy select the actions.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        (N, k) matrix with the features of the greedy action of each sample.
+
+    """
+    q_values = np.column_stack([phi_a.dot(policy.weights)
+                                for phi_a in phi_next])
+    next_actions = policy.argmax_actions(q_values)
+
+    phi_sprime = scipy.sparse.csr_matrix((absorb.shape[0],
+                                          policy.basis.size()))
+    for action, phi_a in enumerate(phi_next):
+        rows = (next_actions == action) & ~absorb
+        phi_sprime = phi_sprime + \
+            scipy.sparse.diags(rows.astype(np.float64)).dot(phi_a)
+    return scipy.sparse.csr_matrix(phi_sprime)
+
+
+def _parallel_lstdq_worker(connection, chunk_size):
+    """Serve partial LSTDQ systems for ParallelLSTDQSolver.
+
+    Understands three messages: ('load', shard, basis) replaces the shard,
+    ('accumulate', weights, discount, tie_breaking_strategy) replies with
+    ('ok', (A, b)) or ('error', exception) and ('close', ) exits.
+
+    """
+    solver = VectorizedLSTDQSolver(precondition_value=0,
+                                   chunk_size=chunk_size)
+    shard = None
+    basis = None
+
+    while True:
+        message = connection.recv()
+        if message[0] == 'load':
+            shard, basis = message[1:]
+            solver.clear_cache()
+        elif message[0] == 'accumulate':
+            weights, discount, tie_breaking_strategy = message[1:]
+            try:
+                policy = Policy(basis, discount, 0., weights,
+                                tie_breaking_strategy)
+                connection.send(('ok', solver._build_system(shard, policy)))
+            except Exception as error:
+                connection.send(('error', error))
+        else:
+            break
+
+    connection.close()
+
+
+def _sample_weights(data):
+    """Return the counts of a WeightedSampleBatch or None for other data."""
+    return getattr(data, 'counts', None)
+
+
+def _weighted_rows(features, counts):
+    """Return the feature rows scaled by their counts.
+
+    Parameters
+    ----------
+    features: numpy.array or scipy.sparse.spmatrix
+        (N, k) feature matrix.
+    counts: numpy.array or None
+        Count of every row. If None the features are returned unchanged.
+
+    """
+    if counts is None:
+        return features
+    if scipy.sparse.issparse(features):
+        return scipy.sparse.csr_matrix(
+            scipy.sparse.diags(counts).dot(features))
+    return features*counts.reshape((-1, 1))
+
+
+def _sherman_morrison_update(a_inv, u, v, tolerance):
+    r"""Update a_inv, the inverse of A, in place to the inverse of A + uv^T.
+
+    The update is skipped if :math:`|1 + v^T A^{-1} u|` is at most
+    tolerance times the scale of the update, in which case A + uv^T is
+    (nearly) singular.
+
+    Returns
+    -------
+    bool
+        True if a_inv was updated, False if the update was skipped.
+
+    """
+    a_inv_u = a_inv.dot(u)
+    v_a_inv = v.dot(a_inv)
+    denominator = 1. + v_a_inv.dot(u)
+    scale = max(1., np.linalg.norm(v_a_inv)*np.linalg.norm(u))
+    if not abs(denominator) > tolerance*scale:
+        return False
+    a_inv -= np.outer(a_inv_u, v_a_inv) / denominator
+    return True
+
+
+def _sample_chunk(data, start, stop):
+    """Return samples [start, stop) of data as a SampleBatch."""
+    if isinstance(data, SampleBatch):
+        return data[start:stop]
+    return SampleBatch.from_samples(data[start:stop])
+
+
+def _transitions(data):
+    """Yield ``(s, a, r, s', absorb)`` tuples from samples or a SampleBatch.
+
+    The columns of a batch are read once, since the states of a
+    TrajectoryBatch are gathered from its state table on every access.
+
+    """
+    if isinstance(data, SampleBatch):
+        states = data.states
+        next_states = data.next_states
+        return ((states[i], data.actions[i], data.rewards[i],
+                 next_states[i], data.absorb[i])
+                for i in range(len(data)))
+    return ((sample.state, sample.action, sample.reward,
+             sample.next_state, sample.absorb) for sample in data)
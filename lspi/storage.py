@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""Contains persistent and bounded containers of sample data."""
+
+import json
+import os
+
+import numpy as np
+
+from sample import SampleBatch, SampleChunks
+
+
+class SampleStore(object):
+
+    """On-disk columnar sample store opened with memory mapping.
+
+    A store is a directory with one raw binary file per SampleBatch column
+    and a small JSON manifest recording the number of samples, the state
+    shape and the dtype of every column. Opening a store only reads the
+    manifest. The columns are mapped into memory with numpy.memmap, so
+    batch returns zero-copy views and paging is left to the operating
+    system. This makes opening even very large stores instant.
+
+    Samples are added with append, which writes the new rows after the
+    last sample of every column file before updating the manifest. If a
+    process dies in between, the extra bytes are not part of the store and
+    the next append overwrites them.
+
+    Parameters
+    ----------
+    path: str
+        Directory of an existing store. Use SampleStore.create to make a new
+        store.
+
+    Raises
+    ------
+    IOError
+        If path does not contain a store manifest.
+
+    """
+
+    manifest_name = 'manifest.json'
+    format_version = 1
+    columns = ('states', 'actions', 'rewards', 'next_states', 'absorb')
+
+    def __init__(self, path):
+        """Open an existing SampleStore."""
+        self.path = path
+        with open(os.path.join(path, SampleStore.manifest_name)) as manifest:
+            manifest = json.load(manifest)
+
+        if manifest['format_version'] != SampleStore.format_version:
+            raise IOError('Unsupported sample store version: %s' %
+                          manifest['format_version'])
+
+        self.state_shape = tuple(manifest['state_shape'])
+        self.dtypes = dict((column, np.dtype(str(dtype)))
+                           for column, dtype in manifest['dtypes'].items())
+        self._num_samples = manifest['num_samples']
+        self._batch = None
+
+    @classmethod
+    def create(cls, path, state_shape, state_dtype=np.float64):
+        """Create a new empty store.
+
+        Parameters
+        ----------
+        path: str
+            Directory to create the store in. It is created if it does not
+            exist.
+        state_shape: tuple(int)
+            Shape of a single state.
+        state_dtype: numpy.dtype
+            Dtype the states are stored as. Defaults to numpy.float64.
+
+        Returns
+        -------
+        SampleStore
+            The opened store.
+
+        Raises
+        ------
+        IOError
+            If path already contains a store.
+
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        if os.path.exists(os.path.join(path, SampleStore.manifest_name)):
+            raise IOError('A sample store already exists at %s' % path)
+
+        state_dtype = np.dtype(state_dtype)
+        dtypes = {'states': state_dtype,
+                  'actions': np.dtype(np.int_),
+                  'rewards': np.dtype(np.float64),
+                  'next_states': state_dtype,
+                  'absorb': np.dtype(np.bool_)}
+        for column in SampleStore.columns:
+            open(os.path.join(path, column + '.bin'), 'wb').close()
+
+        _write_manifest(path, 0, tuple(state_shape), dtypes)
+        return cls(path)
+
+    def __len__(self):
+        """Return number of samples in the store."""
+        return self._num_samples
+
+    def __repr__(self):
+        """Create string representation of the store."""
+        return 'SampleStore(%r, %d samples, state shape %s)' % \
+            (self.path, len(self), self.state_shape)
+
+    def append(self, samples):
+        """Append samples to the end of the store.
+
+        Parameters
+        ----------
+        samples: list(Sample) or SampleBatch
+            The samples to add. The states are converted to the state dtype
+            of the store.
+
+        Raises
+        ------
+        ValueError
+            If the state shape of the samples does not match the store.
+
+        """
+        if not isinstance(samples, SampleBatch):
+            samples = SampleBatch.from_samples(samples)
+        if len(samples) == 0:
+            return
+        if samples.states.shape[1:] != self.state_shape:
+            raise ValueError('State shape %s does not match the store: %s' %
+                             (samples.states.shape[1:], self.state_shape))
+
+        for column in SampleStore.columns:
+            values = np.ascontiguousarray(getattr(samples, column),
+                                          dtype=self.dtypes[column])
+            end = self._num_samples * self._row_nbytes(column)
+            with open(self._column_path(column), 'r+b') as column_file:
+                # drop rows left behind by an interrupted append
+                column_file.truncate(end)
+                column_file.seek(end)
+                column_file.write(values.tobytes())
+
+        self._num_samples += len(samples)
+        self._batch = None
+        _write_manifest(self.path, self._num_samples, self.state_shape,
+                        self.dtypes)
+
+    def batch(self):
+        """Return all of the samples as a SampleBatch of memory mapped views.
+
+        The same object is returned until the next append, so the feature
+        caches of the solvers stay valid between LSPI iterations. The views
+        are read-only.
+
+        Returns
+        -------
+        SampleBatch
+            Batch backed by the column files.
+
+        """
+        if self._batch is None:
+            self._batch = SampleBatch(*[self._map(column)
+                                        for column in SampleStore.columns])
+        return self._batch
+
+    def chunks(self, chunk_size):
+        """Return the samples as a SampleChunks source of memory mapped views.
+
+        Parameters
+        ----------
+        chunk_size: int
+            Number of samples per chunk.
+
+        Returns
+        -------
+        SampleChunks
+            Source for :py:class:`lspi.solvers.StreamingLSTDQSolver`.
+
+        """
+        return SampleChunks.from_batch(self.batch(), chunk_size)
+
+    def _map(self, column):
+        """Return a read-only memory map of the first len(self) rows."""
+        shape = (self._num_samples, )
+        if column in ('states', 'next_states'):
+            shape += self.state_shape
+
+        if self._num_samples == 0:
+            # empty files can not be memory mapped
+            return np.zeros(shape, dtype=self.dtypes[column])
+        return np.memmap(self._column_path(column), dtype=self.dtypes[column],
+                         mode='r', shape=shape)
+
+    def _row_nbytes(self, column):
+        """Return the number of bytes of one row of the column."""
+        row_nbytes = self.dtypes[column].itemsize
+        if column in ('states', 'next_states'):
+            row_nbytes *= int(np.prod(self.state_shape))
+        return row_nbytes
+
+    def _column_path(self, column):
+        """Return the path of the column file."""
+        return os.path.join(self.path, column + '.bin')
+
+
+class ReplayMemory(object):
+
+    """Fixed capacity ring buffer of samples.
+
+    All columns are allocated once when the memory is created. Adding a
+    sample writes it into the next slot in :math:`O(1)` and once the memory
+    is full it overwrites the oldest sample, so memory use stays flat no
+    matter how long the agent runs.
+
+    batch returns the stored samples as a SampleBatch of views into the
+    buffer in slot order, which can be passed to the solvers and to
+    lspi.learn without copying. A new batch object is created after every
+    change so the solvers' feature caches notice it. Because the views share
+    the buffer, a batch should not be used after further samples are added.
+
+    Every slot also holds a priority used by sample_indices for prioritized
+    subsampling. New samples get the largest priority currently stored so
+    they are likely to be drawn at least once. The largest priority is kept
+    up to date as priorities change, and the buffer is only searched for it
+    again when the slot holding it gets a lower priority.
+
+    Parameters
+    ----------
+    capacity: int
+        Maximum number of samples.
+    state_shape: tuple(int)
+        Shape of a single state.
+    state_dtype: numpy.dtype
+        Dtype the states are stored as. Defaults to numpy.float64.
+
+    Raises
+    ------
+    ValueError
+        If capacity < 1
+
+    """
+
+    def __init__(self, capacity, state_shape, state_dtype=np.float64):
+        """Initialize ReplayMemory."""
+        if capacity < 1:
+            raise ValueError('capacity must be >= 1')
+
+        self.capacity = int(capacity)
+        self.state_shape = tuple(state_shape)
+        self.states = np.zeros((self.capacity, ) + self.state_shape,
+                               dtype=state_dtype)
+        self.actions = np.zeros((self.capacity, ), dtype=np.int_)
+        self.rewards = np.zeros((self.capacity, ))
+        self.next_states = np.zeros(self.states.shape, dtype=state_dtype)
+        self.absorb = np.zeros((self.capacity, ), dtype=np.bool_)
+        self.priorities = np.zeros((self.capacity, ))
+
+        self._size = 0
+        self._next = 0
+        self._batch = None
+        self._max_priority = 0.
+        self._max_slot = 0
+
+    def __len__(self):
+        """Return number of samples currently stored."""
+        return self._size
+
+    def __repr__(self):
+        """Create string representation of the memory."""
+        return 'ReplayMemory(%d/%d samples, state shape %s)' % \
+            (len(self), self.capacity, self.state_shape)
+
+    def add(self, sample):
+        """Store a sample, evicting the oldest sample if the memory is full.
+
+        Parameters
+        ----------
+        sample: Sample
+            The sample to add.
+
+        """
+        slot = self._next
+        priority = self._new_priority()
+        self.states[slot] = sample.state
+        self.actions[slot] = sample.action
+        self.rewards[slot] = sample.reward
+        self.next_states[slot] = sample.next_state
+        self.absorb[slot] = sample.absorb
+        self.priorities[slot] = priority
+        # the new priority is at least the previous maximum
+        self._max_priority = priority
+        self._max_slot = slot
+
+        self._next = (slot + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self._batch = None
+
+    def extend(self, samples):
+        """Store several samples in order, evicting the oldest samples.
+
+        Parameters
+        ----------
+        samples: list(Sample) or SampleBatch
+            The samples to add. If there are more than capacity samples only
+            the last capacity samples are kept.
+
+        """
+        if not isinstance(samples, SampleBatch):
+            samples = SampleBatch.from_samples(samples)
+        if len(samples) == 0:
+            return
+        if len(samples) > self.capacity:
+            # the skipped samples would have been overwritten anyway
+            skipped = len(samples) - self.capacity
+            self._next = (self._next + skipped) % self.capacity
+            samples = samples[skipped:]
+
+        num_samples = len(samples)
+        slots = (self._next + np.arange(num_samples)) % self.capacity
+        priority = self._new_priority()
+
+        self.states[slots] = samples.states
+        self.actions[slots] = samples.actions
+        self.rewards[slots] = samples.rewards
+        self.next_states[slots] = samples.next_states
+        self.absorb[slots] = samples.absorb
+        self.priorities[slots] = priority
+        self._max_priority = priority
+        self._max_slot = slots[-1]
+
+        self._next = (self._next + num_samples) % self.capacity
+        self._size = min(self._size + num_samples, self.capacity)
+        self._batch = None
+
+    def batch(self):
+        """Return the stored samples as a SampleBatch of buffer views.
+
+        Row i of the batch is slot i of the memory. The order of the rows
+        is not the insertion order once the memory has wrapped around.
+
+        Returns
+        -------
+        SampleBatch
+            Batch backed by the buffer.
+
+        """
+        if self._batch is None:
+            size = self._size
+            self._batch = SampleBatch(self.states[:size],
+                                      self.actions[:size],
+                                      self.rewards[:size],
+                                      self.next_states[:size],
+                                      self.absorb[:size])
+        return self._batch
+
+    def sample_indices(self, num_samples, prioritized=False, alpha=1.,
+                       random_state=None):
+        """Draw slots with replacement.
+
+        Parameters
+        ----------
+        num_samples: int
+            Number of slots to draw.
+        prioritized: bool
+            If True slot i is drawn with probability proportional to
+            priorities[i] ** alpha, otherwise uniformly. Defaults to False.
+        alpha: float
+            Exponent applied to the priorities. Defaults to 1.
+        random_state: numpy.random.RandomState or None
+            Source of randomness. Defaults to None which uses numpy.random.
+
+        Returns
+        -------
+        numpy.array
+            Integer array of slot indices, which are also row indices into
+            batch().
+
+        Raises
+        ------
+        ValueError
+            If the memory is empty.
+
+        """
+        if self._size == 0:
+            raise ValueError('Cannot sample from an empty memory')
+        if random_state is None:
+            random_state = np.random
+
+        probabilities = None
+        if prioritized:
+            probabilities = self.priorities[:self._size] ** alpha
+            total = probabilities.sum()
+            if total > 0:
+                probabilities = probabilities / total
+            else:
+                probabilities = None
+
+        return random_state.choice(self._size, num_samples, p=probabilities)
+
+    def sample(self, num_samples, prioritized=False, alpha=1.,
+               random_state=None):
+        """Return a random subset of the stored samples.
+
+        See sample_indices for the parameters.
+
+        Returns
+        -------
+        SampleBatch
+            Copy of the drawn samples.
+
+        """
+        return self.batch()[self.sample_indices(num_samples, prioritized,
+                                                alpha, random_state)]
+
+    def set_priorities(self, indices, priorities):
+        """Set the priorities of the given slots.
+
+        Parameters
+        ----------
+        indices: numpy.array
+            Slot indices, for example from sample_indices.
+        priorities: numpy.array
+            The new non-negative priorities.
+
+        Raises
+        ------
+        ValueError
+            If a priority is negative.
+        IndexError
+            If a slot does not hold a sample.
+
+        """
+        priorities = np.asarray(priorities, dtype=np.float64)
+        if np.any(priorities < 0):
+            raise ValueError('priorities must be >= 0')
+        slots = np.arange(self._size)[indices]
+        self.priorities[slots] = priorities
+
+        if self.priorities[self._max_slot] < self._max_priority:
+            # the maximum was lowered, so it may now be anywhere
+            self._max_slot = int(np.argmax(self.priorities[:self._size]))
+            self._max_priority = self.priorities[self._max_slot]
+        else:
+            slots = np.reshape(slots, (-1, ))
+            if slots.shape[0] > 0:
+                slot = slots[np.argmax(self.priorities[slots])]
+                if self.priorities[slot] > self._max_priority:
+                    self._max_slot = slot
+                    self._max_priority = self.priorities[slot]
+
+    def _new_priority(self):
+        """Return the priority of a new sample."""
+        if self._size == 0:
+            return 1.
+        return max(self._max_priority, 1e-6)
+
+
+def _write_manifest(path, num_samples, state_shape, dtypes):
+    """Atomically replace the manifest of the store at path."""
+    manifest = {'format_version': SampleStore.format_version,
+                'num_samples': num_samples,
+                'state_shape': list(state_shape),
+                'dtypes': dict((column, dtype.str)
+                               for column, dtype in dtypes.items())}
+
+    manifest_path = os.path.join(path, SampleStore.manifest_name)
+    with open(manifest_path + '.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.rename(manifest_path + '.tmp', manifest_path)
@@ -5,7 +5,12 @@ from unittest import TestCase
 from lspi.basis_functions import (BasisFunction,
     FakeBasis,
     OneDimensionalPolynomialBasis,
+    PolynomialBasis,
+    FourierBasis,
     RadialBasisFunction,
+    TruncatedRadialBasisFunction,
+    RandomFourierBasis,
+    TileCodingBasis,
     ExactBasis)
 import numpy as np
 
@@ -67,6 +72,24 @@ class TestBasisFunction(TestCase):
 
         ShouldWorkBasis()
 
+    def test_evaluate_batch_default_implementation(self):
+        """Test that evaluate_batch falls back to calling evaluate."""
+
+        class LoopBasis(BasisFunction):
+
+            def size(self):
+                return 2
+
+            def evaluate(self, state, action):
+                return np.array([state[0], action])
+
+            @property
+            def num_actions(self):
+                return 2
+
+        phi = LoopBasis().evaluate_batch(np.array([[3.], [4.]]), [0, 1])
+        np.testing.assert_array_almost_equal(phi, [[3., 0.], [4., 1.]])
+
     def test_validate_num_actions(self):
         self.assertEqual(BasisFunction._validate_num_actions(6), 6)
 
@@ -91,6 +114,10 @@ class TestFakeBasis(TestCase):
         with self.assertRaises(ValueError):
             self.basis.num_actions = 0
 
+    def test_evaluate_sparse_state_batch_not_state_factored(self):
+        with self.assertRaises(NotImplementedError):
+            self.basis.evaluate_sparse_state_batch(np.zeros((1, 2)))
+
     def test_size(self):
         self.assertEqual(self.basis.size(), 1)
 
@@ -106,6 +133,34 @@ class TestFakeBasis(TestCase):
         with self.assertRaises(IndexError):
             self.basis.evaluate(None, 6)
 
+    def test_evaluate_batch(self):
+        phi = self.basis.evaluate_batch(np.zeros((3, 2)), [0, 5, 2])
+        np.testing.assert_array_almost_equal(phi, np.ones((3, 1)))
+
+    def test_not_sparse(self):
+        self.assertFalse(self.basis.is_sparse)
+
+    def test_default_evaluate_sparse(self):
+        indices, values = self.basis.evaluate_sparse(None, 2)
+
+        np.testing.assert_array_equal(indices, [0])
+        np.testing.assert_array_almost_equal(values, [1.])
+
+    def test_default_evaluate_sparse_batch(self):
+        phi = self.basis.evaluate_sparse_batch(np.zeros((3, 2)), [0, 1, 2])
+
+        np.testing.assert_array_almost_equal(phi.toarray(), np.ones((3, 1)))
+
+    def test_not_state_factored(self):
+        self.assertIsNone(self.basis.state_features_size())
+
+        with self.assertRaises(NotImplementedError):
+            self.basis.evaluate_state(np.zeros((2, )))
+
+    def test_evaluate_batch_out_of_bounds_action_index(self):
+        with self.assertRaises(IndexError):
+            self.basis.evaluate_batch(np.zeros((2, 2)), [0, 6])
+
 class TestOneDimensionalPolynomialBasis(TestCase):
     def setUp(self):
 
@@ -165,6 +220,153 @@ class TestOneDimensionalPolynomialBasis(TestCase):
         with self.assertRaises(ValueError):
             self.basis.evaluate(np.array([2, 3]), 0)
 
+    def test_evaluate_batch(self):
+        states = np.array([[2], [-1.5], [0]])
+        actions = np.array([1, 0, 1])
+
+        phi = self.basis.evaluate_batch(states, actions)
+
+        self.assertEqual(phi.shape, (3, 6))
+        for row, state, action in zip(phi, states, actions):
+            np.testing.assert_array_almost_equal(
+                row, self.basis.evaluate(state, action))
+
+    def test_evaluate_batch_out_of_bounds_action(self):
+        with self.assertRaises(IndexError):
+            self.basis.evaluate_batch(np.array([[2], [2]]), [0, 2])
+
+    def test_evaluate_batch_incorrect_state_dimensions(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_batch(np.array([[2, 3]]), [0])
+
+    def test_state_features(self):
+        self.assertEqual(self.basis.state_features_size(), 3)
+
+        psi = self.basis.evaluate_state(np.array([2]))
+        np.testing.assert_array_almost_equal(psi, np.array([1., 2., 4.]))
+        np.testing.assert_array_almost_equal(
+            self.basis.evaluate(np.array([2]), 1)[3:], psi)
+
+    def test_evaluate_state_batch(self):
+        states = np.array([[2], [-1.5]])
+
+        psi = self.basis.evaluate_state_batch(states)
+
+        np.testing.assert_array_almost_equal(psi, [[1., 2., 4.],
+                                                   [1., -1.5, 2.25]])
+
+class TestPolynomialBasis(TestCase):
+    def setUp(self):
+        self.basis = PolynomialBasis(2, 2, 2)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            PolynomialBasis(0, 2, 2)
+        with self.assertRaises(ValueError):
+            PolynomialBasis(2, -1, 2)
+        with self.assertRaises(ValueError):
+            PolynomialBasis(2, 2, 0)
+
+    def test_exponents(self):
+        np.testing.assert_array_equal(
+            self.basis.exponents,
+            [[0, 0], [1, 0], [0, 1], [2, 0], [1, 1], [0, 2]])
+        self.assertEqual(PolynomialBasis(3, 3, 1).state_features_size(), 20)
+
+    def test_size(self):
+        self.assertEqual(self.basis.size(), 12)
+
+    def test_evaluate(self):
+        phi = self.basis.evaluate(np.array([2., -3.]), 1)
+
+        np.testing.assert_array_almost_equal(
+            phi, [0, 0, 0, 0, 0, 0, 1, 2, -3, 4, -6, 9])
+
+    def test_evaluate_out_of_bounds_action(self):
+        with self.assertRaises(IndexError):
+            self.basis.evaluate(np.zeros(2), 2)
+
+    def test_evaluate_batch(self):
+        states = np.random.RandomState(0).uniform(-2, 2, size=(5, 2))
+        actions = np.array([0, 1, 1, 0, 1])
+
+        phi = self.basis.evaluate_batch(states, actions)
+
+        for i in range(5):
+            np.testing.assert_array_almost_equal(
+                phi[i], self.basis.evaluate(states[i], actions[i]))
+
+    def test_matches_one_dimensional_basis(self):
+        states = np.array([[2.], [-1.5], [0.]])
+
+        np.testing.assert_array_almost_equal(
+            PolynomialBasis(1, 3, 1).evaluate_state_batch(states),
+            OneDimensionalPolynomialBasis(3, 1).evaluate_state_batch(states))
+
+    def test_incorrect_state_dimensions(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_state(np.zeros(3))
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_state_batch(np.zeros((1, 3)))
+
+class TestFourierBasis(TestCase):
+    def setUp(self):
+        self.basis = FourierBasis([0, -1], [1, 1], 2, 2)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            FourierBasis([0, 0], [1], 2, 2)
+        with self.assertRaises(ValueError):
+            FourierBasis([0, 1], [1, 1], 2, 2)
+        with self.assertRaises(ValueError):
+            FourierBasis([0, 0], [1, 1], -1, 2)
+        with self.assertRaises(ValueError):
+            FourierBasis([0, 0], [1, 1], 2, 0)
+
+    def test_size(self):
+        self.assertEqual(self.basis.state_features_size(), 9)
+        self.assertEqual(self.basis.size(), 18)
+
+    def test_evaluate_state(self):
+        state = np.array([.25, .5])
+
+        psi = self.basis.evaluate_state(state)
+
+        scaled = np.array([.25, .75])
+        np.testing.assert_array_almost_equal(
+            psi, np.cos(np.pi*self.basis.coefficients.dot(scaled)))
+        self.assertAlmostEqual(psi[0], 1.)
+
+    def test_evaluate(self):
+        state = np.array([.25, .5])
+
+        phi = self.basis.evaluate(state, 1)
+
+        np.testing.assert_array_equal(phi[:9], np.zeros(9))
+        np.testing.assert_array_almost_equal(phi[9:],
+                                             self.basis.evaluate_state(state))
+
+    def test_evaluate_out_of_bounds_action(self):
+        with self.assertRaises(IndexError):
+            self.basis.evaluate(np.zeros(2), 2)
+
+    def test_evaluate_batch(self):
+        states = np.random.RandomState(0).uniform([0, -1], [1, 1],
+                                                  size=(5, 2))
+        actions = np.array([0, 1, 1, 0, 1])
+
+        phi = self.basis.evaluate_batch(states, actions)
+
+        for i in range(5):
+            np.testing.assert_array_almost_equal(
+                phi[i], self.basis.evaluate(states[i], actions[i]))
+
+    def test_incorrect_state_dimensions(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_state(np.zeros(3))
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_state_batch(np.zeros((1, 3)))
+
 class TestRadialBasisFunction(TestCase):
     def setUp(self):
 
@@ -253,6 +455,380 @@ class TestRadialBasisFunction(TestCase):
         with self.assertRaises(ValueError):
             self.basis.evaluate(np.zeros((2, )), 0)
 
+    def test_evaluate_action_offset_uses_number_of_means(self):
+        basis = RadialBasisFunction([np.array([0.]), np.array([1.])],
+                                    self.gamma, self.num_actions)
+
+        phi = basis.evaluate(np.array([0.]), 1)
+
+        np.testing.assert_array_almost_equal(phi,
+                                             np.array([0., 0., 0.,
+                                                       1., 1., 0.3679]),
+                                             4)
+
+    def test_evaluate_batch(self):
+        states = np.array([[0., 0., 0.], [1., .5, -2.], [-1., -1., -1.]])
+        actions = np.array([0, 1, 1])
+
+        phi = self.basis.evaluate_batch(states, actions)
+
+        self.assertEqual(phi.shape, (3, 8))
+        for row, state, action in zip(phi, states, actions):
+            np.testing.assert_array_almost_equal(
+                row, self.basis.evaluate(state, action))
+
+    def test_evaluate_batch_out_of_bounds_action(self):
+        with self.assertRaises(IndexError):
+            self.basis.evaluate_batch(np.zeros((1, 3)), [2])
+
+    def test_evaluate_batch_incorrect_state_dimensions(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_batch(np.zeros((1, 2)), [0])
+
+    def test_state_features(self):
+        self.assertEqual(self.basis.state_features_size(), 4)
+
+        psi = self.basis.evaluate_state(self.state)
+        np.testing.assert_array_almost_equal(psi,
+                                             self.basis.evaluate(self.state,
+                                                                 1)[4:])
+
+    def test_evaluate_state_batch(self):
+        states = np.array([[0., 0., 0.], [1., .5, -2.]])
+
+        psi = self.basis.evaluate_state_batch(states)
+
+        self.assertEqual(psi.shape, (2, 4))
+        for row, state in zip(psi, states):
+            np.testing.assert_array_almost_equal(
+                row, self.basis.evaluate_state(state))
+
+    def test_evaluate_state_batch_matches_direct_distances(self):
+        random_state = np.random.RandomState(0)
+        means = list(random_state.uniform(-5, 5, size=(20, 3)))
+        states = random_state.uniform(-5, 5, size=(10, 3))
+        basis = RadialBasisFunction(means, .3, 1)
+
+        psi = basis.evaluate_state_batch(np.vstack([states, means[:2]]))
+
+        diff = states[:, np.newaxis, :] - np.array(means)[np.newaxis]
+        np.testing.assert_array_almost_equal(
+            psi[:10, 1:], np.exp(-.3*np.sum(diff*diff, axis=2)))
+        # a state on a mean has a distance of exactly 0 to it
+        np.testing.assert_array_almost_equal(np.diag(psi[10:, 1:3]), [1, 1])
+
+    def test_distances_far_from_origin(self):
+        """Test that the expanded distances keep their precision."""
+        random_state = np.random.RandomState(1)
+        offset = 1e8
+        means = list(offset + random_state.uniform(-1, 1, size=(5, 2)))
+        states = offset + random_state.uniform(-1, 1, size=(4, 2))
+        basis = RadialBasisFunction(means, 2., 1)
+
+        psi = basis.evaluate_state_batch(states)
+
+        diff = states[:, np.newaxis, :] - np.array(means)[np.newaxis]
+        expected = np.exp(-2.*np.sum(diff*diff, axis=2))
+        np.testing.assert_allclose(psi[:, 1:], expected, rtol=1e-6)
+        for row, state in zip(psi, states):
+            np.testing.assert_allclose(basis.evaluate_state(state), row)
+
+    def test_means_are_read_only(self):
+        with self.assertRaises(ValueError):
+            self.basis.means[0, 0] = 5.
+
+    def test_evaluate_out(self):
+        out = np.ones((8, ))
+
+        phi = self.basis.evaluate(self.state, 1, out=out)
+
+        self.assertIs(phi, out)
+        np.testing.assert_array_almost_equal(out,
+                                             [0., 0., 0., 0.,
+                                              1., .0498, 1., .0498], 4)
+
+        with self.assertRaises(ValueError):
+            self.basis.evaluate(self.state, 0, out=np.zeros((7, )))
+
+    def test_evaluate_batch_out(self):
+        states = np.array([[0., 0., 0.], [1., .5, -2.]])
+        out = np.ones((2, 8))
+
+        phi = self.basis.evaluate_batch(states, [1, 0], out=out)
+
+        self.assertIs(phi, out)
+        np.testing.assert_array_almost_equal(
+            out, self.basis.evaluate_batch(states, [1, 0]))
+
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_batch(states, [1, 0], out=np.zeros((8, 2)).T)
+
+    def test_evaluate_state_batch_out(self):
+        states = np.array([[0., 0., 0.], [1., .5, -2.]])
+        out = np.zeros((2, 4))
+
+        psi = self.basis.evaluate_state_batch(states, out=out)
+
+        self.assertIs(psi, out)
+        np.testing.assert_array_almost_equal(
+            out, self.basis.evaluate_state_batch(states))
+
+class TestTruncatedRadialBasisFunction(TestCase):
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.means = list(random_state.uniform(-10, 10, size=(200, 2)))
+        self.states = random_state.uniform(-10, 10, size=(20, 2))
+        self.basis = TruncatedRadialBasisFunction(self.means, 2., 2,
+                                                  tolerance=1e-4)
+        self.dense_basis = RadialBasisFunction(self.means, 2., 2)
+
+    def test_invalid_tolerance(self):
+        for tolerance in (0, 1, -1e-3):
+            with self.assertRaises(ValueError):
+                TruncatedRadialBasisFunction(self.means, 2., 2, tolerance)
+
+    def test_is_sparse(self):
+        self.assertTrue(self.basis.is_sparse)
+
+    def test_matches_rbf_above_tolerance(self):
+        actions = np.arange(20) % 2
+
+        phi = self.basis.evaluate_batch(self.states, actions)
+
+        expected_phi = self.dense_basis.evaluate_batch(self.states, actions)
+        expected_phi[expected_phi < 1e-4] = 0
+        np.testing.assert_array_almost_equal(phi, expected_phi)
+
+    def test_evaluate_sparse_batch(self):
+        actions = np.arange(20) % 2
+
+        phi = self.basis.evaluate_sparse_batch(self.states, actions)
+
+        self.assertTrue(phi.nnz < 20*len(self.means) / 10)
+        np.testing.assert_array_almost_equal(
+            phi.toarray(), self.basis.evaluate_batch(self.states, actions))
+
+    def test_evaluate_sparse_state_batch(self):
+        psi = self.basis.evaluate_sparse_state_batch(self.states)
+
+        self.assertEqual(psi.shape, (20, len(self.means) + 1))
+        np.testing.assert_array_almost_equal(
+            psi.toarray(), self.basis.evaluate_state_batch(self.states))
+
+    def test_evaluate_sparse(self):
+        indices, values = self.basis.evaluate_sparse(self.states[0], 1)
+
+        phi = np.zeros((self.basis.size(), ))
+        phi[indices] = values
+        np.testing.assert_array_almost_equal(
+            phi, self.basis.evaluate(self.states[0], 1))
+
+    def test_evaluate_sparse_out_of_bounds_action(self):
+        with self.assertRaises(IndexError):
+            self.basis.evaluate_sparse(self.states[0], 2)
+
+    def test_incorrect_state_dimensions(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_sparse_batch(np.zeros((1, 3)), [0])
+
+class TestRandomFourierBasis(TestCase):
+    def setUp(self):
+        self.basis = RandomFourierBasis(2, 2000, .5, 2, random_state=0)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            RandomFourierBasis(2, 0, .5, 2)
+        with self.assertRaises(ValueError):
+            RandomFourierBasis(2, 10, 0, 2)
+        with self.assertRaises(ValueError):
+            RandomFourierBasis(2, 10, .5, 0)
+
+    def test_size(self):
+        self.assertEqual(self.basis.size(), 4002)
+        self.assertEqual(self.basis.state_features_size(), 2001)
+
+    def test_seeded(self):
+        basis = RandomFourierBasis(2, 2000, .5, 2, random_state=0)
+        state = np.array([.3, -1.2])
+
+        np.testing.assert_array_equal(basis.evaluate_state(state),
+                                      self.basis.evaluate_state(state))
+
+    def test_approximates_rbf_kernel(self):
+        states = np.random.RandomState(1).uniform(-2, 2, size=(10, 2))
+
+        psi = self.basis.evaluate_state_batch(states)
+
+        diff = states[:, np.newaxis] - states[np.newaxis]
+        kernel = np.exp(-.5*(diff**2).sum(axis=2))
+        np.testing.assert_allclose(psi.dot(psi.T) - 1, kernel, atol=.1)
+
+    def test_evaluate(self):
+        state = np.array([.3, -1.2])
+
+        phi = self.basis.evaluate(state, 1)
+
+        self.assertEqual(phi.shape, (4002, ))
+        np.testing.assert_array_equal(phi[:2001], np.zeros(2001))
+        self.assertEqual(phi[2001], 1.)
+        np.testing.assert_array_almost_equal(
+            phi[2001:], self.basis.evaluate_state(state))
+
+    def test_evaluate_batch(self):
+        states = np.random.RandomState(1).uniform(-2, 2, size=(5, 2))
+        actions = np.array([0, 1, 1, 0, 1])
+
+        phi = self.basis.evaluate_batch(states, actions)
+
+        for i in range(5):
+            np.testing.assert_array_almost_equal(
+                phi[i], self.basis.evaluate(states[i], actions[i]))
+
+    def test_evaluate_out(self):
+        state = np.array([.3, -1.2])
+        out = np.ones((4002, ))
+
+        phi = self.basis.evaluate(state, 0, out=out)
+
+        self.assertIs(phi, out)
+        np.testing.assert_array_almost_equal(
+            out, self.basis.evaluate(state, 0))
+
+    def test_evaluate_out_of_bounds_action(self):
+        with self.assertRaises(IndexError):
+            self.basis.evaluate(np.zeros(2), 2)
+
+    def test_incorrect_state_dimensions(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_state(np.zeros(3))
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_state_batch(np.zeros((1, 3)))
+
+class TestTileCodingBasis(TestCase):
+    def setUp(self):
+        self.basis = TileCodingBasis([0, 0], [1, 2], 4, 3, 2)
+        self.states = np.random.RandomState(0).uniform([0, 0], [1, 2],
+                                                       size=(10, 2))
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            TileCodingBasis([0, 0], [1], 4, 3, 2)
+        with self.assertRaises(ValueError):
+            TileCodingBasis([0, 1], [1, 1], 4, 3, 2)
+        with self.assertRaises(ValueError):
+            TileCodingBasis([0, 0], [1, 2], 0, 3, 2)
+        with self.assertRaises(ValueError):
+            TileCodingBasis([0, 0], [1, 2], 4, 0, 2)
+        with self.assertRaises(ValueError):
+            TileCodingBasis([0, 0], [1, 2], 4, 3, 0)
+        with self.assertRaises(ValueError):
+            TileCodingBasis([0, 0], [1, 2], 4, 3, 2, offsets=np.zeros((2, 2)))
+        with self.assertRaises(ValueError):
+            TileCodingBasis([0, 0], [1, 2], 4, 3, 2, offsets=np.ones((3, 2)))
+        with self.assertRaises(ValueError):
+            TileCodingBasis([0, 0], [1, 2], 4, 3, 2, table_size=0)
+
+    def test_size(self):
+        self.assertEqual(self.basis.state_features_size(), 3*5*5)
+        self.assertEqual(self.basis.size(), 2*3*5*5)
+
+    def test_is_sparse(self):
+        self.assertTrue(self.basis.is_sparse)
+
+    def test_default_offsets(self):
+        np.testing.assert_array_almost_equal(
+            self.basis.offsets, [[0, 0], [1/3., 0], [2/3., 0]])
+
+    def test_evaluate_state(self):
+        basis = TileCodingBasis([0], [1], 2, 2, 1, offsets=[[0], [.5]])
+
+        np.testing.assert_array_equal(basis.evaluate_state(np.array([.3])),
+                                      [1, 0, 0, 0, 1, 0])
+        np.testing.assert_array_equal(basis.evaluate_state(np.array([.8])),
+                                      [0, 1, 0, 0, 0, 1])
+
+    def test_states_outside_box_use_edge_tiles(self):
+        basis = TileCodingBasis([0], [1], 2, 2, 1, offsets=[[0], [.5]])
+
+        np.testing.assert_array_equal(basis.evaluate_state(np.array([-5.])),
+                                      [1, 0, 0, 1, 0, 0])
+        np.testing.assert_array_equal(basis.evaluate_state(np.array([5.])),
+                                      [0, 0, 1, 0, 0, 1])
+
+    def test_one_active_tile_per_tiling(self):
+        psi = self.basis.evaluate_state_batch(self.states)
+
+        np.testing.assert_array_equal(
+            psi.reshape((10, 3, 25)).sum(axis=2), np.ones((10, 3)))
+
+    def test_evaluate(self):
+        phi = self.basis.evaluate(self.states[0], 1)
+
+        np.testing.assert_array_equal(phi[:75], np.zeros(75))
+        np.testing.assert_array_equal(phi[75:],
+                                      self.basis.evaluate_state(self.states[0]))
+
+    def test_evaluate_out_of_bounds_action(self):
+        with self.assertRaises(IndexError):
+            self.basis.evaluate(self.states[0], 2)
+
+    def test_evaluate_sparse(self):
+        indices, values = self.basis.evaluate_sparse(self.states[0], 1)
+
+        self.assertEqual(indices.shape, (3, ))
+        phi = np.zeros((self.basis.size(), ))
+        phi[indices] = values
+        np.testing.assert_array_equal(phi,
+                                      self.basis.evaluate(self.states[0], 1))
+
+    def test_evaluate_sparse_batch(self):
+        actions = np.arange(10) % 2
+
+        phi = self.basis.evaluate_sparse_batch(self.states, actions)
+
+        self.assertEqual(phi.nnz, 30)
+        for i in range(10):
+            np.testing.assert_array_equal(
+                phi[i].toarray()[0],
+                self.basis.evaluate(self.states[i], actions[i]))
+
+    def test_evaluate_sparse_state_batch(self):
+        psi = self.basis.evaluate_sparse_state_batch(self.states)
+
+        self.assertEqual(psi.nnz, 30)
+        np.testing.assert_array_equal(
+            psi.toarray(), self.basis.evaluate_state_batch(self.states))
+
+    def test_hashed(self):
+        basis = TileCodingBasis([0, 0], [1, 2], 4, 3, 2, table_size=16)
+        actions = np.arange(10) % 2
+
+        psi = basis.evaluate_state_batch(self.states)
+        phi = basis.evaluate_sparse_batch(self.states, actions)
+
+        self.assertEqual(basis.size(), 32)
+        np.testing.assert_array_equal(psi.sum(axis=1), 3*np.ones(10))
+        np.testing.assert_array_equal(phi.toarray(),
+                                      basis.evaluate_batch(self.states,
+                                                           actions))
+        np.testing.assert_array_equal(phi[:, :16].toarray()[actions == 0],
+                                      psi[actions == 0])
+
+    def test_hashed_large_grid(self):
+        basis = TileCodingBasis(np.zeros(20), np.ones(20), 100, 8, 1,
+                                table_size=1024)
+
+        indices, values = basis.evaluate_sparse(np.full(20, .5), 0)
+
+        self.assertTrue(np.all(indices < 1024))
+        self.assertEqual(values.sum(), 8)
+
+    def test_incorrect_state_dimensions(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_state(np.zeros(3))
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_sparse_batch(np.zeros((1, 3)), [0])
+
 class TestExactBasis(TestCase):
     def setUp(self):
         self.basis = ExactBasis([2, 3, 4], 2)
@@ -365,4 +941,84 @@ class TestExactBasis(TestCase):
             self.basis.evaluate(np.array([0]), 0)
 
         with self.assertRaises(ValueError):
-            self.basis.evaluate(np.array([0, 0, 0, 0]), 0)
\ No newline at end of file
+            self.basis.evaluate(np.array([0, 0, 0, 0]), 0)
+
+    def test_evaluate_batch(self):
+        states = np.array([[0, 0, 0], [1, 2, 3], [0, 1, 2], [1, 0, 3]])
+        actions = np.array([0, 1, 1, 0])
+
+        phi = self.basis.evaluate_batch(states, actions)
+
+        self.assertEqual(phi.shape, (4, 48))
+        for row, state, action in zip(phi, states, actions):
+            np.testing.assert_array_almost_equal(
+                row, self.basis.evaluate(state, action))
+
+    def test_evaluate_batch_out_of_bounds_action(self):
+        with self.assertRaises(IndexError):
+            self.basis.evaluate_batch(np.array([[0, 0, 0]]), [2])
+
+    def test_evaluate_batch_out_of_bounds_state(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_batch(np.array([[0, 0, -1]]), [0])
+
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_batch(np.array([[0, 3, 0]]), [0])
+
+    def test_evaluate_batch_wrong_size_state(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_batch(np.array([[0, 0]]), [0])
+
+    def test_state_features(self):
+        self.assertEqual(self.basis.state_features_size(), 24)
+
+        psi = self.basis.evaluate_state(np.array([1, 2, 3]))
+        np.testing.assert_array_almost_equal(
+            psi, self.basis.evaluate(np.array([1, 2, 3]), 1)[24:])
+
+    def test_evaluate_state_batch(self):
+        states = np.array([[0, 0, 0], [1, 2, 3]])
+
+        psi = self.basis.evaluate_state_batch(states)
+
+        expected_psi = np.zeros((2, 24))
+        expected_psi[0, 0] = 1
+        expected_psi[1, 23] = 1
+        np.testing.assert_array_almost_equal(psi, expected_psi)
+
+    def test_evaluate_state_batch_out_of_bounds_state(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_state_batch(np.array([[2, 0, 0]]))
+
+    def test_is_sparse(self):
+        self.assertTrue(self.basis.is_sparse)
+
+    def test_evaluate_sparse(self):
+        indices, values = self.basis.evaluate_sparse(np.array([1, 2, 3]), 1)
+
+        np.testing.assert_array_equal(indices, [47])
+        np.testing.assert_array_almost_equal(values, [1.])
+
+    def test_evaluate_sparse_out_of_bounds_state(self):
+        with self.assertRaises(ValueError):
+            self.basis.evaluate_sparse(np.array([2, 0, 0]), 0)
+
+    def test_evaluate_sparse_batch(self):
+        states = np.array([[0, 0, 0], [1, 2, 3], [0, 1, 2]])
+        actions = np.array([0, 1, 1])
+
+        phi = self.basis.evaluate_sparse_batch(states, actions)
+
+        self.assertEqual(phi.shape, (3, 48))
+        self.assertEqual(phi.nnz, 3)
+        np.testing.assert_array_almost_equal(
+            phi.toarray(), self.basis.evaluate_batch(states, actions))
+
+    def test_evaluate_sparse_state_batch(self):
+        states = np.array([[0, 0, 0], [1, 2, 3]])
+
+        psi = self.basis.evaluate_sparse_state_batch(states)
+
+        self.assertEqual(psi.shape, (2, 24))
+        np.testing.assert_array_almost_equal(
+            psi.toarray(), self.basis.evaluate_state_batch(states))
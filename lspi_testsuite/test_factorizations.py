@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Contains tests for the linear system factorization backends."""
+from unittest import TestCase
+
+from lspi.factorizations import (CholeskyFactorization,
+                                 Factorization,
+                                 LUFactorization,
+                                 QRFactorization,
+                                 SVDFactorization)
+
+import numpy as np
+
+
+class TestFactorization(TestCase):
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.a_mat = random_state.uniform(-1, 1, size=(6, 6)) + 3*np.eye(6)
+        self.b_vec = random_state.uniform(-1, 1, size=(6, 1))
+
+        # A matrix of the singular LSTDQ test case
+        self.singular_a_mat = np.array([[.1, 0.], [0., 0.]])
+        self.singular_b_vec = np.array([[1.], [0.]])
+
+        self.factorizations = [LUFactorization(),
+                               QRFactorization(),
+                               CholeskyFactorization(),
+                               SVDFactorization()]
+
+    def test_requires_solve_implementation(self):
+        with self.assertRaises(TypeError):
+            Factorization()
+
+    def test_full_rank_solution(self):
+        expected = np.linalg.solve(self.a_mat, self.b_vec).reshape((-1, ))
+
+        for factorization in self.factorizations:
+            w = factorization.solve(self.a_mat, self.b_vec)
+
+            self.assertEqual(w.shape, (6, ))
+            np.testing.assert_array_almost_equal(w, expected)
+            self.assertFalse(factorization.rank_deficient)
+
+    def test_condition_estimate(self):
+        """Test that rcond is within a small factor of the exact value."""
+        exact_rcond = 1. / np.linalg.cond(self.a_mat)
+
+        for factorization in self.factorizations:
+            factorization.solve(self.a_mat, self.b_vec)
+
+            self.assertGreater(factorization.rcond, exact_rcond / 10.)
+            self.assertLess(factorization.rcond, exact_rcond * 10.)
+
+    def test_singular_matrix(self):
+        for factorization in self.factorizations:
+            w = factorization.solve(self.singular_a_mat, self.singular_b_vec)
+
+            self.assertTrue(factorization.rank_deficient)
+            np.testing.assert_array_almost_equal(w, np.array([10., 0.]))
+
+    def test_rcond_threshold(self):
+        factorization = SVDFactorization(rcond_threshold=.5)
+
+        factorization.solve(np.diag([1., .1]), np.ones((2, 1)))
+
+        self.assertTrue(factorization.rank_deficient)
+
+    def test_cholesky_near_singular_matrix(self):
+        """Test that the threshold applies to the normal equations.
+
+        rcond of A is 1e-10, well above the default threshold, but the
+        normal equations have rcond 1e-20 and cannot be solved accurately.
+
+        """
+        factorization = CholeskyFactorization()
+
+        w = factorization.solve(np.diag([1., 1e-10]), np.ones((2, 1)))
+
+        self.assertTrue(factorization.rank_deficient)
+        np.testing.assert_allclose(factorization.rcond, 1e-10)
+        np.testing.assert_allclose(w, np.array([1., 1e10]))
@@ -5,7 +5,10 @@ from unittest import TestCase
 import lspi
 from lspi.solvers import Solver
 from lspi.policy import Policy
-from lspi.basis_functions import FakeBasis
+from lspi.basis_functions import ExactBasis, FakeBasis
+from lspi.domains import ChainDomain
+from lspi.sample import SampleBatch
+from lspi.solvers import LSTDQSolver, RecursiveLSTDQSolver
 import numpy as np
 
 class SolverStub(Solver):
@@ -131,4 +134,52 @@ class TestLearnFunction(TestCase):
         lspi.learn(solver_stub.data,
                    solver_stub.policy,
                    solver_stub,
-                   max_iterations=1)
\ No newline at end of file
+                   max_iterations=1)
+
+class TestLearnOnlineFunction(TestCase):
+    def test_num_samples_out_of_bounds(self):
+        with self.assertRaises(ValueError):
+            lspi.learn_online(None, None, None, 0)
+
+    def test_weights_updated_after_every_sample(self):
+        """Test that the solver sees every sample and the weights change."""
+        domain = ChainDomain(num_states=4)
+        initial_policy = Policy(ExactBasis([4], 2), .9, 1.,
+                                np.zeros((8, )))
+        solver = RecursiveLSTDQSolver()
+
+        policy = lspi.learn_online(domain, initial_policy, solver, 50)
+
+        self.assertNotEquals(id(initial_policy), id(policy))
+        np.testing.assert_array_almost_equal(initial_policy.weights,
+                                             np.zeros((8, )))
+        np.testing.assert_array_almost_equal(policy.weights, solver.weights)
+        self.assertGreater(np.abs(policy.weights).sum(), 0)
+
+
+class TestLearner(TestCase):
+    def setUp(self):
+        domain = ChainDomain(num_states=4)
+        self.samples = [domain.apply_action(i % 2) for i in range(100)]
+        self.initial_policy = Policy(ExactBasis([4], 2), .9, 0,
+                                     np.zeros((8, )))
+
+    def test_learn_without_samples(self):
+        with self.assertRaises(ValueError):
+            lspi.Learner(self.initial_policy).learn()
+
+    def test_appended_samples_match_learning_from_scratch(self):
+        learner = lspi.Learner(self.initial_policy)
+        learner.add_samples(self.samples[:50])
+        learner.learn()
+        learner.add_samples(SampleBatch.from_samples(self.samples[50:]))
+
+        policy = learner.learn()
+
+        expected_policy = lspi.learn(self.samples, learner.policy,
+                                     LSTDQSolver())
+        self.assertEqual(len(learner.data), 100)
+        np.testing.assert_array_almost_equal(policy.weights,
+                                             expected_policy.weights)
+        np.testing.assert_array_almost_equal(self.initial_policy.weights,
+                                             np.zeros((8, )))
@@ -2,7 +2,10 @@
 from unittest import TestCase
 
 from lspi.policy import Policy
-from lspi.basis_functions import FakeBasis, OneDimensionalPolynomialBasis
+from lspi.basis_functions import (ExactBasis, FakeBasis,
+                                  OneDimensionalPolynomialBasis,
+                                  TileCodingBasis,
+                                  TruncatedRadialBasisFunction)
 import numpy as np
 from copy import copy
 
@@ -232,4 +235,172 @@ class TestPolicy(TestCase):
         self.poly_policy.num_actions = 10
 
         self.assertEqual(self.poly_policy.num_actions,
-                         self.poly_policy.basis.num_actions)
\ No newline at end of file
+                         self.poly_policy.basis.num_actions)
+
+class TestPolicyBatch(TestCase):
+
+    def setUp(self):
+        self.poly_policy = Policy(OneDimensionalPolynomialBasis(1, 2),
+                                  weights=np.array([1., 1, 2, 2]))
+        self.states = np.array([[-3.], [2.], [0.5]])
+        self.tie_weights = np.ones((4,))
+
+    def test_q_values(self):
+        q_values = self.poly_policy.q_values(self.states)
+
+        self.assertEqual(q_values.shape, (3, 2))
+        for state, row in zip(self.states, q_values):
+            for action, q_value in enumerate(row):
+                self.assertAlmostEqual(
+                    q_value, self.poly_policy.calc_q_value(state, action))
+
+    def test_q_values_mismatched_state_dimensions(self):
+        with self.assertRaises(ValueError):
+            self.poly_policy.q_values(np.ones((3, 2)))
+
+    def test_best_actions_no_ties(self):
+        best_actions = self.poly_policy.best_actions(self.states)
+
+        np.testing.assert_array_equal(best_actions, [0, 1, 1])
+
+    def test_best_actions_with_ties_first_wins(self):
+        self.poly_policy.weights = self.tie_weights
+        self.poly_policy.tie_breaking_strategy = \
+            Policy.TieBreakingStrategy.FirstWins
+
+        best_actions = self.poly_policy.best_actions(self.states)
+
+        np.testing.assert_array_equal(best_actions, [0, 0, 0])
+
+    def test_best_actions_with_ties_last_wins(self):
+        self.poly_policy.weights = self.tie_weights
+        self.poly_policy.tie_breaking_strategy = \
+            Policy.TieBreakingStrategy.LastWins
+
+        best_actions = self.poly_policy.best_actions(self.states)
+
+        np.testing.assert_array_equal(best_actions, [1, 1, 1])
+
+    def test_best_actions_with_ties_random_wins(self):
+        self.poly_policy.weights = self.tie_weights
+        self.poly_policy.tie_breaking_strategy = \
+            Policy.TieBreakingStrategy.RandomWins
+
+        best_actions = self.poly_policy.best_actions(np.zeros((100, 1)))
+
+        self.assertLess(int(sum(best_actions)), 100)
+        self.assertNotEqual(int(sum(best_actions)), 0)
+
+    def test_argmax_actions_random_wins_only_picks_ties(self):
+        self.poly_policy.tie_breaking_strategy = \
+            Policy.TieBreakingStrategy.RandomWins
+        q_values = np.tile([[1., 3., 3.]], (100, 1))
+
+        actions = self.poly_policy.argmax_actions(q_values)
+
+        self.assertTrue(np.all(actions >= 1))
+        self.assertTrue(np.any(actions == 1))
+        self.assertTrue(np.any(actions == 2))
+
+    def test_select_actions_random(self):
+        self.poly_policy.explore = 1.0
+        self.poly_policy.tie_breaking_strategy = \
+            Policy.TieBreakingStrategy.FirstWins
+
+        actions = self.poly_policy.select_actions(np.tile([[-3.]], (100, 1)))
+
+        self.assertNotEqual(sum(actions), 0)
+        self.assertNotEqual(sum(actions), 100)
+
+    def test_select_actions_deterministic(self):
+        self.poly_policy.explore = 0.0
+        self.poly_policy.tie_breaking_strategy = \
+            Policy.TieBreakingStrategy.FirstWins
+
+        actions = self.poly_policy.select_actions(self.states)
+
+        np.testing.assert_array_equal(actions, [0, 1, 1])
+
+    def test_sparse_basis_q_values(self):
+        policy = Policy(ExactBasis([3], 2), weights=np.arange(6.))
+        states = np.array([[0], [2], [1]])
+
+        np.testing.assert_array_almost_equal(policy.q_values(states),
+                                             [[0., 3.], [2., 5.], [1., 4.]])
+        self.assertAlmostEqual(policy.calc_q_value(np.array([2]), 1), 5.)
+        np.testing.assert_array_equal(policy.best_actions(states), [1, 1, 1])
+
+    def test_sparse_state_factored_basis_evaluated_once(self):
+        random_state = np.random.RandomState(0)
+        bases = [TruncatedRadialBasisFunction(
+                    list(random_state.uniform(size=(20, 2))), 4., 3),
+                 TileCodingBasis([0, 0], [1, 1], 4, 2, 3, table_size=16)]
+        states = random_state.uniform(size=(5, 2))
+
+        for basis in bases:
+            policy = Policy(basis,
+                            weights=random_state.uniform(size=basis.size()))
+            calls = []
+
+            def counted(name, method):
+                def evaluate(*args):
+                    calls.append(name)
+                    return method(*args)
+                return evaluate
+
+            for name in ('evaluate_sparse', 'evaluate_sparse_batch',
+                         'evaluate_sparse_state_batch'):
+                setattr(basis, name, counted(name, getattr(basis, name)))
+
+            q_values = policy.q_values(states)
+            self.assertEqual(calls, ['evaluate_sparse_state_batch'])
+
+            for state, row in zip(states, q_values):
+                del calls[:]
+                best_action = policy.best_action(state)
+                self.assertEqual(calls, ['evaluate_sparse'])
+
+                self.assertEqual(best_action, np.argmax(row))
+                for action, q_value in enumerate(row):
+                    self.assertAlmostEqual(
+                        q_value, policy.calc_q_value(state, action))
+
+    def test_random_state_reproducible(self):
+        policies = [Policy(OneDimensionalPolynomialBasis(1, 3), explore=.5,
+                           random_state=seed)
+                    for seed in (4, 4)]
+
+        np.testing.assert_array_equal(policies[0].weights,
+                                      policies[1].weights)
+        actions = [[policy.select_action(state) for state in self.states]
+                   for policy in policies]
+        self.assertEqual(actions[0], actions[1])
+
+    def test_scalar_and_batch_methods_share_random_numbers(self):
+        states = np.tile(self.states, (10, 1))
+        policies = [Policy(OneDimensionalPolynomialBasis(1, 2), explore=.3,
+                           weights=self.tie_weights,
+                           random_state=np.random.RandomState(7))
+                    for i in range(2)]
+
+        scalar = [policies[0].best_action(state) for state in states]
+        batch = [policies[1].best_actions(state[np.newaxis])[0]
+                 for state in states]
+        self.assertEqual(scalar, batch)
+        self.assertEqual(set(scalar), set([0, 1]))
+
+        scalar = [policies[0].select_action(state) for state in states]
+        batch = [policies[1].select_actions(state[np.newaxis])[0]
+                 for state in states]
+        self.assertEqual(scalar, batch)
+
+    def test_global_seed_controls_scalar_methods(self):
+        policy = Policy(OneDimensionalPolynomialBasis(1, 2), explore=.5,
+                        weights=self.tie_weights)
+
+        actions = []
+        for i in range(2):
+            np.random.seed(3)
+            actions.append([policy.select_action(state)
+                            for state in np.tile(self.states, (5, 1))])
+        self.assertEqual(actions[0], actions[1])
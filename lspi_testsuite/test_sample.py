@@ -2,7 +2,10 @@
 """Tests for emodel.lspi.sample class."""
 from unittest import TestCase
 
-from lspi import Sample
+from lspi import (Sample, SampleBatch, SampleChunks, TrajectoryBatch,
+                  WeightedSampleBatch)
+
+import numpy as np
 
 
 class TestSample(TestCase):
@@ -42,4 +45,209 @@ class TestSample(TestCase):
         self.assertEqual(sample.action, self.action)
         self.assertAlmostEqual(sample.reward, self.reward, 3)
         self.assertEqual(sample.next_state, self.next_state)
-        self.assertEqual(sample.absorb, False)
\ No newline at end of file
+        self.assertEqual(sample.absorb, False)
+
+class TestSampleBatch(TestCase):
+
+    def setUp(self):
+        self.samples = [Sample(np.array([0]), 0, 1., np.array([1])),
+                        Sample(np.array([1]), 1, -1., np.array([2]), True),
+                        Sample(np.array([2]), 0, .5, np.array([1]))]
+
+    def test_from_samples(self):
+        batch = SampleBatch.from_samples(self.samples)
+
+        self.assertEqual(len(batch), 3)
+        np.testing.assert_array_equal(batch.states, [[0], [1], [2]])
+        np.testing.assert_array_equal(batch.actions, [0, 1, 0])
+        np.testing.assert_array_almost_equal(batch.rewards, [1., -1., .5])
+        np.testing.assert_array_equal(batch.next_states, [[1], [2], [1]])
+        np.testing.assert_array_equal(batch.absorb, [False, True, False])
+
+    def test_to_samples_round_trip(self):
+        samples = SampleBatch.from_samples(self.samples).to_samples()
+
+        self.assertEqual(len(samples), len(self.samples))
+        for sample, expected in zip(samples, self.samples):
+            np.testing.assert_array_equal(sample.state, expected.state)
+            self.assertEqual(sample.action, expected.action)
+            self.assertAlmostEqual(sample.reward, expected.reward)
+            np.testing.assert_array_equal(sample.next_state,
+                                          expected.next_state)
+            self.assertEqual(sample.absorb, expected.absorb)
+
+    def test_default_absorb(self):
+        batch = SampleBatch(np.zeros((2, 1)), [0, 1], [0., 0.],
+                            np.zeros((2, 1)))
+
+        np.testing.assert_array_equal(batch.absorb, [False, False])
+
+    def test_slice_returns_batch(self):
+        batch = SampleBatch.from_samples(self.samples)[1:]
+
+        self.assertTrue(isinstance(batch, SampleBatch))
+        self.assertEqual(len(batch), 2)
+        np.testing.assert_array_equal(batch.actions, [1, 0])
+
+    def test_concatenate(self):
+        batch = SampleBatch.concatenate(
+            [SampleBatch.from_samples(self.samples[:1]),
+             SampleBatch.from_samples(self.samples[1:])])
+
+        self.assertEqual(len(batch), 3)
+        np.testing.assert_array_equal(batch.states, [[0], [1], [2]])
+        np.testing.assert_array_equal(batch.absorb, [False, True, False])
+
+    def test_unique_next_states(self):
+        batch = SampleBatch.from_samples(self.samples)
+
+        next_states, index = batch.unique_next_states()
+
+        self.assertEqual(next_states.shape, (2, 1))
+        np.testing.assert_array_equal(next_states[index], batch.next_states)
+
+    def test_mismatched_lengths(self):
+        with self.assertRaises(ValueError):
+            SampleBatch(np.zeros((2, 1)), [0], [0., 0.], np.zeros((2, 1)))
+
+    def test_mismatched_state_shapes(self):
+        with self.assertRaises(ValueError):
+            SampleBatch(np.zeros((2, 1)), [0, 1], [0., 0.], np.zeros((2, 2)))
+
+
+class TestSampleChunks(TestCase):
+
+    def setUp(self):
+        self.samples = [Sample(np.array([i]), i % 2, float(i),
+                               np.array([i + 1]))
+                        for i in range(5)]
+
+    def test_from_samples(self):
+        chunks = SampleChunks.from_samples(lambda: iter(self.samples), 2)
+
+        for i in range(2):
+            batches = list(chunks)
+            self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+            self.assertTrue(all(isinstance(batch, SampleBatch)
+                                for batch in batches))
+            np.testing.assert_array_equal(batches[2].states, [[4]])
+
+    def test_from_batch(self):
+        batch = SampleBatch.from_samples(self.samples)
+        chunks = SampleChunks.from_batch(batch, 3)
+
+        batches = list(chunks)
+
+        self.assertEqual([len(chunk) for chunk in batches], [3, 2])
+        np.testing.assert_array_equal(batches[1].actions, [1, 0])
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            SampleChunks.from_samples(lambda: iter(self.samples), 0)
+        with self.assertRaises(ValueError):
+            SampleChunks.from_batch(SampleBatch.from_samples(self.samples),
+                                    0)
+
+
+class TestTrajectoryBatch(TestCase):
+
+    def setUp(self):
+        # two trajectories stored back to back
+        self.samples = [Sample(np.array([0]), 1, 0., np.array([1])),
+                        Sample(np.array([1]), 1, 0., np.array([2])),
+                        Sample(np.array([2]), 0, 1., np.array([1]), True),
+                        Sample(np.array([3]), 0, 0., np.array([2]))]
+
+    def test_from_samples_stores_shared_states_once(self):
+        batch = TrajectoryBatch.from_samples(self.samples)
+        expected = SampleBatch.from_samples(self.samples)
+
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(len(batch.state_table), 6)
+        for column in ('states', 'actions', 'rewards', 'next_states',
+                       'absorb'):
+            np.testing.assert_array_equal(getattr(batch, column),
+                                          getattr(expected, column))
+
+    def test_from_trajectory(self):
+        batch = TrajectoryBatch.from_trajectory(np.array([[0], [1], [2]]),
+                                                [1, 1], [0., 1.], True)
+
+        np.testing.assert_array_equal(batch.states, [[0], [1]])
+        np.testing.assert_array_equal(batch.next_states, [[1], [2]])
+        np.testing.assert_array_equal(batch.absorb, [False, True])
+
+    def test_slice_shares_state_table(self):
+        batch = TrajectoryBatch.from_samples(self.samples)
+
+        sliced = batch[1:3]
+
+        self.assertTrue(isinstance(sliced, TrajectoryBatch))
+        self.assertIs(sliced.state_table, batch.state_table)
+        np.testing.assert_array_equal(sliced.states, [[1], [2]])
+        sample = batch[2]
+        np.testing.assert_array_equal(sample.next_state, [1])
+        self.assertTrue(sample.absorb)
+
+    def test_unique_next_states(self):
+        batch = TrajectoryBatch.from_samples(self.samples)
+
+        next_states, index = batch.unique_next_states()
+
+        self.assertEqual(next_states.shape, (4, 1))
+        np.testing.assert_array_equal(next_states[index], batch.next_states)
+
+    def test_index_outside_of_state_table(self):
+        with self.assertRaises(IndexError):
+            TrajectoryBatch(np.zeros((2, 1)), [0], [2], [0], [0.])
+
+    def test_mismatched_lengths(self):
+        with self.assertRaises(ValueError):
+            TrajectoryBatch(np.zeros((2, 1)), [0, 1], [1], [0], [0.])
+
+
+class TestWeightedSampleBatch(TestCase):
+
+    def setUp(self):
+        first = Sample(np.array([0]), 0, 1., np.array([1]))
+        second = Sample(np.array([1]), 1, 0., np.array([0]), True)
+        self.samples = [first, second, first, first, second,
+                        Sample(np.array([0]), 0, 1., np.array([0]))]
+
+    def test_compact(self):
+        batch = SampleBatch.from_samples(self.samples).compact()
+
+        self.assertTrue(isinstance(batch, WeightedSampleBatch))
+        np.testing.assert_array_equal(batch.states, [[0], [1], [0]])
+        np.testing.assert_array_equal(batch.next_states, [[1], [0], [0]])
+        np.testing.assert_array_equal(batch.absorb, [False, True, False])
+        np.testing.assert_array_almost_equal(batch.counts, [3, 2, 1])
+
+    def test_compact_adds_counts(self):
+        batch = SampleBatch.from_samples(self.samples).compact()
+
+        compacted = SampleBatch.concatenate([batch, batch[:1]]).compact()
+
+        # the sliced sample keeps its count of 3
+        np.testing.assert_array_almost_equal(compacted.counts, [6, 2, 1])
+
+    def test_default_counts(self):
+        batch = WeightedSampleBatch(np.zeros((2, 1)), [0, 1], [0., 0.],
+                                    np.zeros((2, 1)))
+
+        np.testing.assert_array_almost_equal(batch.counts, [1, 1])
+
+    def test_slice_keeps_counts(self):
+        batch = WeightedSampleBatch(np.zeros((3, 1)), [0, 1, 0],
+                                    [0., 0., 1.], np.zeros((3, 1)),
+                                    counts=[1., 2., 3.])
+
+        sliced = batch[1:]
+
+        self.assertTrue(isinstance(sliced, WeightedSampleBatch))
+        np.testing.assert_array_almost_equal(sliced.counts, [2, 3])
+
+    def test_mismatched_counts(self):
+        with self.assertRaises(ValueError):
+            WeightedSampleBatch(np.zeros((2, 1)), [0, 1], [0., 0.],
+                                np.zeros((2, 1)), counts=[1.])
@@ -2,13 +2,110 @@
 """Contains tests for the various solvers."""
 from unittest import TestCase
 
-from lspi.basis_functions import ExactBasis
+from lspi.basis_functions import (BasisFunction, ExactBasis,
+                                  OneDimensionalPolynomialBasis,
+                                  RadialBasisFunction,
+                                  TruncatedRadialBasisFunction)
+from lspi.factorizations import (CholeskyFactorization,
+                                 QRFactorization,
+                                 SVDFactorization)
 from lspi.policy import Policy
-from lspi.sample import Sample
-from lspi.solvers import LSTDQSolver
+from lspi.sample import (Sample, SampleBatch, SampleChunks,
+                         TrajectoryBatch)
+from lspi.solvers import (IncrementalLSTDQSolver, KrylovLSTDQSolver,
+                          LSTDQSolver, ParallelLSTDQSolver,
+                          RecursiveLSTDQSolver, SparseLSTDQSolver,
+                          StreamingLSTDQSolver, VectorizedLSTDQSolver)
 
 import numpy as np
 
+
+class CountingExactBasis(ExactBasis):
+    """ExactBasis that counts how often each state-action is evaluated."""
+
+    def __init__(self, num_states, num_actions):
+        super(CountingExactBasis, self).__init__(num_states, num_actions)
+        self.calls = []
+
+    def evaluate(self, state, action):
+        self.calls.append((tuple(state), action))
+        return super(CountingExactBasis, self).evaluate(state, action)
+
+    def evaluate_batch(self, states, actions):
+        self.calls.extend(zip(map(tuple, states), actions))
+        return super(CountingExactBasis, self).evaluate_batch(states,
+                                                              actions)
+
+    def evaluate_state_batch(self, states):
+        self.calls.extend((tuple(state), None) for state in states)
+        return super(CountingExactBasis, self).evaluate_state_batch(states)
+
+
+class CountingDenseExactBasis(CountingExactBasis):
+    """CountingExactBasis that hides its state factored layout."""
+
+    def state_features_size(self):
+        return None
+
+
+class DenseExactBasis(ExactBasis):
+    """ExactBasis that hides its state factored layout from the solvers."""
+
+    def state_features_size(self):
+        return None
+
+
+class DictStateBasis(BasisFunction):
+    """One-hot basis of states given as ``{'position': index}`` dicts."""
+
+    def __init__(self, num_states, num_actions):
+        self.num_states = num_states
+        self._num_actions = num_actions
+
+    def size(self):
+        return self.num_states*self._num_actions
+
+    def evaluate(self, state, action):
+        phi = np.zeros((self.size(), ))
+        phi[action*self.num_states + state['position']] = 1.
+        return phi
+
+    @property
+    def num_actions(self):
+        return self._num_actions
+
+
+def _random_chain_data(seed, num_states=5, num_samples=50,
+                       discrete_rewards=False):
+    """Return random chain samples and an ExactBasis policy for them.
+
+    The policy has random weights and breaks ties deterministically. The
+    rewards are uniform in [-1, 1), or 0 and 1 if discrete_rewards is True
+    so that some transitions repeat.
+
+    """
+    random_state = np.random.RandomState(seed)
+
+    def reward():
+        if discrete_rewards:
+            return float(random_state.randint(2))
+        return random_state.uniform(-1, 1)
+
+    data = [Sample(np.array([random_state.randint(num_states)]),
+                   random_state.randint(2),
+                   reward(),
+                   np.array([random_state.randint(num_states)]),
+                   random_state.uniform() < .1)
+            for i in range(num_samples)]
+
+    policy = Policy(ExactBasis([num_states], 2),
+                    .9,
+                    0,
+                    random_state.uniform(-1, 1, size=(2*num_states, )),
+                    Policy.TieBreakingStrategy.FirstWins)
+    return data, policy
+
+
 class TestLSTDQSolver(TestCase):
     def setUp(self):
         self.data = [Sample(np.array([0]), 0, 1, np.array([0])),
@@ -69,4 +166,672 @@ class TestLSTDQSolver(TestCase):
 
         expected_weights = np.array([1, -10])
 
-        np.testing.assert_array_almost_equal(weights, expected_weights)
\ No newline at end of file
+        np.testing.assert_array_almost_equal(weights, expected_weights)
+
+    def test_solve_method_with_factorizations(self):
+        """Test each factorization backend on full rank and singular A."""
+        for factorization in (QRFactorization(),
+                              CholeskyFactorization(),
+                              SVDFactorization()):
+            solver = LSTDQSolver(precondition_value=0,
+                                 factorization=factorization)
+
+            weights = solver.solve(self.data, self.policy)
+            np.testing.assert_array_almost_equal(weights,
+                                                 np.array([10, -10]))
+
+            weights = solver.solve(self.data[:-1], self.policy)
+            np.testing.assert_array_almost_equal(weights, np.array([10, 0]))
+            self.assertTrue(solver.factorization.rank_deficient)
+
+    def test_solve_method_with_sample_batch(self):
+        """Test that a SampleBatch gives the same weights as a list."""
+        solver = LSTDQSolver(precondition_value=0)
+
+        self.data[0].absorb = True
+        weights = solver.solve(SampleBatch.from_samples(self.data),
+                               self.policy)
+
+        expected_weights = np.array([1, -10])
+
+        np.testing.assert_array_almost_equal(weights, expected_weights)
+
+    def test_solve_method_with_trajectory_batch(self):
+        """Test that a TrajectoryBatch gives the same weights as a batch."""
+        data, policy = _random_chain_data(4)
+        trajectory = TrajectoryBatch.from_samples(data)
+        batch = SampleBatch.from_samples(data)
+
+        for cache_features in (False, True):
+            solver = LSTDQSolver(cache_features=cache_features)
+
+            np.testing.assert_array_almost_equal(
+                solver.solve(trajectory, policy),
+                LSTDQSolver().solve(batch, policy))
+
+    def test_solve_method_with_dict_states(self):
+        """Test that states without a numeric array form can be used."""
+        data, policy = _random_chain_data(5)
+        dict_data = [Sample({'position': int(sample.state[0])},
+                            sample.action, sample.reward,
+                            {'position': int(sample.next_state[0])},
+                            sample.absorb)
+                     for sample in data]
+        dict_policy = Policy(DictStateBasis(5, 2), .9, 0, policy.weights,
+                             Policy.TieBreakingStrategy.FirstWins)
+        expected_weights = LSTDQSolver().solve(data, policy)
+
+        for solver in (LSTDQSolver(cache_features=False),
+                       LSTDQSolver(),
+                       LSTDQSolver(precompute_next_features=True),
+                       VectorizedLSTDQSolver()):
+            weights = solver.solve(dict_data, dict_policy)
+
+            np.testing.assert_array_almost_equal(weights, expected_weights)
+
+    def test_state_action_features_cached_between_solves(self):
+        """Test that phi(s, a) is computed once for repeated solves."""
+        basis = CountingExactBasis([2], 1)
+        policy = Policy(basis, .9, 0, np.zeros((2, )),
+                        Policy.TieBreakingStrategy.FirstWins)
+        solver = LSTDQSolver(precondition_value=0)
+
+        first_weights = solver.solve(self.data, policy)
+        first_calls = len(basis.calls)
+        second_weights = solver.solve(self.data, policy)
+
+        # only the next state features are recomputed
+        self.assertEqual(len(basis.calls) - first_calls,
+                         first_calls - len(self.data))
+        np.testing.assert_array_almost_equal(first_weights, second_weights)
+
+    def test_feature_cache_invalidated_by_new_data(self):
+        """Test that passing different data recomputes the features."""
+        solver = LSTDQSolver(precondition_value=0)
+
+        solver.solve(self.data, self.policy)
+        other_data = [Sample(np.array([1]), 0, 1, np.array([1])),
+                      Sample(np.array([0]), 0, -1, np.array([0]))]
+        weights = solver.solve(other_data, self.policy)
+
+        np.testing.assert_array_almost_equal(weights, np.array([-10, 10]))
+
+    def test_feature_cache_extended_by_appended_samples(self):
+        """Test that only the appended samples have features computed."""
+        basis = CountingExactBasis([2], 1)
+        policy = Policy(basis, .9, 0, np.zeros((2, )),
+                        Policy.TieBreakingStrategy.FirstWins)
+        solver = LSTDQSolver(precondition_value=0)
+        data = SampleBatch.from_samples(self.data)
+        solver.solve(data, policy)
+
+        del basis.calls[:]
+        appended = [Sample(np.array([0]), 0, 1, np.array([1]))]
+        weights = solver.solve(
+            SampleBatch.concatenate([data,
+                                     SampleBatch.from_samples(appended)]),
+            policy)
+
+        # one phi(s, a) for the new sample plus the features of the two
+        # distinct next states
+        self.assertEqual(len(basis.calls), 1 + 2)
+        np.testing.assert_array_almost_equal(
+            weights,
+            LSTDQSolver(precondition_value=0).solve(self.data + appended,
+                                                    policy))
+
+    def test_greedy_actions_once_per_distinct_next_state(self):
+        """Test that shared next states get a single greedy action."""
+        data = SampleBatch.from_samples(
+            [Sample(np.array([i % 2]), 0, float(i % 2), np.array([1]))
+             for i in range(1000)])
+        greedy_states = []
+
+        def best_actions(states):
+            greedy_states.extend(map(tuple, states))
+            return Policy.best_actions(self.policy, states)
+
+        self.policy.best_actions = best_actions
+        self.policy.best_action = None
+        for cache_features in (True, False):
+            del greedy_states[:]
+            solver = LSTDQSolver(precondition_value=0,
+                                 cache_features=cache_features)
+
+            solver.solve(data, self.policy)
+            solver.solve(data, self.policy)
+
+            self.assertEqual(greedy_states, [(1, ), (1, )])
+
+    def test_feature_cache_invalidated_by_replaced_sample(self):
+        """Test that replacing a sample of a cached list is noticed."""
+        data, policy = _random_chain_data(0)
+        solver = LSTDQSolver()
+        solver.solve(data, policy)
+
+        data[0] = Sample(np.array([4]), 1, 5., np.array([4]), True)
+        np.testing.assert_array_almost_equal(
+            solver.solve(data, policy), LSTDQSolver().solve(data, policy))
+
+        # replacing a sample and appending another is not an extension
+        data[1] = Sample(np.array([3]), 0, -5., np.array([2]))
+        data.append(Sample(np.array([2]), 1, 1., np.array([3])))
+        np.testing.assert_array_almost_equal(
+            solver.solve(data, policy), LSTDQSolver().solve(data, policy))
+
+    def test_feature_cache_invalidated_by_basis_parameters(self):
+        """Test that changing a basis parameter recomputes the features."""
+        basis = RadialBasisFunction([np.array([0.]), np.array([1.])], 1., 2)
+        policy = Policy(basis, .9, 0, np.zeros((6, )),
+                        Policy.TieBreakingStrategy.FirstWins)
+        data = [Sample(np.array([i / 4.]), i % 2, float(i),
+                       np.array([(i + 1) / 4.]))
+                for i in range(8)]
+        solver = LSTDQSolver()
+        solver.solve(data, policy)
+
+        basis.gamma = 5.
+        np.testing.assert_array_almost_equal(
+            solver.solve(data, policy), LSTDQSolver().solve(data, policy))
+
+    def test_feature_cache_disabled(self):
+        """Test that the solver works without the feature cache."""
+        solver = LSTDQSolver(precondition_value=0, cache_features=False)
+
+        weights = solver.solve(self.data, self.policy)
+
+        np.testing.assert_array_almost_equal(weights, np.array([10, -10]))
+
+    def test_precompute_next_features_matches_default(self):
+        """Test that the precomputed next state path gives equal weights."""
+        basis = ExactBasis([4], 2)
+        policy = Policy(basis, .9, 0, np.linspace(-1., 1., 8),
+                        Policy.TieBreakingStrategy.FirstWins)
+        data = [Sample(np.array([i % 4]), i % 2, i % 3 - 1,
+                       np.array([(i + 1) % 4]), i % 5 == 0)
+                for i in range(20)]
+
+        weights = LSTDQSolver().solve(data, policy)
+        precomputed_weights = \
+            LSTDQSolver(precompute_next_features=True).solve(data, policy)
+
+        np.testing.assert_array_almost_equal(weights, precomputed_weights)
+
+    def test_precompute_next_features_tie_breaking(self):
+        """Test that precomputed greedy actions honor tie breaking."""
+        basis = ExactBasis([2], 2)
+        data = [Sample(np.array([0]), 0, 1, np.array([1]))]
+
+        for strategy in (Policy.TieBreakingStrategy.FirstWins,
+                         Policy.TieBreakingStrategy.LastWins):
+            policy = Policy(basis, .9, 0, np.ones((4, )), strategy)
+
+            weights = LSTDQSolver().solve(data, policy)
+            precomputed_weights = LSTDQSolver(
+                precompute_next_features=True).solve(data, policy)
+
+            np.testing.assert_array_almost_equal(weights,
+                                                 precomputed_weights)
+
+
+class TestVectorizedLSTDQSolver(TestCase):
+    def setUp(self):
+        self.data, self.policy = _random_chain_data(0)
+        self.basis = self.policy.basis
+
+        self.expected_weights = LSTDQSolver().solve(self.data, self.policy)
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            VectorizedLSTDQSolver(chunk_size=0)
+
+    def test_matches_lstdq_solver(self):
+        """Test that all chunk sizes match the sample by sample solver."""
+        for chunk_size in (1, 7, 50, 1000):
+            solver = VectorizedLSTDQSolver(chunk_size=chunk_size)
+
+            weights = solver.solve(self.data, self.policy)
+
+            np.testing.assert_array_almost_equal(weights,
+                                                 self.expected_weights)
+
+    def test_matches_lstdq_solver_with_sample_batch(self):
+        solver = VectorizedLSTDQSolver(chunk_size=16)
+
+        weights = solver.solve(SampleBatch.from_samples(self.data),
+                               self.policy)
+
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
+
+    def test_matches_lstdq_solver_without_cache(self):
+        solver = VectorizedLSTDQSolver(cache_features=False, chunk_size=16)
+
+        weights = solver.solve(self.data, self.policy)
+
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
+
+    def test_matches_lstdq_solver_with_precomputed_next_features(self):
+        solver = VectorizedLSTDQSolver(precompute_next_features=True,
+                                       chunk_size=16)
+
+        weights = solver.solve(self.data, self.policy)
+
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
+
+    def test_dense_basis_matches_lstdq_solver(self):
+        """Test the path for bases that are not state factored."""
+        basis = DenseExactBasis([5], 2)
+        policy = Policy(basis, .9, 0, self.policy.weights,
+                        Policy.TieBreakingStrategy.FirstWins)
+
+        for precompute_next_features in (False, True):
+            for cache_features in (False, True):
+                solver = VectorizedLSTDQSolver(
+                    cache_features=cache_features,
+                    precompute_next_features=precompute_next_features,
+                    chunk_size=16)
+
+                weights = solver.solve(self.data, policy)
+
+                np.testing.assert_array_almost_equal(weights,
+                                                     self.expected_weights)
+
+    def test_trajectory_batch_evaluates_each_state_once(self):
+        basis = CountingExactBasis([5], 2)
+        policy = Policy(basis, .9, 0, self.policy.weights,
+                        Policy.TieBreakingStrategy.FirstWins)
+        states = np.random.RandomState(2).randint(5, size=(51, 1))
+        batch = TrajectoryBatch.from_trajectory(
+            states, np.arange(50) % 2, np.linspace(-1, 1, 50))
+
+        weights = VectorizedLSTDQSolver().solve(batch, policy)
+
+        # one evaluation per trajectory state instead of two per sample
+        self.assertEqual(len(basis.calls), len(states))
+        np.testing.assert_array_almost_equal(
+            weights, LSTDQSolver().solve(batch.to_samples(), policy))
+
+    def test_next_state_features_evaluated_once_per_distinct_state(self):
+        batch = SampleBatch.from_samples(self.data)
+        num_next_states = len(np.unique(batch.next_states[~batch.absorb]))
+
+        for precompute_next_features in (False, True):
+            basis = CountingDenseExactBasis([5], 2)
+            policy = Policy(basis, .9, 0, self.policy.weights,
+                            Policy.TieBreakingStrategy.FirstWins)
+            solver = VectorizedLSTDQSolver(
+                precompute_next_features=precompute_next_features)
+
+            weights = solver.solve(batch, policy)
+
+            # phi(s, a) per sample plus phi(s', a') per distinct next state,
+            # for every action when precomputed and otherwise only for the
+            # greedy action (the Q values use the uncounted sparse path)
+            expected_calls = len(self.data) + num_next_states
+            if precompute_next_features:
+                expected_calls += num_next_states
+            self.assertEqual(len(basis.calls), expected_calls)
+            np.testing.assert_array_almost_equal(weights,
+                                                 self.expected_weights)
+
+    def test_state_factored_basis_with_polynomial_features(self):
+        """Test the block accumulation with a dense state feature vector."""
+        basis = OneDimensionalPolynomialBasis(2, 2)
+        policy = Policy(basis, .9, 0, np.linspace(-1., 1., 6),
+                        Policy.TieBreakingStrategy.FirstWins)
+        data = [Sample(np.array([sample.state[0] / 4.]),
+                       sample.action,
+                       sample.reward,
+                       np.array([sample.next_state[0] / 4.]),
+                       sample.absorb)
+                for sample in self.data]
+
+        expected_weights = LSTDQSolver().solve(data, policy)
+        weights = VectorizedLSTDQSolver(chunk_size=16).solve(data, policy)
+
+        np.testing.assert_array_almost_equal(weights, expected_weights)
+
+
+class TestStreamingLSTDQSolver(TestCase):
+    def setUp(self):
+        self.data, self.policy = _random_chain_data(1)
+
+        self.expected_weights = LSTDQSolver().solve(self.data, self.policy)
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            StreamingLSTDQSolver(chunk_size=0)
+
+    def test_matches_lstdq_solver(self):
+        chunks = SampleChunks.from_samples(lambda: iter(self.data), 7)
+        solver = StreamingLSTDQSolver(chunk_size=3)
+
+        for i in range(2):
+            weights = solver.solve(chunks, self.policy)
+
+            np.testing.assert_array_almost_equal(weights,
+                                                 self.expected_weights)
+
+    def test_matches_lstdq_solver_with_dense_basis(self):
+        policy = Policy(DenseExactBasis([5], 2), .9, 0, self.policy.weights,
+                        Policy.TieBreakingStrategy.FirstWins)
+        chunks = SampleChunks.from_batch(SampleBatch.from_samples(self.data),
+                                         16)
+
+        weights = StreamingLSTDQSolver().solve(chunks, policy)
+
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
+
+
+class TestSparseLSTDQSolver(TestCase):
+    def setUp(self):
+        self.data, self.policy = _random_chain_data(1)
+
+        self.expected_weights = LSTDQSolver().solve(self.data, self.policy)
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError):
+            SparseLSTDQSolver(method='cholesky')
+
+    def test_matches_lstdq_solver(self):
+        for cache_features in (True, False):
+            solver = SparseLSTDQSolver(cache_features=cache_features)
+
+            weights = solver.solve(self.data, self.policy)
+
+            np.testing.assert_array_almost_equal(weights,
+                                                 self.expected_weights)
+
+    def test_matches_lstdq_solver_with_lsqr(self):
+        solver = SparseLSTDQSolver(method='lsqr')
+
+        weights = solver.solve(SampleBatch.from_samples(self.data),
+                               self.policy)
+
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
+
+    def test_truncated_rbf_matches_vectorized_solver(self):
+        random_state = np.random.RandomState(2)
+        data = SampleBatch(random_state.uniform(0, 5, size=(100, 2)),
+                           random_state.randint(2, size=100),
+                           random_state.uniform(-1, 1, size=100),
+                           random_state.uniform(0, 5, size=(100, 2)))
+        basis = TruncatedRadialBasisFunction(
+            list(random_state.uniform(0, 5, size=(30, 2))), 4., 2)
+        policy = Policy(basis, .9, 0, random_state.uniform(-1, 1, size=62),
+                        Policy.TieBreakingStrategy.FirstWins)
+
+        weights = SparseLSTDQSolver().solve(data, policy)
+
+        np.testing.assert_array_almost_equal(
+            weights, VectorizedLSTDQSolver().solve(data, policy))
+
+    def test_singular_matrix(self):
+        data = [Sample(np.array([0]), 0, 1, np.array([0]))]
+        policy = Policy(ExactBasis([2], 1), .9, 0, np.zeros((2, )))
+        solver = SparseLSTDQSolver(precondition_value=0)
+
+        weights = solver.solve(data, policy)
+
+        np.testing.assert_array_almost_equal(weights, np.array([10, 0]))
+
+
+class TestKrylovLSTDQSolver(TestCase):
+    def setUp(self):
+        self.data, self.policy = _random_chain_data(1)
+
+        self.expected_weights = LSTDQSolver().solve(self.data, self.policy)
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError):
+            KrylovLSTDQSolver(method='cg')
+
+    def test_matches_lstdq_solver(self):
+        for method in KrylovLSTDQSolver.methods:
+            for cache_features in (True, False):
+                solver = KrylovLSTDQSolver(cache_features=cache_features,
+                                           method=method, tol=1e-12)
+
+                weights = solver.solve(self.data, self.policy)
+
+                np.testing.assert_array_almost_equal(weights,
+                                                     self.expected_weights)
+
+    def test_dense_basis_matches_lstdq_solver(self):
+        policy = Policy(DenseExactBasis([5], 2), .9, 0, self.policy.weights,
+                        Policy.TieBreakingStrategy.FirstWins)
+        solver = KrylovLSTDQSolver(tol=1e-12)
+
+        weights = solver.solve(SampleBatch.from_samples(self.data), policy)
+
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
+
+    def test_warm_start_uses_fewer_matvecs(self):
+        solver = KrylovLSTDQSolver()
+        solver.solve(self.data, self.policy)
+        cold_matvecs = solver.matvecs
+
+        policy = Policy(self.policy.basis, .9, 0, self.expected_weights,
+                        Policy.TieBreakingStrategy.FirstWins)
+        solver.solve(self.data, policy)
+
+        self.assertEqual(solver.info, 0)
+        self.assertLess(solver.matvecs, cold_matvecs)
+
+
+class TestRecursiveLSTDQSolver(TestCase):
+    def setUp(self):
+        self.data, self.policy = _random_chain_data(2)
+
+        self.expected_weights = LSTDQSolver().solve(self.data, self.policy)
+
+    def test_invalid_precondition_value(self):
+        with self.assertRaises(ValueError):
+            RecursiveLSTDQSolver(precondition_value=0)
+
+    def test_solve_matches_lstdq_solver(self):
+        solver = RecursiveLSTDQSolver()
+
+        weights = solver.solve(self.data, self.policy)
+
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
+
+    def test_update_matches_lstdq_solver(self):
+        """Test that ingesting samples one by one gives the batch result."""
+        solver = RecursiveLSTDQSolver()
+        self.assertIsNone(solver.weights)
+
+        for sample in self.data:
+            weights = solver.update(sample, self.policy)
+
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
+        np.testing.assert_array_almost_equal(solver.weights,
+                                             self.expected_weights)
+
+    def test_reset(self):
+        solver = RecursiveLSTDQSolver()
+        solver.update(self.data[0], self.policy)
+
+        solver.reset()
+
+        self.assertIsNone(solver.weights)
+
+    def test_singular_update_is_skipped(self):
+        """Test that an update making A singular leaves A^{-1} unchanged."""
+        # u = [1, 1] and v = [0, -.5] so 1 + v^T A^{-1} u = 1 - .5/.5 = 0
+        policy = Policy(OneDimensionalPolynomialBasis(1, 1), 1., 0,
+                        np.zeros((2, )))
+        sample = Sample(np.array([1.]), 0, 1., np.array([1.5]))
+
+        solver = RecursiveLSTDQSolver(precondition_value=.5)
+        weights = solver.update(sample, policy)
+
+        self.assertEqual(solver.num_skipped, 1)
+        np.testing.assert_array_equal(solver.a_inv, 2*np.eye(2))
+        self.assertTrue(np.all(np.isfinite(weights)))
+
+        weights = solver.solve([sample], policy)
+
+        self.assertEqual(solver.num_skipped, 1)
+        self.assertTrue(np.all(np.isfinite(weights)))
+
+
+class TestIncrementalLSTDQSolver(TestCase):
+    def setUp(self):
+        self.data, self.policy = _random_chain_data(1)
+
+    def assert_matches_lstdq_solver_over_iterations(self, woodbury):
+        # the dense basis uses the phi(s', a') tensor, the exact basis the
+        # state features
+        for basis in (DenseExactBasis([5], 2), ExactBasis([5], 2)):
+            solver = IncrementalLSTDQSolver(woodbury=woodbury)
+            policy = Policy(basis, .9, 0, self.policy.weights,
+                            Policy.TieBreakingStrategy.FirstWins)
+            for i in range(5):
+                expected_weights = LSTDQSolver().solve(self.data, policy)
+
+                weights = solver.solve(self.data, policy)
+
+                np.testing.assert_array_almost_equal(weights,
+                                                     expected_weights)
+                policy = Policy(basis, .9, 0, weights,
+                                Policy.TieBreakingStrategy.FirstWins)
+
+    def test_matches_lstdq_solver_over_iterations(self):
+        self.assert_matches_lstdq_solver_over_iterations(False)
+
+    def test_woodbury_matches_lstdq_solver_over_iterations(self):
+        self.assert_matches_lstdq_solver_over_iterations(True)
+
+    def test_state_factored_basis_uses_state_features(self):
+        basis = CountingExactBasis([5], 2)
+        policy = Policy(basis, .9, 0, self.policy.weights,
+                        Policy.TieBreakingStrategy.FirstWins)
+        solver = IncrementalLSTDQSolver()
+
+        solver.solve(self.data, policy)
+        policy.weights = -policy.weights
+        weights = solver.solve(self.data, policy)
+
+        # only psi(s) and psi(s') are evaluated, never phi(s', a') for
+        # every action
+        self.assertTrue(all(action is None for state, action in basis.calls))
+        self.assertGreater(solver.num_updated, 0)
+        np.testing.assert_array_almost_equal(
+            weights, LSTDQSolver().solve(self.data, policy))
+
+    def test_only_changed_samples_are_updated(self):
+        solver = IncrementalLSTDQSolver()
+
+        solver.solve(self.data, self.policy)
+        self.assertEqual(solver.num_updated, len(self.data))
+
+        solver.solve(self.data, self.policy)
+        self.assertEqual(solver.num_updated, 0)
+
+        policy = Policy(self.policy.basis, .9, 0, -self.policy.weights,
+                        Policy.TieBreakingStrategy.FirstWins)
+        solver.solve(self.data, policy)
+        self.assertGreater(solver.num_updated, 0)
+        self.assertLess(solver.num_updated, len(self.data))
+
+    def test_appended_samples_update_system(self):
+        for woodbury in (False, True):
+            solver = IncrementalLSTDQSolver(woodbury=woodbury)
+            solver.solve(SampleBatch.from_samples(self.data[:40]),
+                         self.policy)
+
+            weights = solver.solve(SampleBatch.from_samples(self.data),
+                                   self.policy)
+
+            self.assertLess(solver.num_updated, len(self.data))
+            self.assertGreaterEqual(solver.num_updated, 10)
+            np.testing.assert_array_almost_equal(
+                weights, LSTDQSolver().solve(self.data, self.policy))
+
+    def test_new_data_rebuilds_system(self):
+        solver = IncrementalLSTDQSolver()
+        solver.solve(self.data, self.policy)
+
+        data = self.data[:20]
+        weights = solver.solve(data, self.policy)
+
+        self.assertEqual(solver.num_updated, 20)
+        np.testing.assert_array_almost_equal(
+            weights, LSTDQSolver().solve(data, self.policy))
+
+
+class TestParallelLSTDQSolver(TestCase):
+    def setUp(self):
+        self.data, self.policy = _random_chain_data(3)
+
+    def test_invalid_num_processes(self):
+        with self.assertRaises(ValueError):
+            ParallelLSTDQSolver(num_processes=0)
+
+    def test_matches_lstdq_solver(self):
+        """Test repeated solves with changing weights and data."""
+        with ParallelLSTDQSolver(num_processes=3) as solver:
+            for data in (self.data, self.data, self.data[:7]):
+                weights = solver.solve(data, self.policy)
+
+                np.testing.assert_array_almost_equal(
+                    weights, LSTDQSolver().solve(data, self.policy))
+
+                self.policy.weights = weights
+
+    def test_more_processes_than_samples(self):
+        with ParallelLSTDQSolver(num_processes=4) as solver:
+            weights = solver.solve(self.data[:2], self.policy)
+
+        np.testing.assert_array_almost_equal(
+            weights, LSTDQSolver().solve(self.data[:2], self.policy))
+
+    def test_worker_errors_are_raised(self):
+        data = [Sample(np.array([7]), 0, 1., np.array([0]))]
+
+        with ParallelLSTDQSolver(num_processes=1) as solver:
+            with self.assertRaises(ValueError):
+                solver.solve(data, self.policy)
+
+
+class TestWeightedSamples(TestCase):
+    def setUp(self):
+        self.data, self.policy = _random_chain_data(3, 3, 200,
+                                                    discrete_rewards=True)
+        self.compacted = SampleBatch.from_samples(self.data).compact()
+
+        self.expected_weights = LSTDQSolver().solve(self.data, self.policy)
+
+    def test_compaction_shrinks_data(self):
+        self.assertLess(len(self.compacted), len(self.data) / 2)
+        self.assertEqual(self.compacted.counts.sum(), len(self.data))
+
+    def test_solvers_match_uncompacted_data(self):
+        dense_policy = Policy(DenseExactBasis([3], 2), .9, 0,
+                              self.policy.weights,
+                              Policy.TieBreakingStrategy.FirstWins)
+        cases = [(LSTDQSolver(), self.policy),
+                 (LSTDQSolver(cache_features=False), self.policy),
+                 (LSTDQSolver(precompute_next_features=True), self.policy),
+                 (VectorizedLSTDQSolver(), self.policy),
+                 (VectorizedLSTDQSolver(), dense_policy),
+                 (SparseLSTDQSolver(), self.policy),
+                 (KrylovLSTDQSolver(tol=1e-12), self.policy),
+                 (RecursiveLSTDQSolver(), self.policy),
+                 (IncrementalLSTDQSolver(woodbury=True), self.policy)]
+
+        for solver, policy in cases:
+            weights = solver.solve(self.compacted, policy)
+
+            np.testing.assert_array_almost_equal(weights,
+                                                 self.expected_weights)
+
+    def test_streaming_and_parallel_solvers_match_uncompacted_data(self):
+        weights = StreamingLSTDQSolver().solve(
+            SampleChunks.from_batch(self.compacted, 4), self.policy)
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
+
+        with ParallelLSTDQSolver(num_processes=2) as solver:
+            weights = solver.solve(self.compacted, self.policy)
+        np.testing.assert_array_almost_equal(weights, self.expected_weights)
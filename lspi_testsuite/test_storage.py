@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""Contains tests for the sample storage classes."""
+import shutil
+import tempfile
+from unittest import TestCase
+
+from lspi import ReplayMemory, Sample, SampleBatch, SampleStore
+from lspi.basis_functions import ExactBasis
+from lspi.policy import Policy
+from lspi.solvers import LSTDQSolver
+
+import numpy as np
+
+
+class TestSampleStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = self.directory + '/store'
+        self.samples = [Sample(np.array([i, -i]), i % 2, float(i),
+                               np.array([i + 1, -i - 1]), i == 4)
+                        for i in range(5)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_create_empty_store(self):
+        store = SampleStore.create(self.path, (2, ))
+
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.batch().states.shape, (0, 2))
+
+    def test_create_existing_store(self):
+        SampleStore.create(self.path, (2, ))
+
+        with self.assertRaises(IOError):
+            SampleStore.create(self.path, (2, ))
+
+    def test_open_missing_store(self):
+        with self.assertRaises(IOError):
+            SampleStore(self.path)
+
+    def test_append_and_reopen(self):
+        store = SampleStore.create(self.path, (2, ), np.int32)
+        store.append(self.samples[:2])
+        store.append(SampleBatch.from_samples(self.samples[2:]))
+
+        store = SampleStore(self.path)
+        batch = store.batch()
+
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.state_shape, (2, ))
+        self.assertEqual(batch.states.dtype, np.int32)
+        self.assertTrue(isinstance(batch.states.base, np.memmap))
+        expected = SampleBatch.from_samples(self.samples)
+        for column in SampleStore.columns:
+            np.testing.assert_array_equal(getattr(batch, column),
+                                          getattr(expected, column))
+
+    def test_append_after_interrupted_append(self):
+        store = SampleStore.create(self.path, (2, ))
+        store.append(self.samples[:2])
+        # a crash after writing some columns but before the manifest
+        with open(self.path + '/states.bin', 'ab') as states_file:
+            states_file.write(np.array([99., 99.]).tobytes())
+
+        store = SampleStore(self.path)
+        store.append(self.samples[2:])
+
+        store = SampleStore(self.path)
+        self.assertEqual(len(store), 5)
+        expected = SampleBatch.from_samples(self.samples)
+        np.testing.assert_array_equal(store.batch().states, expected.states)
+
+    def test_batch_reused_until_append(self):
+        store = SampleStore.create(self.path, (2, ))
+        store.append(self.samples[:2])
+        batch = store.batch()
+
+        self.assertIs(store.batch(), batch)
+        store.append(self.samples[2:])
+        self.assertEqual(len(store.batch()), 5)
+
+    def test_batch_is_read_only(self):
+        store = SampleStore.create(self.path, (2, ))
+        store.append(self.samples)
+
+        with self.assertRaises(ValueError):
+            store.batch().rewards[0] = 1.
+
+    def test_append_mismatched_state_shape(self):
+        store = SampleStore.create(self.path, (3, ))
+
+        with self.assertRaises(ValueError):
+            store.append(self.samples)
+
+    def test_chunks(self):
+        store = SampleStore.create(self.path, (2, ))
+        store.append(self.samples)
+
+        chunks = list(store.chunks(2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        np.testing.assert_array_equal(chunks[2].absorb, [True])
+
+
+class TestReplayMemory(TestCase):
+    def setUp(self):
+        self.samples = [Sample(np.array([i % 3]), i % 2, float(i),
+                               np.array([(i + 1) % 3]), i % 7 == 6)
+                        for i in range(10)]
+
+    def test_invalid_capacity(self):
+        with self.assertRaises(ValueError):
+            ReplayMemory(0, (1, ))
+
+    def test_add_until_full(self):
+        memory = ReplayMemory(4, (1, ))
+        for sample in self.samples[:3]:
+            memory.add(sample)
+
+        self.assertEqual(len(memory), 3)
+        np.testing.assert_array_almost_equal(memory.batch().rewards,
+                                             [0, 1, 2])
+
+    def test_oldest_samples_evicted(self):
+        memory = ReplayMemory(4, (1, ))
+        states = memory.states
+        for sample in self.samples:
+            memory.add(sample)
+
+        self.assertEqual(len(memory), 4)
+        self.assertIs(memory.states, states)
+        np.testing.assert_array_almost_equal(memory.batch().rewards,
+                                             [8, 9, 6, 7])
+
+    def test_extend_matches_add(self):
+        memory = ReplayMemory(4, (1, ))
+        memory.add(self.samples[0])
+        memory.extend(SampleBatch.from_samples(self.samples[1:7]))
+
+        expected = ReplayMemory(4, (1, ))
+        for sample in self.samples[:7]:
+            expected.add(sample)
+
+        for column in SampleStore.columns:
+            np.testing.assert_array_equal(getattr(memory.batch(), column),
+                                          getattr(expected.batch(), column))
+
+    def test_extend_more_than_capacity(self):
+        memory = ReplayMemory(4, (1, ))
+        memory.extend(self.samples)
+
+        np.testing.assert_array_almost_equal(sorted(memory.batch().rewards),
+                                             [6, 7, 8, 9])
+
+    def test_sample_indices(self):
+        memory = ReplayMemory(4, (1, ))
+        with self.assertRaises(ValueError):
+            memory.sample_indices(1)
+
+        memory.extend(self.samples[:4])
+        memory.set_priorities([0, 1, 2], [0., 0., 0.])
+        indices = memory.sample_indices(20, prioritized=True,
+                                        random_state=np.random.RandomState(0))
+
+        np.testing.assert_array_equal(indices, np.repeat(3, 20))
+        self.assertEqual(len(memory.sample(5)), 5)
+
+    def test_new_samples_get_max_priority(self):
+        memory = ReplayMemory(4, (1, ))
+        memory.extend(self.samples[:3])
+
+        memory.set_priorities([1], [5.])
+        memory.add(self.samples[3])
+        self.assertEqual(memory.priorities[3], 5.)
+
+        # slot 1 still holds the maximum after slot 3 is lowered
+        memory.set_priorities([3], [2.])
+        memory.add(self.samples[4])
+        self.assertEqual(memory.priorities[0], 5.)
+
+        memory.set_priorities([0, 1], [.5, 3.])
+        memory.extend(self.samples[:2])
+        np.testing.assert_array_equal(memory.priorities, [.5, 3., 3., 2.])
+
+    def test_max_priority_matches_buffer(self):
+        random_state = np.random.RandomState(0)
+        memory = ReplayMemory(5, (1, ))
+
+        for i in range(50):
+            if i % 3 == 0:
+                memory.extend(self.samples[:random_state.randint(1, 4)])
+            else:
+                memory.add(self.samples[i % 5])
+            indices = memory.sample_indices(2, random_state=random_state)
+            memory.set_priorities(indices, random_state.uniform(size=2))
+
+            self.assertEqual(memory._new_priority(),
+                             max(memory.priorities[:len(memory)].max(),
+                                 1e-6))
+
+    def test_set_priorities_of_empty_slot(self):
+        memory = ReplayMemory(4, (1, ))
+        memory.add(self.samples[0])
+
+        with self.assertRaises(IndexError):
+            memory.set_priorities([2], [1.])
+
+    def test_negative_priorities(self):
+        memory = ReplayMemory(4, (1, ))
+        memory.extend(self.samples[:4])
+
+        with self.assertRaises(ValueError):
+            memory.set_priorities([0], [-1.])
+
+    def test_solver_sees_overwritten_samples(self):
+        policy = Policy(ExactBasis([3], 2), .9, 0, np.zeros((6, )),
+                        Policy.TieBreakingStrategy.FirstWins)
+        memory = ReplayMemory(8, (1, ), np.int_)
+        memory.extend(self.samples[:6])
+        solver = LSTDQSolver()
+        solver.solve(memory.batch(), policy)
+
+        # wraps around while growing from 6 to 8 samples
+        memory.extend(self.samples[6:])
+        weights = solver.solve(memory.batch(), policy)
+
+        np.testing.assert_array_almost_equal(
+            weights, LSTDQSolver().solve(memory.batch().to_samples(), policy))